@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+# -------------------------------
+# Per-recipient rate limit
+# -------------------------------
+class TokenBucket:
+    """
+    Allows `capacity` messages in a burst, refilled at `capacity / period`
+    messages per second.
+    """
+
+    def __init__(self, capacity, period):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+# -------------------------------
+# Alert dispatcher
+# -------------------------------
+class AlertDispatcher:
+    """
+    Sends alert messages off the detection path.
+
+    dispatch(event_data) returns immediately. A small thread pool sends
+    the message to every recipient concurrently through `client` (anything
+    with messages.create(body=, from_=, to=), e.g. a Twilio Client sharing
+    one pooled HTTP session).
+
+    - Dedup: events for the same episode are alerted once. An episode is
+      event_data["episode_id"] if present, otherwise the camera_id; a
+      camera's events within `dedup_window` seconds of its last alert are
+      treated as the same episode.
+    - Rate limit: at most `rate_limit` messages per `rate_period` seconds
+      per recipient; excess messages are dropped and counted.
+    - Failed sends are retried up to `max_attempts` times with backoff.
+    """
+
+    def __init__(self, client, from_, recipients, formatter, max_workers=4,
+                 dedup_window=120.0, rate_limit=5, rate_period=600.0,
+                 max_attempts=3, retry_backoff=1.0):
+        self.name = "alerts"
+        self.client = client
+        self.from_ = from_
+        self.recipients = list(recipients)
+        self.formatter = formatter
+        self.dedup_window = dedup_window
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="alert")
+        self._lock = threading.Lock()
+        self._last_alert = {}   # episode key -> monotonic time of last alert
+        self._buckets = {to: TokenBucket(rate_limit, rate_period) for to in self.recipients}
+        self._pending = set()
+        self.recent = deque(maxlen=50)
+
+        self.dispatched = 0
+        self.deduplicated = 0
+        self.rate_limited = 0
+        self.sent = 0
+        self.failed = 0
+
+    def _episode_key(self, event_data):
+        return event_data.get("episode_id") or f"camera:{event_data.get('camera_id', '0')}"
+
+    def dispatch(self, event_data):
+        """
+        Queue alerts for event_data. Returns False if the event was
+        suppressed as a duplicate of an episode already alerted.
+        """
+        now = time.monotonic()
+        key = self._episode_key(event_data)
+        with self._lock:
+            last = self._last_alert.get(key)
+            if last is not None and now - last < self.dedup_window:
+                # Same episode: extend the window so a long seizure alerts once
+                self._last_alert[key] = now
+                self.deduplicated += 1
+                return False
+            self._last_alert[key] = now
+            self.dispatched += 1
+
+            body = self.formatter(event_data)
+            for to in self.recipients:
+                if not self._buckets[to].take():
+                    self.rate_limited += 1
+                    print(f"Alert to {to} dropped: rate limit reached")
+                    continue
+                future = self._executor.submit(self._send, to, body)
+                self._pending.add(future)
+                future.add_done_callback(self._pending.discard)
+        return True
+
+    def _send(self, to, body):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                message = self.client.messages.create(body=body, from_=self.from_, to=to)
+                with self._lock:
+                    self.sent += 1
+                    self.recent.append({"to": to, "sid": getattr(message, "sid", None), "at": time.time()})
+                print(f"WhatsApp alert sent to {to} (SID: {getattr(message, 'sid', None)})")
+                return True
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    with self._lock:
+                        self.failed += 1
+                    print(f"WhatsApp alert to {to} failed: {e}")
+                    return False
+                time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+
+    def flush(self, timeout=30.0):
+        """
+        Wait for in-flight sends. Returns False on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        while self._pending:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "dispatched": self.dispatched,
+                "deduplicated": self.deduplicated,
+                "rate_limited": self.rate_limited,
+                "sent": self.sent,
+                "failed": self.failed,
+                "in_flight": len(self._pending)
+            }
+
+
+# -------------------------------
+# Local fake client (no network)
+# -------------------------------
+class FakeMessage:
+    def __init__(self, sid):
+        self.sid = sid
+
+
+class FakeTwilioClient:
+    """
+    Stands in for twilio.rest.Client: records every message and can add
+    latency or fail the first `fail_first` calls.
+    """
+
+    def __init__(self, latency=0.0, fail_first=0):
+        self.latency = latency
+        self.fail_first = fail_first
+        self.messages = self
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def create(self, body, from_, to):
+        time.sleep(self.latency)
+        with self._lock:
+            if self.fail_first > 0:
+                self.fail_first -= 1
+                raise ConnectionError("fake send failure")
+            self.sent.append({"body": body, "from_": from_, "to": to})
+            return FakeMessage(f"SMfake{len(self.sent):04d}")
+
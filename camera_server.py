@@ -1,118 +1,252 @@
-from flask import Flask, jsonify
+import os
+import time
+from flask import Flask, Response, jsonify, request, send_from_directory
 from flask_cors import CORS
-import subprocess
 import psutil
-import os
 from firebase_logger import update_camera_status
+from detector_pool import DetectorPool, default_firebase_path, validate_camera_id, WARM_SPARES
+from heartbeat import read_pid, read_heartbeat
+from metrics import read_snapshots, render_prometheus
+from preview import PreviewHub
+from event_clips import CLIP_DIR
 
 app = Flask(__name__)
 CORS(app)  # Allow requests from React dashboard
 
-# Store the camera process
-camera_process = None
-
-def is_camera_running():
-    """Check if the camera detector is running"""
-    global camera_process
-    if camera_process and camera_process.poll() is None:
-        return True
-    
-    # Check if any Python process is running the detector
-    for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-        try:
-            if 'python' in proc.info['name'].lower():
-                cmdline = proc.info['cmdline']
-                if cmdline and 'final_seizure_detector.py' in ' '.join(cmdline):
-                    return True
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            pass
-    return False
+# One detector worker per camera, spread across CPU cores
+pool = DetectorPool()
 
-@app.route('/camera/status', methods=['GET'])
-def get_camera_status():
-    """Get current camera status"""
-    running = is_camera_running()
-    return jsonify({
-        'status': 'running' if running else 'stopped',
-        'running': running
-    })
+DEFAULT_CAMERA_ID = "0"
 
-@app.route('/camera/start', methods=['POST'])
-def start_camera():
-    """Start the camera detector"""
-    global camera_process
-    
-    if is_camera_running():
+# Live view: frames are read from the detectors' shared-memory rings and
+# JPEG-encoded only while a client is connected
+previews = PreviewHub(jpeg_quality=80)
+STREAM_FPS = 10
+
+
+def external_detector_pid(camera_id):
+    """
+    PID of a detector for camera_id not started by this server (e.g. run
+    by hand), from the PID file and heartbeat it publishes. O(1): no
+    process table scan.
+    """
+    if pool.is_running(camera_id):
+        return None
+    pid = read_pid(camera_id)
+    if pid is None or not psutil.pid_exists(pid):
+        return None
+    heartbeat = read_heartbeat(camera_id)
+    if heartbeat is None or heartbeat['pid'] != pid:
+        return None  # stale PID file, PID reused by another process
+    return pid
+
+
+def is_camera_running(camera_id=DEFAULT_CAMERA_ID):
+    """Check if the detector for camera_id is running"""
+    return pool.is_running(camera_id) or external_detector_pid(camera_id) is not None
+
+
+def camera_firebase_path(camera_id):
+    worker = pool.workers.get(camera_id)
+    return worker.firebase_path if worker else default_firebase_path(camera_id)
+
+
+@app.route('/cameras', methods=['GET'])
+def list_cameras():
+    """Status of every camera known to the server"""
+    return jsonify({'cameras': pool.status_all()})
+
+
+@app.route('/camera/<camera_id>/status', methods=['GET'])
+def get_camera_status_by_id(camera_id):
+    """Get status of one camera"""
+    status = pool.status(camera_id)
+    if not status['running']:
+        pid = external_detector_pid(camera_id)
+        if pid is not None:
+            heartbeat = read_heartbeat(camera_id)
+            status.update({'status': 'running', 'running': True, 'pid': pid, 'external': True,
+                           'frames': heartbeat['frames'], 'last_frame_age': heartbeat['frame_age']})
+    return jsonify(status)
+
+
+@app.route('/camera/<camera_id>/start', methods=['POST'])
+def start_camera_by_id(camera_id):
+    """
+    Start a detector for one camera.
+    Optional JSON body: source, motion_threshold, rhythm_threshold,
+    seizure_frame_threshold, firebase_path
+    """
+    try:
+        validate_camera_id(camera_id)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    if is_camera_running(camera_id):
         return jsonify({
             'success': False,
-            'message': 'Camera is already running'
+            'message': f'Camera {camera_id} is already running'
         }), 400
-    
+
     try:
-        # Start the detector as a subprocess
-        camera_process = subprocess.Popen(
-            ['python', 'final_seizure_detector.py'],
-            cwd=os.path.dirname(os.path.abspath(__file__))
-        )
-        
+        worker = pool.start(camera_id, request.get_json(silent=True) or {})
+
         # Update Firebase status
-        update_camera_status(True)
-        
+        update_camera_status(True, base_path=camera_firebase_path(camera_id))
+
         return jsonify({
             'success': True,
-            'message': 'Camera started successfully',
-            'pid': camera_process.pid
+            'message': f'Camera {camera_id} started successfully',
+            'pid': worker.process.pid,
+            'cpu_core': worker.cpu_core,
+            'warm_start': worker.warm
         })
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         return jsonify({
             'success': False,
-            'message': f'Failed to start camera: {str(e)}'
+            'message': f'Failed to start camera {camera_id}: {str(e)}'
         }), 500
 
-@app.route('/camera/stop', methods=['POST'])
-def stop_camera():
-    """Stop the camera detector"""
-    global camera_process
-    
-    if not is_camera_running():
+
+@app.route('/camera/<camera_id>/stop', methods=['POST'])
+def stop_camera_by_id(camera_id):
+    """Stop the detector for one camera"""
+    if not (is_camera_running(camera_id) or pool.is_supervised(camera_id)):
         return jsonify({
             'success': False,
-            'message': 'Camera is not running'
+            'message': f'Camera {camera_id} is not running'
         }), 400
-    
+
     try:
-        # Kill the process
-        if camera_process:
-            camera_process.terminate()
-            camera_process.wait(timeout=5)
-        
-        # Also kill any orphaned processes
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-            try:
-                if 'python' in proc.info['name'].lower():
-                    cmdline = proc.info['cmdline']
-                    if cmdline and 'final_seizure_detector.py' in ' '.join(cmdline):
-                        proc.terminate()
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                pass
-        
-        camera_process = None
-        
+        if pool.is_supervised(camera_id):
+            pool.stop(camera_id)
+        else:
+            # Detector started outside the server
+            pid = external_detector_pid(camera_id)
+            if pid is not None:
+                try:
+                    psutil.Process(pid).terminate()
+                except psutil.NoSuchProcess:
+                    pass
+
         # Update Firebase status
-        update_camera_status(False)
-        
+        update_camera_status(False, base_path=camera_firebase_path(camera_id))
+
         return jsonify({
             'success': True,
-            'message': 'Camera stopped successfully'
+            'message': f'Camera {camera_id} stopped successfully'
         })
     except Exception as e:
         return jsonify({
             'success': False,
-            'message': f'Failed to stop camera: {str(e)}'
+            'message': f'Failed to stop camera {camera_id}: {str(e)}'
         }), 500
 
+
+@app.route('/camera/<camera_id>/config', methods=['POST'])
+def reconfigure_camera(camera_id):
+    """
+    Change a running camera's settings (same JSON fields as start).
+    Thresholds apply in place; other fields restart its detector.
+    """
+    try:
+        applied = pool.reconfigure(camera_id, request.get_json(silent=True) or {})
+    except RuntimeError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to reconfigure camera {camera_id}: {str(e)}'
+        }), 500
+    return jsonify({
+        'success': True,
+        'message': f'Camera {camera_id} reconfigured ({applied})',
+        'applied': applied,
+        'config': pool.status(camera_id).get('config')
+    })
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Prometheus metrics: per-stage latency histograms, frame/drop counters
+    and queue gauges of every running detector, read from the snapshot
+    files the detectors write once per second.
+    """
+    extra = [
+        ('detector_running', {'camera': camera_id}, int(worker.is_running()), 'gauge')
+        for camera_id, worker in pool.workers.items()
+    ]
+    return Response(render_prometheus(read_snapshots(), extra),
+                    mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/camera/<camera_id>/snapshot.jpg', methods=['GET'])
+def camera_snapshot(camera_id):
+    """Latest frame of one camera as a JPEG"""
+    frame = previews.jpeg(camera_id)
+    if frame is None:
+        return jsonify({'success': False, 'message': f'No preview available for camera {camera_id}'}), 503
+    return Response(frame[1], mimetype='image/jpeg', headers={'Cache-Control': 'no-store'})
+
+
+@app.route('/camera/<camera_id>/stream.mjpg', methods=['GET'])
+def camera_stream(camera_id):
+    """MJPEG live view of one camera (at most STREAM_FPS frames/s)"""
+    first = previews.jpeg(camera_id)
+    if first is None:
+        return jsonify({'success': False, 'message': f'No preview available for camera {camera_id}'}), 503
+
+    def generate():
+        seq, jpeg = first
+        while True:
+            yield (b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: ' +
+                   str(len(jpeg)).encode() + b'\r\n\r\n' + jpeg + b'\r\n')
+            time.sleep(1.0 / STREAM_FPS)
+            frame = previews.jpeg(camera_id, after_seq=seq)
+            if frame is None:
+                return  # detector stopped
+            seq, jpeg = frame
+
+    return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame',
+                    headers={'Cache-Control': 'no-store'})
+
+
+@app.route('/clips/<path:name>', methods=['GET'])
+def event_clip(name):
+    """Video clip of a confirmed event (the event's `clip` field)"""
+    return send_from_directory(CLIP_DIR, name, mimetype='video/x-msvideo')
+
+
+# Single-camera endpoints used by the dashboard act on the default camera
+@app.route('/camera/status', methods=['GET'])
+def get_camera_status():
+    """Get current camera status"""
+    return get_camera_status_by_id(DEFAULT_CAMERA_ID)
+
+
+@app.route('/camera/start', methods=['POST'])
+def start_camera():
+    """Start the camera detector"""
+    return start_camera_by_id(DEFAULT_CAMERA_ID)
+
+
+@app.route('/camera/stop', methods=['POST'])
+def stop_camera():
+    """Stop the camera detector"""
+    return stop_camera_by_id(DEFAULT_CAMERA_ID)
+
+
 if __name__ == '__main__':
     print("SeizoWatch Camera Control API")
     print("Server running on http://localhost:5000")
     print("Dashboard camera control enabled")
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    print(f"Detector workers will be spread across {len(pool.cpu_cores)} CPU cores")
+    debug = True
+    # With the debug reloader only the serving child keeps standby detectors
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        pool.keep_warm(WARM_SPARES)
+        print(f"Keeping {WARM_SPARES} standby detector(s) loaded for instant starts")
+    app.run(host='0.0.0.0', port=5000, debug=debug)
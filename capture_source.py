@@ -0,0 +1,328 @@
+import os
+import sys
+import threading
+import time
+
+import cv2
+
+STREAM_PREFIXES = ("rtsp://", "rtsps://", "rtmp://", "http://", "https://", "udp://", "tcp://")
+# FFmpeg options for network cameras: RTSP over TCP (lost UDP packets smear
+# whole frames), no input buffering, low-delay decoding
+FFMPEG_STREAM_OPTIONS = "rtsp_transport;tcp|fflags;nobuffer|flags;low_delay"
+
+OPEN_TIMEOUT = 5.0            # seconds to connect to a network camera
+READ_TIMEOUT = 5.0            # seconds without a packet before a read fails
+RECONNECT_BACKOFF = 1.0       # first wait between reconnects, doubled each time
+MAX_RECONNECT_BACKOFF = 30.0
+STALL_THRESHOLD = 1.0         # gaps between frames longer than this count as stall time
+
+
+def source_kind(source):
+    """
+    "stream" (network URL), "device" (camera index or /dev/videoN) or "file"
+    """
+    text = str(source)
+    if text.lower().startswith(STREAM_PREFIXES):
+        return "stream"
+    if text.isdigit() or text.startswith("/dev/video"):
+        return "device"
+    return "file"
+
+
+# -------------------------------
+# Capture source
+# -------------------------------
+class CaptureSource:
+    """
+    cv2.VideoCapture with a backend chosen per source kind, requested
+    resolution / frame rate, automatic reconnect and stall / drop stats.
+    It keeps the grab() / retrieve() / read() / get() / isOpened() /
+    release() interface, so CaptureThread and the simple scripts use it
+    unchanged.
+
+        stream - FFmpeg, TCP transport, no buffering, open and read
+                 timeouts. width/height resize decoded frames; fps caps
+                 the delivered rate (earlier frames are grabbed and
+                 skipped, not decoded).
+        device - V4L2 on Linux (default backend elsewhere). width, height
+                 and fps are requested from the driver, buffer size 1.
+        file   - default backend; fps paces playback to real time,
+                 width/height resize. Not reconnected: EOF ends it.
+
+    A failed read on a live source that has opened before closes the
+    capture and reopens it with exponential backoff instead of ending the
+    run; grab() only returns False once release() / stop() was called.
+    A source that never opened is not retried: isOpened() is False, so
+    the caller can report a bad source (camera_server's supervisor
+    restarts the detector with its own backoff).
+
+    latest_only (grab-and-skip) runs a grabber thread that keeps pulling
+    frames off the camera so its buffer never fills with stale ones. A
+    caller's grab() waits for the next frame to arrive and has it decoded
+    right there; every frame grabbed while nobody was waiting is
+    discarded undecoded and counted in `dropped`.
+    """
+
+    def __init__(self, source=0, width=None, height=None, fps=None, latest_only=False, reconnect=None,
+                 open_timeout=OPEN_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 backoff=RECONNECT_BACKOFF, max_backoff=MAX_RECONNECT_BACKOFF):
+        self.name = "source"
+        self.source = source
+        self.kind = source_kind(source)
+        self.width = width or None
+        self.height = height or None
+        self.fps = fps or None
+        self.latest_only = latest_only
+        self.reconnect = self.kind != "file" if reconnect is None else reconnect
+        self.open_timeout = open_timeout
+        self.read_timeout = read_timeout
+        self.initial_backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.frames = 0          # frames grabbed from the source
+        self.delivered = 0       # frames handed to the caller
+        self.dropped = 0         # grabbed but never delivered (latest_only / fps cap)
+        self.reconnects = 0
+        self.stalls = 0
+        self.stall_seconds = 0.0
+        self.last_error = None
+
+        self._cap = None
+        self._backoff = backoff
+        self._connected_once = False
+        self._last_frame = None        # monotonic time of the last grabbed frame
+        self._next_due = None          # fps pacing
+        self._closed = threading.Event()
+
+        # grab-and-skip hand-off
+        self._cond = threading.Condition()
+        self._waiting = False
+        self._frame = None
+        self._ended = False
+        self._grabber = None
+
+        if not self._open():
+            self.last_error = f"could not open {source}"
+            self._ended = True
+        elif latest_only:
+            self._grabber = threading.Thread(target=self._grab_loop, name="grabber", daemon=True)
+            self._grabber.start()
+
+    # ---- connection ----
+    def _open(self):
+        params = []
+        if self.kind == "stream":
+            os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", FFMPEG_STREAM_OPTIONS)
+            target, api = str(self.source), cv2.CAP_FFMPEG
+            params = [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(self.open_timeout * 1000),
+                      cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(self.read_timeout * 1000)]
+        elif self.kind == "device":
+            target = int(self.source) if str(self.source).isdigit() else str(self.source)
+            api = cv2.CAP_V4L2 if sys.platform.startswith("linux") else cv2.CAP_ANY
+        else:
+            target, api = str(self.source), cv2.CAP_ANY
+
+        cap = cv2.VideoCapture(target, api, params)
+        if not cap.isOpened():
+            cap.release()
+            return False
+
+        if self.kind != "file":
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        if self.kind == "device":
+            if self.width:
+                cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            if self.height:
+                cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+            if self.fps:
+                cap.set(cv2.CAP_PROP_FPS, self.fps)
+
+        if self._connected_once:
+            self.reconnects += 1
+            print(f"Reconnected to {self.source} (reconnect #{self.reconnects})")
+        self._connected_once = True
+        self._cap = cap
+        self._next_due = None
+        return True
+
+    def _disconnect(self, reason):
+        self.last_error = reason
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+        print(f"Warning: lost {self.source} ({reason}), reconnecting")
+
+    def _connect(self):
+        """
+        Block until the source is open, retrying with backoff. False once
+        stopped, or when the source is not reconnectable or never opened.
+        """
+        while not self._closed.is_set():
+            if self._cap is not None or self._open():
+                return True
+            if not self.reconnect or not self._connected_once:
+                return False
+            print(f"Warning: could not open {self.source}, retrying in {self._backoff:.1f}s")
+            self._closed.wait(self._backoff)
+            self._backoff = min(self._backoff * 2, self.max_backoff)
+        return False
+
+    # ---- reading ----
+    def _grab_raw(self):
+        """
+        Next frame from the source (grabbed, not decoded), reconnecting as
+        needed. False when stopped or at the end of a file.
+        """
+        while self._connect():
+            if self._cap.grab():
+                now = time.monotonic()
+                if self._last_frame is not None and now - self._last_frame > STALL_THRESHOLD:
+                    self.stalls += 1
+                    self.stall_seconds += now - self._last_frame
+                self._last_frame = now
+                self._backoff = self.initial_backoff
+                self.frames += 1
+                return True
+            if not self.reconnect:
+                return False
+            self._disconnect("read failed")
+        return False
+
+    def _grab_paced(self):
+        while self._grab_raw():
+            if not self.fps:
+                return True
+            now = time.monotonic()
+            if self._next_due is None:
+                self._next_due = now
+            if self.kind == "file":
+                # Play back in real time
+                if self._next_due > now:
+                    self._closed.wait(self._next_due - now)
+            elif now < self._next_due - 0.5 / self.fps:
+                self.dropped += 1
+                continue
+            self._next_due = max(self._next_due + 1.0 / self.fps, now - 1.0 / self.fps)
+            return True
+        return False
+
+    def _decode(self):
+        ret, frame = self._cap.retrieve()
+        if not ret:
+            return None
+        if self.kind != "device" and self.width and self.height and \
+                frame.shape[:2] != (self.height, self.width):
+            frame = cv2.resize(frame, (self.width, self.height), interpolation=cv2.INTER_AREA)
+        self.delivered += 1
+        return frame
+
+    def _grab_loop(self):
+        while self._grab_paced():
+            with self._cond:
+                if not self._waiting:
+                    self.dropped += 1
+                    continue
+            frame = self._decode()
+            with self._cond:
+                self._frame = frame
+                self._waiting = False
+                self._cond.notify_all()
+        with self._cond:
+            self._ended = True
+            self._cond.notify_all()
+
+    def grab(self):
+        if not self.latest_only:
+            return self._grab_paced()
+        with self._cond:
+            self._frame = None
+            self._waiting = True
+            while self._waiting and not self._ended:
+                self._cond.wait(0.5)
+            return self._frame is not None
+
+    def retrieve(self):
+        if self.latest_only:
+            frame, self._frame = self._frame, None
+            return frame is not None, frame
+        frame = self._decode() if self._cap is not None else None
+        return frame is not None, frame
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    # ---- cv2.VideoCapture compatibility ----
+    def isOpened(self):
+        if not self._connected_once:
+            return self._cap is not None and self._cap.isOpened()
+        # Open, or dropped and reconnecting
+        return self._cap is not None or (self.reconnect and not self._closed.is_set())
+
+    def get(self, prop):
+        if self.kind != "device":
+            if prop == cv2.CAP_PROP_FRAME_WIDTH and self.width and self.height:
+                return float(self.width)
+            if prop == cv2.CAP_PROP_FRAME_HEIGHT and self.width and self.height:
+                return float(self.height)
+        return self._cap.get(prop) if self._cap is not None else 0.0
+
+    def stop(self):
+        """
+        Make blocked grab() calls and reconnect waits return promptly
+        (the capture itself is released by release()).
+        """
+        self._closed.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def release(self):
+        self.stop()
+        if self._grabber is not None:
+            self._grabber.join(timeout=self.read_timeout + 1)
+            if self._grabber.is_alive():
+                return  # still blocked in the backend; it releases nothing we need
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+    def stats(self):
+        stalled = time.monotonic() - self._last_frame if self._last_frame is not None else 0.0
+        return {
+            "kind": self.kind,
+            "connected": self._cap is not None,
+            "frames": self.frames,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "reconnects": self.reconnects,
+            "stalls": self.stalls,
+            "stall_seconds": round(self.stall_seconds + (stalled if stalled > STALL_THRESHOLD else 0.0), 2),
+            "last_error": self.last_error
+        }
+
+
+def add_capture_args(parser, default_source="0"):
+    parser.add_argument("--source", default=default_source,
+                        help="Camera index, /dev/videoN, video file or stream URL (rtsp://...)")
+    parser.add_argument("--width", type=int, default=None, help="Requested frame width")
+    parser.add_argument("--height", type=int, default=None, help="Requested frame height")
+    parser.add_argument("--fps", type=float, default=None,
+                        help="Requested frame rate (cameras), max rate (streams) or playback rate (files)")
+    parser.add_argument("--latest-only", action="store_true",
+                        help="Grab-and-skip: always process the newest frame, dropping older ones")
+    parser.add_argument("--no-reconnect", action="store_true", help="Stop instead of reconnecting on failure")
+
+
+def open_capture(args):
+    """
+    CaptureSource from the options added by add_capture_args
+    """
+    return CaptureSource(
+        args.source,
+        width=args.width,
+        height=args.height,
+        fps=args.fps,
+        latest_only=args.latest_only,
+        reconnect=False if args.no_reconnect else None
+    )
@@ -1,31 +1,237 @@
+import argparse
+import os
+import sys
+import time
+
 import joblib
 import numpy as np
-from skl2onnx import convert_sklearn
-from skl2onnx.common.data_types import FloatTensorType
 from sklearn.pipeline import Pipeline
 
-# Load trained model and scaler
-model = joblib.load("seizure_model.pkl")
-scaler = joblib.load("scaler.pkl")
+from onnx_inference import model_digest, ort_stamp_path
+from train_model import HELDOUT_PATH
+
+MODEL_PKL = "seizure_model.pkl"
+SCALER_PKL = "scaler.pkl"
+ONNX_PATH = "seizure_verifier.onnx"
+
+# Opset 17 / ai.onnx.ml 3: supported by every onnxruntime since 1.13
+TARGET_OPSET = 17
+TARGET_ML_OPSET = 3
+
+# Equivalence: probabilities within ATOL of sklearn's, and identical labels
+# except where sklearn itself is within ATOL of the 0.5 decision boundary
+ATOL = 1e-4
+LATENCY_RUNS = 2000
+
+
+# -------------------------------
+# Export
+# -------------------------------
+def load_pipeline(model_path=MODEL_PKL, scaler_path=SCALER_PKL):
+    # Create pipeline (scaler + model)
+    return Pipeline([
+        ("scaler", joblib.load(scaler_path)),
+        ("classifier", joblib.load(model_path))
+    ])
+
+
+def export(pipeline, opset=TARGET_OPSET, zipmap=True):
+    """
+    ONNX ModelProto of the pipeline. zipmap=False leaves the class
+    probabilities as a plain [N, 2] float tensor instead of a list of
+    {class: probability} maps. output_label stays the first output either
+    way, which is the one onnx_inference reads.
+    """
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+
+    # Define input type (4 features)
+    initial_type = [("input", FloatTensorType([None, 4]))]
+    return convert_sklearn(
+        pipeline,
+        initial_types=initial_type,
+        target_opset={"": opset, "ai.onnx.ml": TARGET_ML_OPSET},
+        options={id(pipeline.steps[-1][1]): {"zipmap": zipmap}}
+    )
+
+
+def save_ort_format(onnx_path, ort_path, level="extended"):
+    """
+    Graph-optimize (constant folding, node fusions) and save in ORT
+    format, which loads without parsing protobuf or re-running the
+    optimizers. "extended" keeps the file portable across CPUs; "all"
+    adds layout transforms tuned to this machine.
+    """
+    import onnxruntime as ort
+
+    levels = {
+        "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+        "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+        "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    }
+    options = ort.SessionOptions()
+    options.graph_optimization_level = levels[level]
+    options.optimized_model_filepath = ort_path
+    options.add_session_config_entry("session.save_model_format", "ORT")
+    ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+
+
+# -------------------------------
+# Checks
+# -------------------------------
+def held_out_rows(path=HELDOUT_PATH):
+    """
+    The raw test rows train_model.py saved with the model (either
+    training path), so the check never runs on rows it trained on
+    """
+    with np.load(path) as data:
+        return data["X"], data["y"]
+
+
+def session(model, threads=1):
+    # Same settings as onnx_inference.OnnxVerifier
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = threads
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    return ort.InferenceSession(model, options, providers=["CPUExecutionProvider"])
+
+
+def onnx_outputs(sess, X):
+    """
+    (labels, probability of class 1) from either output layout
+    """
+    labels, probabilities = sess.run(None, {sess.get_inputs()[0].name: X.astype(np.float32)})
+    if isinstance(probabilities, list):  # ZipMap: [{0: p0, 1: p1}, ...]
+        probabilities = np.array([row[1] for row in probabilities])
+    else:
+        probabilities = np.asarray(probabilities)[:, 1]
+    return np.asarray(labels).ravel(), probabilities
+
+
+def check_equivalence(pipeline, sess, X, atol=ATOL):
+    """
+    Returns (ok, report) comparing the ONNX model with the sklearn pipeline
+    """
+    expected_labels = pipeline.predict(X)
+    expected = pipeline.predict_proba(X)[:, 1]
+    labels, probabilities = onnx_outputs(sess, X)
+    max_diff = float(np.abs(probabilities - expected).max())
+    mismatched = labels != expected_labels
+    # float32 inputs may flip a row that sits on the decision boundary
+    real = mismatched & (np.abs(expected - 0.5) > atol)
+    report = {
+        "rows": len(X),
+        "max_probability_diff": max_diff,
+        "label_mismatches": int(mismatched.sum()),
+        "boundary_mismatches": int((mismatched & ~real).sum())
+    }
+    return max_diff <= atol and not real.any(), report
+
+
+def latency(sess, X, runs=LATENCY_RUNS):
+    """
+    Median us per session.run (label only, like the verifier) for one row
+    and for a batch of 64 rows
+    """
+    name = sess.get_inputs()[0].name
+    label = [sess.get_outputs()[0].name]
+    one = X[:1].astype(np.float32)
+    batch = np.resize(X, (64, X.shape[1])).astype(np.float32)
+    result = {}
+    for key, features, count in (("single_us", one, runs), ("batch64_us", batch, max(1, runs // 10))):
+        for _ in range(20):
+            sess.run(label, {name: features})
+        samples = []
+        for _ in range(count):
+            start = time.perf_counter()
+            sess.run(label, {name: features})
+            samples.append(time.perf_counter() - start)
+        result[key] = round(float(np.median(samples)) * 1e6, 2)
+    return result
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export the verifier to ONNX (+ optimized ORT format) and check it")
+    parser.add_argument("--model", default=MODEL_PKL)
+    parser.add_argument("--scaler", default=SCALER_PKL)
+    parser.add_argument("--output", default=ONNX_PATH,
+                        help="ONNX file; the ORT-format model and its .sha256 stamp go next to it")
+    parser.add_argument("--opset", type=int, default=TARGET_OPSET)
+    parser.add_argument("--no-zipmap", action="store_true",
+                        help="Output class probabilities as a plain tensor instead of a ZipMap")
+    parser.add_argument("--optimization", choices=("basic", "extended", "all"), default="extended",
+                        help="Graph optimizations baked into the ORT-format model")
+    parser.add_argument("--no-ort", action="store_true", help="Skip the ORT-format model")
+    parser.add_argument("--heldout", default=HELDOUT_PATH,
+                        help="Held-out rows saved by train_model.py, used for the equivalence check")
+    parser.add_argument("--atol", type=float, default=ATOL)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not os.path.exists(args.heldout):
+        print(f"❌ {args.heldout} not found: run train_model.py (it saves the held-out rows with the model)")
+        sys.exit(1)
+    pipeline = load_pipeline(args.model, args.scaler)
+    X, _ = held_out_rows(args.heldout)
+
+    # Current model, for the latency comparison (read before it is replaced)
+    previous = None
+    if os.path.exists(args.output):
+        with open(args.output, "rb") as f:
+            previous = f.read()
+
+    # Convert to ONNX; written under a temporary name until it checks out
+    onnx_model = export(pipeline, args.opset, zipmap=not args.no_zipmap)
+    tmp = f"{args.output}.tmp.onnx"
+    with open(tmp, "wb") as f:
+        f.write(onnx_model.SerializeToString())
+
+    candidates = {"onnx": tmp}
+    ort_path = os.path.splitext(args.output)[0] + ".ort"
+    ort_tmp = f"{ort_path}.tmp.ort"
+    if not args.no_ort:
+        save_ort_format(tmp, ort_tmp, args.optimization)
+        candidates["ort"] = ort_tmp
+
+    ok = True
+    sessions = {}
+    for label, path in candidates.items():
+        sessions[label] = session(path)
+        passed, report = check_equivalence(pipeline, sessions[label], X, args.atol)
+        ok = ok and passed
+        print(f"{'✅' if passed else '❌'} {label}: {report['rows']} held-out rows, "
+              f"max |p - sklearn| = {report['max_probability_diff']:.2e}, "
+              f"label mismatches {report['label_mismatches']} ({report['boundary_mismatches']} on the boundary)")
 
-# Create pipeline (scaler + model)
-pipeline = Pipeline([
-    ("scaler", scaler),
-    ("classifier", model)
-])
+    if previous is not None:
+        sessions = {"current": session(previous), **sessions}
+    print(f"\nLatency (1 thread, label output):")
+    for label, sess in sessions.items():
+        timing = latency(sess, X)
+        print(f"  {label:8s} single row {timing['single_us']:8.2f} us   batch of 64 {timing['batch64_us']:8.2f} us")
 
-# Define input type (4 features)
-initial_type = [("input", FloatTensorType([None, 4]))]
+    if not ok:
+        for path in candidates.values():
+            os.remove(path)
+        print(f"\n❌ Exported model does not match the sklearn pipeline; {args.output} left unchanged")
+        sys.exit(1)
 
-# Convert to ONNX
-onnx_model = convert_sklearn(
-    pipeline,
-    initial_types=initial_type,
-    target_opset=12
-)
+    # Save ONNX model
+    os.replace(tmp, args.output)
+    print(f"\n✅ ONNX model saved as {args.output} (opset {args.opset}"
+          f"{', no ZipMap' if args.no_zipmap else ''})")
+    if not args.no_ort:
+        os.replace(ort_tmp, ort_path)
+        # onnx_inference only loads the ORT model while this matches the ONNX one
+        with open(ort_stamp_path(ort_path), "w") as f:
+            f.write(model_digest(args.output) + "\n")
+        print(f"✅ Optimized ORT-format model saved as {ort_path}")
 
-# Save ONNX model
-with open("seizure_verifier.onnx", "wb") as f:
-    f.write(onnx_model.SerializeToString())
 
-print("✅ ONNX model saved as seizure_verifier.onnx")
+if __name__ == "__main__":
+    main()
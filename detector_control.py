@@ -0,0 +1,170 @@
+import os
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+# Set by DetectorPool in each detector's environment
+CONTROL_ADDRESS_ENV = "SEIZOWATCH_CONTROL"
+CONTROL_KEY_ENV = "SEIZOWATCH_CONTROL_KEY"
+
+REQUEST_TIMEOUT = 5.0
+
+# Settings a running detector applies in place; anything else needs a restart
+LIVE_CONFIG_KEYS = ("motion_threshold", "rhythm_threshold", "seizure_frame_threshold", "idle_threshold")
+
+
+# -------------------------------
+# Server side (DetectorPool)
+# -------------------------------
+class ControlServer:
+    """
+    Local, authenticated command channel to the detector processes
+    (multiprocessing.connection: a Unix socket, or a named pipe on
+    Windows). Detectors connect back to `address` and introduce
+    themselves with their PID; requests are dicts such as
+
+        {"cmd": "start", "argv": [...]}
+        {"cmd": "reconfigure", "config": {...}}
+        {"cmd": "stop"}
+
+    answered by {"ok": True, ...} or {"ok": False, "error": "..."}.
+    """
+
+    def __init__(self):
+        self.authkey = os.urandom(16)
+        self._listener = Listener(authkey=self.authkey)
+        self.address = self._listener.address
+        self._conns = {}                  # pid -> (connection, lock)
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._accept_loop, name="detector_control", daemon=True)
+        self._thread.start()
+
+    def env(self):
+        """
+        Environment variables that make a detector connect to this server
+        """
+        return {CONTROL_ADDRESS_ENV: self.address, CONTROL_KEY_ENV: self.authkey.hex()}
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn = self._listener.accept()
+                hello = conn.recv()
+            except (OSError, EOFError, AuthenticationError) as e:
+                print(f"Warning: detector control connection failed: {e}")
+                continue
+            with self._cond:
+                self._conns[hello["pid"]] = (conn, threading.Lock())
+                self._cond.notify_all()
+
+    def connected(self, pid):
+        return pid in self._conns
+
+    def wait_connected(self, pid, timeout):
+        with self._cond:
+            return self._cond.wait_for(lambda: pid in self._conns, timeout)
+
+    def request(self, pid, message, timeout=REQUEST_TIMEOUT):
+        """
+        Send one command to the detector with this PID and return its
+        reply. Raises RuntimeError if it is not connected or does not
+        answer in time.
+        """
+        entry = self._conns.get(pid)
+        if entry is None:
+            raise RuntimeError(f"detector {pid} is not connected")
+        conn, lock = entry
+        with lock:
+            try:
+                conn.send(message)
+                if not conn.poll(timeout):
+                    raise RuntimeError(f"detector {pid} did not answer {message['cmd']!r}")
+                return conn.recv()
+            except (OSError, EOFError) as e:
+                self.discard(pid)
+                raise RuntimeError(f"detector {pid} disconnected: {e}")
+
+    def discard(self, pid):
+        with self._cond:
+            entry = self._conns.pop(pid, None)
+        if entry is not None:
+            entry[0].close()
+
+
+# -------------------------------
+# Detector side
+# -------------------------------
+class ControlClient:
+    """
+    A detector's end of the channel. wait_for_start() blocks a standby
+    detector until it is given its camera; serve() then answers commands
+    on a background thread.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._thread = None
+
+    def _reply(self, reply):
+        try:
+            self.conn.send(reply)
+        except OSError:
+            pass
+
+    def wait_for_start(self):
+        """
+        argv of the start command, or None if told to stop (or the server
+        went away) first
+        """
+        while True:
+            try:
+                message = self.conn.recv()
+            except (OSError, EOFError):
+                return None
+            if message.get("cmd") == "start":
+                self._reply({"ok": True, "pid": os.getpid()})
+                return list(message.get("argv", []))
+            if message.get("cmd") == "stop":
+                self._reply({"ok": True})
+                return None
+            self._reply({"ok": False, "error": "not started"})
+
+    def serve(self, handlers):
+        """
+        Answer commands with handlers[cmd](message) -> dict, on a daemon
+        thread. If the server goes away the detector just keeps running.
+        """
+        def loop():
+            while True:
+                try:
+                    message = self.conn.recv()
+                except (OSError, EOFError):
+                    return
+                handler = handlers.get(message.get("cmd"))
+                if handler is None:
+                    self._reply({"ok": False, "error": f"unknown command {message.get('cmd')!r}"})
+                    continue
+                try:
+                    self._reply(dict({"ok": True}, **(handler(message) or {})))
+                except Exception as e:
+                    self._reply({"ok": False, "error": str(e)})
+
+        self._thread = threading.Thread(target=loop, name="control", daemon=True)
+        self._thread.start()
+
+
+def connect_control():
+    """
+    ControlClient for the pool that launched this detector, or None when
+    it was started by hand
+    """
+    address = os.environ.get(CONTROL_ADDRESS_ENV)
+    if not address:
+        return None
+    try:
+        conn = Client(address, authkey=bytes.fromhex(os.environ.get(CONTROL_KEY_ENV, "")))
+        conn.send({"pid": os.getpid()})
+    except (OSError, ValueError, EOFError, AuthenticationError) as e:
+        print(f"Warning: could not connect to camera_server control channel: {e}")
+        return None
+    return ControlClient(conn)
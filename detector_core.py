@@ -0,0 +1,340 @@
+import time
+from collections import deque
+
+import numpy as np
+
+from motion_engine import MotionEngine
+from rhythm_analysis import BlockRhythmEstimator, RhythmEstimator
+
+# Thresholds
+MOTION_THRESHOLD = 900_000  # Set to 900,000 for optimal seizure detection
+RHYTHM_THRESHOLD = 1.25  # Hz; same cut-off as the old "bin index > 4" at 15 samples/s
+SEIZURE_FRAME_THRESHOLD = 2  # 2 frames for very quick detection
+DL_THRESHOLD = 0.5  # verify_with_dl decision threshold (for display)
+
+# Rhythm analysis runs on motion resampled to a fixed rate from frame
+# timestamps, so the window is always RHYTHM_WINDOW / ANALYSIS_RATE seconds
+ANALYSIS_RATE = 15.0  # samples per second
+RHYTHM_WINDOW = 60    # samples per spectral window (4 s)
+RHYTHM_MAX_BIN = 49   # highest DFT bin considered
+
+# Motion engine: None = auto (keep the analysed width >= 480 px)
+MOTION_DOWNSCALE = None
+MOTION_METHOD = "nearest"
+
+# Per-region rhythm: None = whole frame only, or (rows, cols). A region
+# counts when its spectral peak is at least REGION_PEAK_RATIO of the
+# strongest region's, so static blocks' sensor noise is never "rhythmic"
+MOTION_GRID = None
+REGION_PEAK_RATIO = 0.25
+
+# Idle mode: after IDLE_AFTER seconds with motion below IDLE_THRESHOLD the
+# detector only samples IDLE_SAMPLE_RATE frames per second through a
+# coarse IDLE_WIDTH-px diff and skips rhythm analysis and verification.
+# It wakes on the first sample above IDLE_THRESHOLD, well below
+# MOTION_THRESHOLD so a seizure can never start while idle.
+IDLE_THRESHOLD = MOTION_THRESHOLD // 2
+IDLE_AFTER = 30.0       # seconds
+IDLE_SAMPLE_RATE = 5.0  # frames per second while idle
+IDLE_WIDTH = 160        # px
+
+
+def verifier_frequency(hz, sample_rate=ANALYSIS_RATE, window=RHYTHM_WINDOW):
+    """
+    A dominant frequency in Hz on the scale the verifier model was trained
+    on: the legacy FFT position counted from bin 1 (bin - 1) of a
+    `window`-sample spectrum, 0 while no rhythm is known
+    """
+    if hz <= 0:
+        return 0.0
+    return float(max(0, round(hz * window / sample_rate) - 1))
+
+
+def parse_grid(value):
+    """
+    "4x4" / "3x5" -> (rows, cols); "" or "none" -> None. Usable as an
+    argparse type.
+    """
+    if value in (None, "", "none", "None"):
+        return None
+    try:
+        rows, cols = (int(part) for part in str(value).lower().split("x"))
+    except ValueError:
+        raise ValueError(f"invalid motion grid {value!r}, expected ROWSxCOLS such as 4x4")
+    if rows < 1 or cols < 1:
+        raise ValueError(f"invalid motion grid {value!r}, expected ROWSxCOLS such as 4x4")
+    return rows, cols
+
+
+# -------------------------------
+# Hybrid detector (no I/O)
+# -------------------------------
+class HybridDetector:
+    """
+    Steps 1-5 of the detection workflow for one camera, with no camera,
+    Firebase or GUI dependency, so the live detector, offline replay and
+    feature extraction all run exactly the same logic.
+
+    process(frame, capture_time) returns one result dict per frame (None
+    for the very first frame):
+        time, motion_value, dominant_freq (Hz), rhythmic, seizure_frames,
+        seizure_duration, rule_based, verdict, stats
+    verdict is None, "confirmed", "false_positive" or "unverified" (rule
+    fired but no verifier was given). stats holds avg_motion, max_motion,
+    dominant_freq (Hz), dominant_index, duration and onnx_score whenever a
+    verdict is set.
+
+    verifier(avg_motion, max_motion, dominant_index, duration) returns
+    (decision, score), e.g. onnx_inference.verify_with_dl. The model was
+    trained on the legacy bin-index scale (verifier_frequency), not Hz.
+    timings, if given, gets observe(stage, seconds) for the "motion",
+    "rhythm" and "verify" stages (and "idle" for idle frames).
+
+    With grid=(rows, cols) the rhythm test runs per region instead of on
+    the whole-frame sum: a walker crossing the background is a slow bump
+    in each block it passes, while a seizure is a sustained oscillation
+    in a few blocks. The frame is rhythmic when any significant region's
+    dominant frequency is above rhythm_threshold; dominant_freq is that
+    region's and the result also carries "region" (row-major block index,
+    None while the window fills). The intensity test and the verifier
+    statistics still use the whole-frame motion.
+
+    idle_threshold (None or 0 = never idle) enables idle mode: once
+    motion has stayed below it for IDLE_AFTER seconds the detector goes
+    `idle`. Idle frames only get a coarse diff; the caller should hand
+    them in at idle_interval spacing (FrameRateController.set_idle). The
+    first idle sample above idle_threshold wakes the detector: the idle
+    samples of the last window are replayed into the rhythm estimators,
+    so the spectral window is full again, and full processing resumes
+    on the next frame. Results carry "idle" (True for frames handled in
+    idle mode, including the one that woke it).
+    """
+
+    def __init__(self, verifier=None, motion_threshold=MOTION_THRESHOLD,
+                 rhythm_threshold=RHYTHM_THRESHOLD, seizure_frame_threshold=SEIZURE_FRAME_THRESHOLD,
+                 motion_downscale=MOTION_DOWNSCALE, motion_method=MOTION_METHOD, timings=None,
+                 grid=MOTION_GRID, idle_threshold=None):
+        self.verifier = verifier
+        self.motion_threshold = motion_threshold
+        self.rhythm_threshold = rhythm_threshold
+        self.seizure_frame_threshold = seizure_frame_threshold
+        self.timings = timings
+
+        self.motion = MotionEngine(motion_downscale, motion_method, grid=grid)
+        self.rhythm = RhythmEstimator(ANALYSIS_RATE, RHYTHM_WINDOW, RHYTHM_MAX_BIN)
+        self.regions = None
+        if grid is not None:
+            self.regions = BlockRhythmEstimator(grid[0] * grid[1], ANALYSIS_RATE, RHYTHM_WINDOW, RHYTHM_MAX_BIN)
+        self.prev_time = None
+        self.seizure_frames = 0
+        self.seizure_duration = 0.0
+        self.seizure_logged = False
+
+        self.idle_threshold = idle_threshold
+        self.idle_interval = 1.0 / IDLE_SAMPLE_RATE
+        self.idle = False
+        self.idle_motion = MotionEngine(None, "nearest", target_width=IDLE_WIDTH)
+        self._quiet_since = None
+        self._idle_history = deque()  # (time, motion) idle samples, last window only
+
+    def _observe(self, stage, start):
+        now = time.perf_counter()
+        if self.timings is not None:
+            self.timings.observe(stage, now - start)
+        return now
+
+    def process(self, frame, capture_time, capture_interval=None):
+        """
+        capture_interval is the camera's nominal frame interval when known.
+        A diff across skipped frames spans more time and grows with it, so
+        it is scaled back to one capture interval.
+        """
+        start = time.perf_counter()
+        if self.idle:
+            return self._process_idle(frame, capture_time, capture_interval, start)
+
+        # Step 1: Motion
+        motion_value = self.motion.update(frame)
+        prev_time, self.prev_time = self.prev_time, capture_time
+        if motion_value is None:
+            self._observe("motion", start)
+            return None
+        dt = capture_time - prev_time
+        skip_scale = 1.0
+        if capture_interval and dt > capture_interval:
+            skip_scale = capture_interval / dt
+            motion_value *= skip_scale
+        start = self._observe("motion", start)
+
+        # Step 2: Rhythmic motion detection (sliding DFT, Hz)
+        self.rhythm.update(capture_time, motion_value)
+        rhythmic_motion = False
+        dominant_freq = 0.0
+        region = None
+        if self.regions is not None:
+            self.regions.update(capture_time, self.motion.blocks * skip_scale)
+            if self.regions.ready:
+                region, dominant_freq = self.strongest_region()
+                rhythmic_motion = dominant_freq > self.rhythm_threshold
+        elif self.rhythm.ready:
+            dominant_freq = self.rhythm.dominant_frequency()
+            rhythmic_motion = dominant_freq > self.rhythm_threshold
+
+        # Step 3: Sustained + High intensity (Rule-based detection)
+        if rhythmic_motion and motion_value > self.motion_threshold:
+            self.seizure_frames += 1
+            self.seizure_duration += dt
+        else:
+            self.seizure_frames = 0
+            self.seizure_duration = 0.0
+            self.seizure_logged = False  # Reset flag when no seizure detected
+
+        rule_based_seizure = self.seizure_frames >= self.seizure_frame_threshold
+        start = self._observe("rhythm", start)
+
+        result = {
+            "time": capture_time,
+            "motion_value": motion_value,
+            "dominant_freq": dominant_freq,
+            "rhythmic": rhythmic_motion,
+            "seizure_frames": self.seizure_frames,
+            "seizure_duration": self.seizure_duration,
+            "rule_based": rule_based_seizure,
+            "verdict": None,
+            "stats": None
+        }
+        if self.regions is not None:
+            result["region"] = region
+
+        # Step 4-5: DL Verification → Final Confirmation
+        if rule_based_seizure and not self.seizure_logged:
+            self.verify(result)
+            self._observe("verify", start)
+
+        self._update_quiet(frame, capture_time, motion_value)
+        result["idle"] = False
+        return result
+
+    def _update_quiet(self, frame, capture_time, motion_value):
+        if not self.idle_threshold or motion_value >= self.idle_threshold or self.seizure_frames:
+            self._quiet_since = None
+            return
+        if self._quiet_since is None:
+            self._quiet_since = capture_time
+        elif capture_time - self._quiet_since >= IDLE_AFTER:
+            self.idle = True
+            self.idle_motion.reset()
+            self.idle_motion.update(frame)
+            self._idle_history.clear()
+
+    def _process_idle(self, frame, capture_time, capture_interval, start):
+        motion_value = self.idle_motion.update(frame)
+        prev_time, self.prev_time = self.prev_time, capture_time
+        dt = capture_time - prev_time
+        if capture_interval and dt > capture_interval:
+            motion_value *= capture_interval / dt
+
+        history = self._idle_history
+        history.append((capture_time, motion_value))
+        while capture_time - history[0][0] > self.rhythm.window_seconds:
+            history.popleft()
+        if not self.idle_threshold or motion_value > self.idle_threshold:
+            self.wake(frame)
+        self._observe("idle", start)
+
+        result = {
+            "time": capture_time,
+            "motion_value": motion_value,
+            "dominant_freq": 0.0,
+            "rhythmic": False,
+            "seizure_frames": 0,
+            "seizure_duration": 0.0,
+            "rule_based": False,
+            "verdict": None,
+            "stats": None,
+            "idle": True
+        }
+        if self.regions is not None:
+            result["region"] = None
+        return result
+
+    def wake(self, frame=None):
+        """
+        Leave idle mode. The idle samples stand in for the skipped window
+        (spread evenly over the regions with a grid), and `frame` primes
+        the full-resolution diff so the next frame is analysed normally.
+        """
+        self.idle = False
+        self._quiet_since = None
+        self.motion.reset()
+        if frame is not None:
+            self.motion.update(frame)
+        self.rhythm.reset()
+        if self.regions is not None:
+            self.regions.reset()
+            share = np.empty(self.regions.blocks)
+        for t, value in self._idle_history:
+            self.rhythm.update(t, value)
+            if self.regions is not None:
+                share.fill(value / self.regions.blocks)
+                self.regions.update(t, share)
+        self._idle_history.clear()
+
+    def strongest_region(self):
+        """
+        (block index, dominant Hz) of the strongest significant region
+        above rhythm_threshold, or of the strongest region overall when
+        none is rhythmic.
+        """
+        freqs, peaks = self.regions.dominant()
+        significant = peaks >= REGION_PEAK_RATIO * peaks.max()
+        candidates = significant & (freqs > self.rhythm_threshold)
+        if candidates.any():
+            peaks = np.where(candidates, peaks, -1.0)
+        region = int(peaks.argmax())
+        return region, float(freqs[region])
+
+    def verify(self, result):
+        # Generate statistics for DL model
+        stats = {
+            "avg_motion": self.rhythm.mean,
+            "max_motion": self.rhythm.max,
+            "dominant_freq": result["dominant_freq"],
+            "dominant_index": verifier_frequency(result["dominant_freq"]),
+            "duration": self.seizure_duration,  # seconds, from capture timestamps
+            "onnx_score": None
+        }
+        result["stats"] = stats
+
+        if self.verifier is None:
+            result["verdict"] = "unverified"
+            self.seizure_logged = True
+            return
+
+        dl_verified, onnx_score = self.verifier(
+            stats["avg_motion"],
+            stats["max_motion"],
+            stats["dominant_index"],
+            stats["duration"]
+        )
+        stats["onnx_score"] = onnx_score
+
+        if dl_verified:
+            result["verdict"] = "confirmed"
+            self.seizure_logged = True
+        else:
+            result["verdict"] = "false_positive"
+
+    def reset(self):
+        self.motion.reset()
+        self.rhythm.reset()
+        if self.regions is not None:
+            self.regions.reset()
+        self.prev_time = None
+        self.seizure_frames = 0
+        self.seizure_duration = 0.0
+        self.seizure_logged = False
+        self.idle = False
+        self.idle_motion.reset()
+        self._quiet_since = None
+        self._idle_history.clear()
@@ -0,0 +1,483 @@
+import os
+import re
+import sys
+import subprocess
+import threading
+import time
+import psutil
+
+from heartbeat import read_heartbeat
+from detector_control import ControlServer, LIVE_CONFIG_KEYS
+
+DETECTOR_SCRIPT = "final_seizure_detector.py"
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Per-camera settings accepted by /camera/<id>/start
+CONFIG_KEYS = (
+    "source",
+    "width",
+    "height",
+    "fps",
+    "motion_threshold",
+    "rhythm_threshold",
+    "seizure_frame_threshold",
+    "motion_downscale",
+    "motion_grid",
+    "idle_threshold",
+    "firebase_path"
+)
+
+# Supervision (heartbeat based)
+SUPERVISE_INTERVAL = 2.0     # seconds between health checks
+STARTUP_GRACE = 30.0         # model load + camera open before the first frame
+STALL_TIMEOUT = 15.0         # no analysed frame for this long -> stalled
+RESTART_BACKOFF = 2.0        # first wait between restarts, doubled each time
+MAX_RESTART_BACKOFF = 120.0
+HEALTHY_RESET = 60.0         # healthy this long after a start -> backoff resets
+
+# Standby detectors kept loaded (imports, Firebase, ONNX session) so a
+# start only has to open the camera
+WARM_SPARES = 1
+
+
+# Camera IDs end up in Firebase keys (which forbid . # $ [ ]) and in file
+# names, so only plain names are accepted
+CAMERA_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+FIREBASE_PATH_PATTERN = re.compile(r"([A-Za-z0-9_-]+(/[A-Za-z0-9_-]+)*)?")
+
+
+def validate_camera_id(camera_id):
+    """
+    Raises ValueError unless camera_id is 1-64 letters, digits, _ or -
+    """
+    if not CAMERA_ID_PATTERN.fullmatch(str(camera_id)):
+        raise ValueError(f"Invalid camera id {camera_id!r}: use 1-64 letters, digits, '_' or '-'")
+
+
+def validate_firebase_path(path):
+    if not FIREBASE_PATH_PATTERN.fullmatch(str(path).strip("/")):
+        raise ValueError(f"Invalid firebase_path {path!r}: use '/'-separated letters, digits, '_' or '-'")
+
+
+def default_firebase_path(camera_id):
+    """
+    Camera "0" keeps writing to the root paths the dashboard already
+    reads; every other camera gets its own sub-tree.
+    """
+    return "" if str(camera_id) == "0" else f"cameras/{camera_id}"
+
+
+def detector_env(control):
+    env = dict(os.environ)
+    if control is not None:
+        env.update(control.env())
+    return env
+
+
+# -------------------------------
+# Standby detector (warm spare)
+# -------------------------------
+class StandbyDetector:
+    """
+    final_seizure_detector.py --standby: fully loaded and connected to
+    the control channel, waiting to be handed a camera.
+    """
+
+    def __init__(self, control):
+        self.control = control
+        self.process = subprocess.Popen([sys.executable, DETECTOR_SCRIPT, "--standby"],
+                                        cwd=BASE_DIR, env=detector_env(control))
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def is_ready(self):
+        return self.is_alive() and self.control.connected(self.process.pid)
+
+    def stop(self, timeout=5):
+        if self.is_alive():
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.control.discard(self.process.pid)
+
+
+# -------------------------------
+# One detector subprocess
+# -------------------------------
+class DetectorWorker:
+    def __init__(self, camera_id, config, cpu_core=None, control=None):
+        self.camera_id = str(camera_id)
+        self.config = config
+        self.cpu_core = cpu_core
+        self.control = control
+        self.process = None
+        self.warm = False            # last start used a standby detector
+
+        self.wanted = False          # started and not stopped through the API
+        self.started_at = None
+        self.restarts = 0
+        self.backoff = RESTART_BACKOFF
+        self.next_restart = 0.0
+        self.last_failure = None
+
+    @property
+    def firebase_path(self):
+        return self.config.get("firebase_path", default_firebase_path(self.camera_id))
+
+    def command(self):
+        config = self.config
+        cmd = [
+            sys.executable, DETECTOR_SCRIPT,
+            "--camera-id", self.camera_id,
+            "--source", str(config.get("source", self.camera_id)),
+            "--firebase-path", self.firebase_path
+        ]
+        for key in ("width", "height", "fps", "motion_threshold", "rhythm_threshold",
+                    "seizure_frame_threshold", "motion_downscale", "motion_grid", "idle_threshold"):
+            if key in config:
+                cmd += ["--" + key.replace("_", "-"), str(config[key])]
+        if self.cpu_core is not None:
+            # One core per worker: keep OpenCV from oversubscribing it
+            cmd += ["--threads", "1"]
+        return cmd
+
+    def start(self, standby=None):
+        """
+        Hand the camera to `standby` (a ready StandbyDetector) if given,
+        otherwise spawn a fresh detector process.
+        """
+        self.wanted = True
+        self.started_at = time.monotonic()
+        self.warm = False
+        if standby is not None:
+            try:
+                reply = self.control.request(standby.process.pid, {"cmd": "start", "argv": self.command()[2:]})
+                self.warm = reply.get("ok", False)
+            except RuntimeError as e:
+                print(f"Warning: standby detector unusable for camera {self.camera_id}: {e}")
+            if self.warm:
+                self.process = standby.process
+            else:
+                standby.stop(timeout=2)
+        if not self.warm:
+            self.process = subprocess.Popen(self.command(), cwd=BASE_DIR, env=detector_env(self.control))
+        if self.cpu_core is not None:
+            try:
+                psutil.Process(self.process.pid).cpu_affinity([self.cpu_core])
+            except (AttributeError, psutil.Error) as e:
+                # cpu_affinity is not available on macOS
+                print(f"Warning: could not pin camera {self.camera_id} to core {self.cpu_core}: {e}")
+        return self.process.pid
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self, timeout=5):
+        self.wanted = False
+        self._terminate(timeout)
+
+    def connected(self):
+        return self.control is not None and self.is_running() and self.control.connected(self.process.pid)
+
+    def reconfigure(self, config):
+        """
+        Apply LIVE_CONFIG_KEYS settings to the running detector in place.
+        Returns False if it cannot be reached (caller restarts instead).
+        """
+        if not self.connected():
+            return False
+        try:
+            reply = self.control.request(self.process.pid, {"cmd": "reconfigure", "config": config})
+        except RuntimeError as e:
+            print(f"Warning: could not reconfigure camera {self.camera_id}: {e}")
+            return False
+        return reply.get("ok", False)
+
+    def _terminate(self, timeout=5):
+        if self.is_running():
+            self._shutdown(timeout)
+        if self.control is not None and self.process is not None:
+            self.control.discard(self.process.pid)
+
+    def _shutdown(self, timeout):
+        if self.connected():
+            # Ask over the control channel first, SIGTERM as the fallback
+            try:
+                self.control.request(self.process.pid, {"cmd": "stop"}, timeout=1.0)
+                self.process.wait(timeout=timeout)
+                return
+            except (RuntimeError, subprocess.TimeoutExpired):
+                pass
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def heartbeat(self):
+        """
+        This process's heartbeat, ignoring a stale file from an earlier one
+        """
+        heartbeat = read_heartbeat(self.camera_id)
+        if heartbeat is None or self.process is None or heartbeat["pid"] != self.process.pid:
+            return None
+        return heartbeat
+
+    def health(self, heartbeat=None):
+        """
+        "stopped", "starting", "healthy", "stalled", "exited" (crashed or
+        killed: nonzero or negative exit code) or "finished" (exit code 0:
+        end of a video file, 'q' or a normal shutdown)
+        """
+        if not self.wanted:
+            return "stopped"
+        if not self.is_running():
+            return "finished" if self.process.returncode == 0 else "exited"
+        heartbeat = heartbeat or self.heartbeat()
+        if heartbeat is None or heartbeat["last_frame"] is None:
+            starting = time.monotonic() - self.started_at < STARTUP_GRACE
+            return "starting" if starting else "stalled"
+        return "healthy" if heartbeat["frame_age"] < STALL_TIMEOUT else "stalled"
+
+    def restart(self, standby=None):
+        self._terminate(timeout=2)
+        self.start(standby)
+        self.restarts += 1
+
+    def status(self):
+        running = self.is_running()
+        heartbeat = self.heartbeat() if running else None
+        return {
+            "camera_id": self.camera_id,
+            "status": "running" if running else "stopped",
+            "running": running,
+            "pid": self.process.pid if running else None,
+            "cpu_core": self.cpu_core,
+            "exit_code": None if self.process is None or running else self.process.returncode,
+            "health": self.health(heartbeat),
+            "frames": heartbeat["frames"] if heartbeat else None,
+            "last_frame_age": heartbeat["frame_age"] if heartbeat and heartbeat["last_frame"] else None,
+            "restarts": self.restarts,
+            "warm_start": self.warm,
+            "last_failure": self.last_failure,
+            "config": self.config
+        }
+
+
+# -------------------------------
+# Pool of detectors keyed by camera ID
+# -------------------------------
+class DetectorPool:
+    """
+    Manages one detector subprocess per camera and spreads them over
+    the available CPU cores (least-loaded core first).
+
+    A supervisor thread (started with the first worker) reads every
+    worker's heartbeat and restarts workers that crashed (nonzero exit
+    code) or stopped producing frames, waiting RESTART_BACKOFF seconds after a restart
+    before the next one and doubling that up to MAX_RESTART_BACKOFF.
+
+    Every detector is connected to the pool's control channel. With
+    keep_warm(n) the pool also keeps n standby detectors loaded; start()
+    and restarts hand the camera to a ready one (and load a replacement
+    in the background), so they skip the imports, Firebase / Twilio setup
+    and ONNX session creation and only wait for the camera to open.
+    """
+
+    def __init__(self, cpu_cores=None):
+        if cpu_cores is None:
+            cpu_cores = list(range(psutil.cpu_count(logical=True) or 1))
+        self.cpu_cores = cpu_cores
+        self.workers = {}
+        self.spares = []
+        self.warm_spares = 0
+        self._spare_backoff = RESTART_BACKOFF
+        self._next_spare = 0.0
+        self._control = None
+        self._lock = threading.Lock()
+        self._supervisor = None
+
+    @property
+    def control(self):
+        if self._control is None:
+            self._control = ControlServer()
+        return self._control
+
+    def keep_warm(self, spares=WARM_SPARES):
+        """
+        Keep `spares` standby detectors loaded from now on
+        """
+        with self._lock:
+            self.warm_spares = spares
+            self._replenish()
+            self._ensure_supervisor()
+
+    def _replenish(self):
+        # Caller holds self._lock
+        now = time.monotonic()
+        for spare in [s for s in self.spares if not s.is_alive()]:
+            # Died while loading (e.g. missing firebase_key.json): back off
+            print(f"Warning: standby detector exited with code {spare.process.returncode}, "
+                  f"retrying in {self._spare_backoff:.0f}s")
+            spare.stop()
+            self.spares.remove(spare)
+            self._next_spare = now + self._spare_backoff
+            self._spare_backoff = min(self._spare_backoff * 2, MAX_RESTART_BACKOFF)
+        if now < self._next_spare:
+            return
+        for spare in self.spares:
+            if spare.is_ready():
+                self._spare_backoff = RESTART_BACKOFF
+        while len(self.spares) < self.warm_spares:
+            self.spares.append(StandbyDetector(self.control))
+
+    def _take_spare(self):
+        # Caller holds self._lock
+        for spare in self.spares:
+            if spare.is_ready():
+                self.spares.remove(spare)
+                self._replenish()
+                return spare
+        return None
+
+    def _pick_core(self):
+        load = {core: 0 for core in self.cpu_cores}
+        for worker in self.workers.values():
+            if worker.is_running() and worker.cpu_core in load:
+                load[worker.cpu_core] += 1
+        return min(load, key=lambda core: (load[core], core))
+
+    def is_running(self, camera_id):
+        worker = self.workers.get(str(camera_id))
+        return worker is not None and worker.is_running()
+
+    def is_supervised(self, camera_id):
+        """
+        Started through the pool and not stopped (possibly waiting for a restart)
+        """
+        worker = self.workers.get(str(camera_id))
+        return worker is not None and worker.wanted
+
+    def start(self, camera_id, config=None):
+        """
+        Start a detector for camera_id. Raises ValueError for an invalid
+        camera id or firebase_path, RuntimeError if it is already running.
+        """
+        camera_id = str(camera_id)
+        validate_camera_id(camera_id)
+        config = {k: v for k, v in (config or {}).items() if k in CONFIG_KEYS}
+        if "firebase_path" in config:
+            validate_firebase_path(config["firebase_path"])
+        with self._lock:
+            if self.is_running(camera_id):
+                raise RuntimeError(f"Camera {camera_id} is already running")
+            worker = DetectorWorker(camera_id, config, self._pick_core(), self.control)
+            worker.start(self._take_spare())
+            self.workers[camera_id] = worker
+            self._ensure_supervisor()
+            return worker
+
+    def stop(self, camera_id):
+        """
+        Stop the detector for camera_id (and its supervision). Raises
+        RuntimeError if it is not running.
+        """
+        camera_id = str(camera_id)
+        with self._lock:
+            worker = self.workers.get(camera_id)
+            if worker is None or not worker.wanted:
+                raise RuntimeError(f"Camera {camera_id} is not running")
+            worker.stop()
+            return worker
+
+    def reconfigure(self, camera_id, config):
+        """
+        Update a running camera's config. Threshold changes are applied in
+        place over the control channel ("live"); anything else (source,
+        resolution, ...) restarts the detector ("restarted"). Raises
+        RuntimeError if the camera is not running.
+        """
+        camera_id = str(camera_id)
+        config = {k: v for k, v in (config or {}).items() if k in CONFIG_KEYS}
+        with self._lock:
+            worker = self.workers.get(camera_id)
+            if worker is None or not worker.wanted:
+                raise RuntimeError(f"Camera {camera_id} is not running")
+            changed = {k: v for k, v in config.items() if worker.config.get(k) != v}
+            worker.config = dict(worker.config, **config)
+            if not changed:
+                return "unchanged"
+            if all(k in LIVE_CONFIG_KEYS for k in changed) and worker.reconfigure(changed):
+                return "live"
+            worker.restart(self._take_spare())
+            return "restarted"
+
+    def status(self, camera_id):
+        worker = self.workers.get(str(camera_id))
+        if worker is None:
+            return {
+                "camera_id": str(camera_id),
+                "status": "stopped",
+                "running": False
+            }
+        return worker.status()
+
+    def status_all(self):
+        return {camera_id: worker.status() for camera_id, worker in self.workers.items()}
+
+    # -------------------------------
+    # Supervision
+    # -------------------------------
+    def _ensure_supervisor(self):
+        # Caller holds self._lock
+        if self._supervisor is None:
+            self._supervisor = threading.Thread(target=self._supervise, name="detector_supervisor", daemon=True)
+            self._supervisor.start()
+
+    def _supervise(self):
+        while True:
+            time.sleep(SUPERVISE_INTERVAL)
+            try:
+                self.supervise_once()
+            except Exception as e:
+                print(f"Warning: detector supervision failed: {e}")
+
+    def supervise_once(self):
+        """
+        Restart exited or stalled workers (respecting their backoff).
+        Workers that finished cleanly stay down. Returns the camera IDs
+        restarted.
+        """
+        restarted = []
+        now = time.monotonic()
+        with self._lock:
+            for camera_id, worker in self.workers.items():
+                health = worker.health()
+                if health in ("exited", "stalled"):
+                    if now < worker.next_restart:
+                        continue
+                    worker.last_failure = health
+                    print(f"Camera {camera_id} {health}, restarting "
+                          f"(restart #{worker.restarts + 1}, next backoff {worker.backoff:.0f}s)")
+                    worker.restart(self._take_spare())
+                    worker.next_restart = now + worker.backoff
+                    worker.backoff = min(worker.backoff * 2, MAX_RESTART_BACKOFF)
+                    restarted.append(camera_id)
+                elif health == "healthy" and now - worker.started_at > HEALTHY_RESET:
+                    worker.backoff = RESTART_BACKOFF
+            self._replenish()
+        return restarted
+
+    def stop_all(self):
+        with self._lock:
+            for worker in self.workers.values():
+                worker.stop()
+            self.warm_spares = 0
+            for spare in self.spares:
+                spare.stop()
+            self.spares = []
@@ -0,0 +1,219 @@
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from frame_pipeline import DropOldestQueue, StageThread
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CLIP_DIR = os.path.join(BASE_DIR, "clips")
+
+CLIP_WIDTH = 480          # clip frames are downscaled to at most this width
+CLIP_FPS = 10.0           # frames kept per second
+CLIP_PRE_SECONDS = 10.0   # pre-roll kept in memory
+CLIP_POST_SECONDS = 10.0  # recorded after the confirmation
+CLIP_MEMORY_MB = 32       # ceiling for the JPEG ring (0 = no clips)
+CLIP_JPEG_QUALITY = 75
+ENCODE_QUEUE_DEPTH = 8    # resized frames waiting for the encoder
+
+
+# -------------------------------
+# Pre-event clip recorder
+# -------------------------------
+class ClipRecorder:
+    """
+    Keeps the last pre_seconds of video as reduced-resolution JPEGs in a
+    memory-bounded ring, and on trigger() writes pre-roll + post_seconds
+    of post-roll to clips/<camera>/<time>.avi in the background.
+
+    offer(frame, t) is called from the capture thread for every decoded
+    frame. It only keeps one frame per 1/fps seconds, copies it into a
+    fresh (resized) array it owns and puts that on a drop-oldest queue,
+    so it never waits for the encoder and never reads the shared frame
+    after returning. The encoder thread JPEG-encodes into the ring
+    and evicts the oldest frames beyond pre_seconds (unless a pending
+    clip still needs them) or beyond max_bytes (always). Once a clip's
+    post-roll has arrived, its frames are handed to a writer thread that
+    decodes them and writes the file, holding each frame until the next
+    one's timestamp so the clip plays back in real time. Files appear
+    under their final name only when complete.
+    """
+
+    def __init__(self, camera_id, width=CLIP_WIDTH, fps=CLIP_FPS, pre_seconds=CLIP_PRE_SECONDS,
+                 post_seconds=CLIP_POST_SECONDS, max_bytes=CLIP_MEMORY_MB * 1024 * 1024,
+                 quality=CLIP_JPEG_QUALITY, output_dir=CLIP_DIR):
+        self.name = "clips"
+        self.camera_id = str(camera_id)
+        self.width = width
+        self.fps = fps
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self.output_dir = output_dir
+
+        self.ring = deque()          # (t, jpeg bytes), oldest first
+        self.ring_bytes = 0
+        self.encoded = 0
+        self.evicted = 0
+        self.clips = 0
+        self.failed = 0
+        self._next_offer = None
+        self._size = None
+        self._pending = []           # [(start, end, name)] waiting for post-roll
+        self._lock = threading.Lock()
+        self._stopped = False
+
+        self._frames = DropOldestQueue("clip_frames", ENCODE_QUEUE_DEPTH)
+        self._clips = DropOldestQueue("clip_writes", 64)
+        self._encoder = threading.Thread(target=self._encode_loop, name="clip_encoder", daemon=True)
+        self._writer = StageThread("clip_writer", self._clips, self._write)
+        self._encoder.start()
+        self._writer.start()
+
+    # -------------------------------
+    # Capture thread side
+    # -------------------------------
+    def offer(self, frame, t):
+        period = 1.0 / self.fps
+        if self._next_offer is None:
+            self._next_offer = t + period
+        else:
+            # A quarter period of slack so a camera running at exactly
+            # `fps` with jittery timestamps is not halved
+            if t < self._next_offer - 0.25 * period:
+                return False
+            # Keep the cadence unless the camera fell behind it
+            self._next_offer = self._next_offer + period if t - self._next_offer < period else t + period
+        if self._size is None:
+            height, width = frame.shape[:2]
+            scale = min(1.0, self.width / width)
+            self._size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        # The captured frame is shared read-only with analysis and the
+        # preview, and the encoder works on this one later: always hand it
+        # a private array. INTER_LINEAR: ~10x cheaper than INTER_AREA on 720p
+        if self._size == (frame.shape[1], frame.shape[0]):
+            small = frame.copy()
+        else:
+            small = cv2.resize(frame, self._size, interpolation=cv2.INTER_LINEAR)
+        self._frames.put((t, small))
+        return True
+
+    def trigger(self, t):
+        """
+        Start a clip around capture time t. Returns its path relative to
+        the clip directory (what the event record stores), or None after
+        stop().
+        """
+        if self._stopped:
+            return None
+        name = f"{self.camera_id}/{datetime.now():%Y%m%d-%H%M%S}-{int(t * 1000) % 1000:03d}.avi"
+        with self._lock:
+            self._pending.append((t - self.pre_seconds, t + self.post_seconds, name))
+        return name
+
+    # -------------------------------
+    # Encoder thread
+    # -------------------------------
+    def _encode_loop(self):
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+        while not self._frames.closed:
+            item = self._frames.get(timeout=0.5)
+            if item is not None:
+                t, small = item
+                ok, jpeg = cv2.imencode(".jpg", small, params)
+                if ok:
+                    self.ring.append((t, jpeg.tobytes()))
+                    self.ring_bytes += len(self.ring[-1][1])
+                    self.encoded += 1
+            self._release_ready(time.monotonic(), item is None)
+            self._evict()
+        self._release_ready(float("inf"), True)
+
+    def _release_ready(self, now, idle):
+        # A clip is complete once a frame past its end is in the ring, or
+        # (camera stalled / stopping) a second after its end
+        latest = self.ring[-1][0] if self.ring else None
+        with self._lock:
+            ready = [c for c in self._pending
+                     if (latest is not None and latest >= c[1]) or (idle and now > c[1] + 1.0)]
+            self._pending = [c for c in self._pending if c not in ready]
+        for start, end, name in ready:
+            frames = [(t, jpeg) for t, jpeg in self.ring if start <= t <= end]
+            self._clips.put((name, frames))
+
+    def _evict(self):
+        with self._lock:
+            keep_from = min([c[0] for c in self._pending], default=None)
+        horizon = self.ring[-1][0] - self.pre_seconds if self.ring else 0.0
+        if keep_from is not None:
+            horizon = min(horizon, keep_from)
+        while self.ring and (self.ring_bytes > self.max_bytes or self.ring[0][0] < horizon):
+            _, jpeg = self.ring.popleft()
+            self.ring_bytes -= len(jpeg)
+            self.evicted += 1
+
+    # -------------------------------
+    # Writer thread
+    # -------------------------------
+    def _write(self, item):
+        name, frames = item
+        if not frames:
+            self.failed += 1
+            print(f"Warning: no frames buffered for clip {name}")
+            return
+        path = os.path.join(self.output_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path[:-len(".avi")] + ".part.avi"
+        first = cv2.imdecode(np.frombuffer(frames[0][1], np.uint8), cv2.IMREAD_COLOR)
+        height, width = first.shape[:2]
+        out = cv2.VideoWriter(tmp, cv2.VideoWriter_fourcc(*"MJPG"), self.fps, (width, height))
+        if not out.isOpened():
+            self.failed += 1
+            print(f"Warning: could not write clip {path}")
+            return
+        try:
+            # One output frame per 1/fps of capture time, repeating the
+            # newest frame across gaps so playback runs at real speed
+            start = frames[0][0]
+            tick = 0
+            image = first
+            for i, (t, jpeg) in enumerate(frames):
+                if i:
+                    image = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+                next_t = frames[i + 1][0] if i + 1 < len(frames) else t + 1.0 / self.fps
+                while start + tick / self.fps < next_t:
+                    out.write(image)
+                    tick += 1
+        finally:
+            out.release()
+        os.replace(tmp, path)
+        self.clips += 1
+        print(f"Event clip saved: {path} ({frames[-1][0] - frames[0][0]:.1f}s, {len(frames)} frames)")
+
+    def stop(self, timeout=15.0):
+        """
+        Finish pending clips with the frames buffered so far and wait for
+        the writer (up to timeout seconds)
+        """
+        self._stopped = True
+        self._frames.close()
+        self._encoder.join(timeout)
+        self._clips.close()
+        self._writer.join(timeout)
+
+    def stats(self):
+        return {
+            "ring_frames": len(self.ring),
+            "ring_bytes": self.ring_bytes,
+            "pending": len(self._pending),
+            "encoded": self.encoded,
+            "dropped": self._frames.dropped,
+            "evicted": self.evicted,
+            "clips": self.clips,
+            "failed": self.failed
+        }
@@ -0,0 +1,340 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from firebase_writer import generate_push_id, is_permanent_error
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,          -- 'push' (new child under path) or 'set' (replace path)
+    path TEXT NOT NULL,
+    key TEXT,                    -- push key, fixed at append time
+    payload TEXT NOT NULL,       -- JSON
+    created REAL NOT NULL,
+    synced INTEGER NOT NULL DEFAULT 0   -- 0 pending, 1 synced, 2 rejected (quarantined)
+);
+CREATE INDEX IF NOT EXISTS journal_unsynced ON journal (synced, id);
+CREATE TABLE IF NOT EXISTS sync_lease (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    owner TEXT NOT NULL,         -- "<pid>:<instance>" of the process uploading
+    expires REAL NOT NULL
+);
+"""
+
+# Longer than any single upload can take (firebase_admin's default HTTP
+# timeout is 120 s), so a lease never lapses while its holder's upload is
+# still in flight
+LEASE_SECONDS = 300.0
+
+PENDING, SYNCED, REJECTED = 0, 1, 2
+
+
+# -------------------------------
+# Durable local journal
+# -------------------------------
+class EventJournal:
+    """
+    Append-only SQLite journal (WAL mode) of writes destined for Firebase.
+
+    append() is a single local INSERT, so confirmed events and heartbeats
+    are recorded even when the network is down. A background syncer
+    uploads unsynced rows in batches as one multi-location update and
+    marks them synced only after the update succeeds.
+
+    Push keys are generated and stored at append time, so re-uploading a
+    row after a crash or restart writes the same child again: syncing is
+    idempotent. For 'set' rows only the newest unsynced value per path is
+    uploaded.
+
+    Processes sharing the file take turns through a lease row: only the
+    holder uploads, so a slow upload can never land after a newer batch
+    from another process and roll a 'set' node (e.g. a rollup count)
+    back. The holder renews the lease every sync; others take it over
+    once it expires or its process has exited, and meanwhile leave their
+    rows to the holder (picked up within sync_interval).
+
+    A batch the server rejects as invalid (is_permanent_error) is split
+    in halves and retried until the offending rows are isolated; those
+    are marked rejected (synced = 2) and skipped, so one bad row never
+    holds up the events queued behind it. Other errors back off and
+    retry the whole batch.
+
+    update_fn(updates) performs the upload, e.g.
+    lambda updates: db.reference("/").update(updates)
+    timings, if set, gets observe("journal_sync", seconds) per upload.
+    """
+
+    def __init__(self, path, update_fn, batch_size=200, sync_interval=2.0,
+                 max_backoff=60.0, set_retention=3600.0):
+        self.name = "journal"
+        self.path = path
+        self.update_fn = update_fn
+        self.batch_size = batch_size
+        self.sync_interval = sync_interval
+        self.max_backoff = max_backoff
+        self.set_retention = set_retention
+        self.timings = None
+
+        self.owner = f"{os.getpid()}:{id(self):x}"
+        self._local = threading.local()
+        self._sync_lock = threading.Lock()  # one upload at a time within the process too
+        self._wake = threading.Event()
+        self._idle = threading.Condition()
+        self._thread = None
+
+        self.appended = 0
+        self.uploaded = 0
+        self.batches = 0
+        self.failures = 0
+        self.rejected = 0
+        self.last_error = ""
+        self.last_sync = None
+
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        # SQLite connections are per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.in_transaction = False
+        return conn
+
+    def append(self, path, payload, kind="push"):
+        """
+        Record a write. Returns the push key (None for kind='set').
+        """
+        key = generate_push_id() if kind == "push" else None
+        self._connection().execute(
+            "INSERT INTO journal (kind, path, key, payload, created) VALUES (?, ?, ?, ?, ?)",
+            (kind, path.strip("/"), key, json.dumps(payload), time.time())
+        )
+        self.appended += 1
+        self._ensure_started()
+        if kind == "push" and not self._local.in_transaction:
+            # Events go out right away; state rows ride along with the next sync
+            self._wake.set()
+        return key
+
+    @contextmanager
+    def transaction(self):
+        """
+        Make every append() (and any statement on the yielded connection)
+        in the block one atomic SQLite transaction, e.g. an event and the
+        rollups it updates. BEGIN IMMEDIATE takes the write lock up front,
+        so read-modify-write sequences are safe across processes sharing
+        the journal file.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.in_transaction = True
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+        finally:
+            self._local.in_transaction = False
+        self._wake.set()
+
+    # -------------------------------
+    # Background sync
+    # -------------------------------
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="journal_sync", daemon=True)
+            self._thread.start()
+
+    def start(self):
+        """
+        Start syncing rows left over from a previous run
+        """
+        self._ensure_started()
+        self._wake.set()
+
+    def _acquire_lease(self, conn):
+        """
+        Take or renew the sync lease. False while another live process
+        holds it.
+        """
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT owner, expires FROM sync_lease WHERE id = 1").fetchone()
+            if row is not None and row[0] != self.owner and row[1] > now and _process_alive(row[0]):
+                return False
+            conn.execute("INSERT OR REPLACE INTO sync_lease (id, owner, expires) VALUES (1, ?, ?)",
+                         (self.owner, now + LEASE_SECONDS))
+            return True
+        finally:
+            conn.execute("COMMIT")
+
+    def _next_batch(self, conn):
+        return conn.execute(
+            "SELECT id, kind, path, key, payload FROM journal WHERE synced = 0 ORDER BY id LIMIT ?",
+            (self.batch_size,)
+        ).fetchall()
+
+    @staticmethod
+    def _updates(rows):
+        updates = {}
+        for _, kind, path, key, payload in rows:
+            if kind == "push":
+                updates[f"{path}/{key}"] = json.loads(payload)
+            else:
+                updates[path] = json.loads(payload)  # newest row wins
+        return updates
+
+    def _mark(self, conn, rows, state):
+        conn.executemany("UPDATE journal SET synced = ? WHERE id = ?", [(state, row[0]) for row in rows])
+
+    def _upload(self, conn, rows):
+        """
+        Upload rows in order; a rejected multi-row batch is bisected and
+        rejected single rows are quarantined. Transient errors propagate.
+        """
+        start = time.perf_counter()
+        try:
+            self.update_fn(self._updates(rows))
+        except Exception as e:
+            if not is_permanent_error(e):
+                raise
+            if len(rows) > 1:
+                middle = len(rows) // 2
+                self._upload(conn, rows[:middle])
+                self._upload(conn, rows[middle:])
+                return
+            self._mark(conn, rows, REJECTED)
+            self.rejected += 1
+            self.last_error = str(e)
+            print(f"Warning: journal row {rows[0][0]} ({rows[0][2]}) rejected by Firebase, skipped: {e}")
+            return
+        if self.timings is not None:
+            self.timings.observe("journal_sync", time.perf_counter() - start)
+        self._mark(conn, rows, SYNCED)
+        self.uploaded += len(rows)
+        self.batches += 1
+        self.last_sync = time.time()
+
+    def sync_once(self):
+        """
+        Upload one batch. Returns the number of rows it settled (synced or
+        rejected).
+        """
+        with self._sync_lock:
+            conn = self._connection()
+            if not self._acquire_lease(conn):
+                return 0
+            rows = self._next_batch(conn)
+            if rows:
+                self._upload(conn, rows)
+            return len(rows)
+
+    def _prune(self, conn):
+        # Superseded state rows are only useful for a while; events are kept
+        conn.execute(
+            "DELETE FROM journal WHERE kind = 'set' AND synced = 1 AND created < ?",
+            (time.time() - self.set_retention,)
+        )
+
+    def _run(self):
+        backoff = self.sync_interval
+        while True:
+            self._wake.wait(backoff * random.uniform(0.8, 1.2))
+            self._wake.clear()
+            try:
+                while self.sync_once() == self.batch_size:
+                    pass
+                self._prune(self._connection())
+                backoff = self.sync_interval
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                print(f"Warning: journal sync failed, retrying in {backoff:.1f}s: {e}")
+                backoff = min(backoff * 2, self.max_backoff)
+            with self._idle:
+                self._idle.notify_all()
+
+    def pending(self):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM journal WHERE synced = 0"
+        ).fetchone()[0]
+
+    def flush(self, timeout=10.0):
+        """
+        Wait until every row appended so far is synced. Returns False on
+        timeout (rows stay in the journal and sync on the next run).
+        """
+        deadline = time.monotonic() + timeout
+        while self.pending():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._ensure_started()
+            self._wake.set()
+            with self._idle:
+                self._idle.wait(min(remaining, 0.5))
+        return True
+
+    # -------------------------------
+    # Reading back
+    # -------------------------------
+    def iter_entries(self, path=None, kind="push", chunk_size=1000):
+        """
+        Yield (key, payload) for journal rows in append order, chunk_size
+        rows per query, optionally limited to one path.
+        """
+        conn = self._connection()
+        last_id = 0
+        while True:
+            query = "SELECT id, key, payload FROM journal WHERE id > ? AND kind = ?"
+            params = [last_id, kind]
+            if path is not None:
+                query += " AND path = ?"
+                params.append(path.strip("/"))
+            rows = conn.execute(query + " ORDER BY id LIMIT ?", params + [chunk_size]).fetchall()
+            if not rows:
+                return
+            for row_id, key, payload in rows:
+                yield key, json.loads(payload)
+            last_id = rows[-1][0]
+
+    def paths(self, kind="push"):
+        """
+        Every distinct path with journaled rows of this kind
+        """
+        return [row[0] for row in self._connection().execute(
+            "SELECT DISTINCT path FROM journal WHERE kind = ? ORDER BY path", (kind,)
+        )]
+
+    def stats(self):
+        return {
+            "pending": self.pending(),
+            "appended": self.appended,
+            "uploaded": self.uploaded,
+            "batches": self.batches,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "last_error": self.last_error
+        }
+
+
+def _process_alive(owner):
+    # Lease owners are "<pid>:<instance>" on this machine (the file is local)
+    try:
+        os.kill(int(owner.split(":")[0]), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        pass
+    return True
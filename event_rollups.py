@@ -0,0 +1,214 @@
+import argparse
+import json
+from collections import deque
+from datetime import datetime
+
+ROLLUP_PATH = "seizure_rollups"
+EVENTS_PATH = "seizure_events"
+RECENT_EVENTS = 20  # newest events kept in the recent index
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollups (
+    path TEXT PRIMARY KEY,       -- e.g. cameras/2/seizure_rollups/daily/2024-05-01
+    value TEXT NOT NULL          -- JSON, exactly what was written to Firebase
+);
+"""
+
+
+# -------------------------------
+# Buckets
+# -------------------------------
+def bucket_paths(rollup_path, event):
+    """
+    Hourly, daily and per-camera bucket paths an event counts towards:
+
+        <rollup_path>/hourly/2024-05-01T14
+        <rollup_path>/daily/2024-05-01
+        <rollup_path>/cameras/<camera_id>
+    """
+    try:
+        when = datetime.strptime(event.get("timestamp", ""), "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        when = None
+    paths = []
+    if when is not None:
+        paths.append(f"{rollup_path}/hourly/{when:%Y-%m-%dT%H}")
+        paths.append(f"{rollup_path}/daily/{when:%Y-%m-%d}")
+    paths.append(f"{rollup_path}/cameras/{event.get('camera_id', '0')}")
+    return paths
+
+
+def add_to_bucket(bucket, key, event):
+    """
+    Bucket dict with one more event counted
+    """
+    bucket = dict(bucket or {"count": 0, "total_duration": 0.0, "max_score": 0.0})
+    bucket["count"] += 1
+    bucket["total_duration"] = round(bucket["total_duration"] + float(event.get("duration_seconds", 0) or 0), 3)
+    bucket["max_score"] = max(bucket["max_score"], float(event.get("onnx_score", 0) or 0))
+    bucket["last_event"] = key
+    bucket["last_timestamp"] = event.get("timestamp", "")
+    return bucket
+
+
+def event_summary(event):
+    # What the recent index keeps per event (the full event stays in seizure_events)
+    return {
+        "timestamp": event.get("timestamp", ""),
+        "camera_id": event.get("camera_id", "0"),
+        "duration_seconds": float(event.get("duration_seconds", 0) or 0),
+        "onnx_score": float(event.get("onnx_score", 0) or 0)
+    }
+
+
+# -------------------------------
+# Incremental rollups
+# -------------------------------
+class EventRollups:
+    """
+    Hourly, daily and per-camera aggregates (count, total_duration,
+    max_score, last event) plus an index of the RECENT_EVENTS newest
+    events, maintained next to the events they summarise:
+
+        <base>/seizure_events/<key>              full events (unbounded)
+        <base>/seizure_rollups/hourly/<hour>     aggregates
+        <base>/seizure_rollups/daily/<day>
+        <base>/seizure_rollups/cameras/<id>
+        <base>/seizure_rollups/recent/<key>      newest events only
+
+    so the dashboard's summary views read a few small nodes instead of
+    the whole history.
+
+    Current values live in a `rollups` table of the journal's SQLite
+    file. add() runs inside journal.transaction(): it updates that table
+    and journals every changed node as a 'set' row right after the event
+    itself. The rows commit together and upload in order, normally in
+    the same multi-location update, so Firebase never has rollups for an
+    event it does not have. BEGIN IMMEDIATE serialises detectors that
+    share the journal file, so counts never race.
+    """
+
+    def __init__(self, journal, recent=RECENT_EVENTS):
+        self.journal = journal
+        self.recent = recent
+        with journal.transaction() as conn:
+            conn.execute(SCHEMA)
+
+    def _get(self, conn, path):
+        row = conn.execute("SELECT value FROM rollups WHERE path = ?", (path,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _put(self, conn, path, value):
+        conn.execute("INSERT OR REPLACE INTO rollups (path, value) VALUES (?, ?)", (path, json.dumps(value)))
+        self.journal.append(path, value, kind="set")
+
+    def log_event(self, events_path, event):
+        """
+        Journal `event` under events_path with its rollup updates, in one
+        transaction. Returns the event's push key.
+        """
+        with self.journal.transaction() as conn:
+            key = self.journal.append(events_path, event)
+            self.add(conn, rollup_path_for(events_path), key, event)
+        return key
+
+    def add(self, conn, rollup_path, key, event):
+        for path in bucket_paths(rollup_path, event):
+            self._put(conn, path, add_to_bucket(self._get(conn, path), key, event))
+
+        recent_path = f"{rollup_path}/recent"
+        recent = self._get(conn, recent_path) or {}
+        recent[key] = event_summary(event)
+        # Push keys sort in creation order
+        for old in sorted(recent)[:-self.recent]:
+            del recent[old]
+        self._put(conn, recent_path, recent)
+
+    # -------------------------------
+    # Rebuild from the journal
+    # -------------------------------
+    def rebuild(self, events_path, chunk_size=1000):
+        """
+        Recompute every rollup of events_path from the journaled events,
+        reading chunk_size rows at a time, and journal the result: changed
+        nodes are set, nodes that no longer have events are removed.
+        Returns (events, nodes written, nodes removed).
+
+        Events logged while the scan runs are not in its totals, so run it
+        with the detectors stopped (or run it again afterwards).
+        """
+        rollup_path = rollup_path_for(events_path)
+        buckets = {}
+        recent = deque(maxlen=self.recent)
+        events = 0
+        for key, event in self.journal.iter_entries(events_path, chunk_size=chunk_size):
+            events += 1
+            for path in bucket_paths(rollup_path, event):
+                buckets[path] = add_to_bucket(buckets.get(path), key, event)
+            recent.append((key, event_summary(event)))
+        if recent:
+            buckets[f"{rollup_path}/recent"] = dict(recent)
+
+        written = removed = 0
+        with self.journal.transaction() as conn:
+            old = dict(conn.execute(
+                "SELECT path, value FROM rollups WHERE path LIKE ?", (f"{rollup_path}/%",)
+            ).fetchall())
+            for path in old.keys() - buckets.keys():
+                conn.execute("DELETE FROM rollups WHERE path = ?", (path,))
+                self.journal.append(path, None, kind="set")
+                removed += 1
+            for path, value in buckets.items():
+                if old.get(path) != json.dumps(value):
+                    self._put(conn, path, value)
+                    written += 1
+        return events, written, removed
+
+
+def rollup_path_for(events_path):
+    # cameras/2/seizure_events -> cameras/2/seizure_rollups
+    base = events_path.strip("/").rpartition("/")[0]
+    return f"{base}/{ROLLUP_PATH}" if base else ROLLUP_PATH
+
+
+# -------------------------------
+# CLI: rebuild
+# -------------------------------
+def parse_args():
+    parser = argparse.ArgumentParser(description="Rebuild seizure_rollups from the local event journal")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute the rollups and upload them")
+    parser.add_argument("--firebase-path", default=None,
+                        help="Only this base path (default: every base path with journaled events)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Journal rows read per query")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not args.rebuild:
+        print("Nothing to do: pass --rebuild")
+        return
+
+    from firebase_logger import get_journal, get_rollups, flush
+
+    journal = get_journal()
+    rollups = get_rollups()
+
+    if args.firebase_path is not None:
+        base = args.firebase_path.strip("/")
+        paths = [f"{base}/{EVENTS_PATH}" if base else EVENTS_PATH]
+    else:
+        paths = [p for p in journal.paths() if p == EVENTS_PATH or p.endswith(f"/{EVENTS_PATH}")]
+
+    for events_path in paths:
+        events, written, removed = rollups.rebuild(events_path, args.chunk_size)
+        print(f"{events_path}: {events} events -> {written} rollup nodes written, {removed} removed")
+
+    if flush(timeout=60):
+        print("✅ Rollups uploaded")
+    else:
+        print("❌ Upload not finished; the journal will retry on the next run")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from detector_core import (
+    HybridDetector, MOTION_THRESHOLD, RHYTHM_THRESHOLD, SEIZURE_FRAME_THRESHOLD, ANALYSIS_RATE, RHYTHM_WINDOW,
+    IDLE_THRESHOLD, verifier_frequency
+)
+from replay import find_videos, iter_frames, video_fps
+
+# Video label from the name of the folder it sits in
+LABEL_DIRS = {"seizure": 1, "seizures": 1, "1": 1, "normal": 0, "0": 0}
+
+CACHE_DIR = ".feature_cache"
+FEATURES_VERSION = 3    # bump when the extraction logic changes (invalidates the cache)
+WINDOW_HOP = 2.0        # seconds between periodic feature windows
+SHARD_ROWS = 100_000
+
+# Seizure videos are labelled per window from <video>.events.json:
+#   {"events": [[start, end], ...]}   seconds from the start of the video
+# A window is seizure (1) when at least MIN_OVERLAP of it lies inside an
+# event, normal (0) when none of it does, and dropped in between. Windows
+# of videos under normal/ are all 0; seizure videos without annotations
+# are skipped, since most of a seizure recording is usually calm.
+ANNOTATION_SUFFIX = ".events.json"
+MIN_OVERLAP = 0.5
+
+
+def video_label(path):
+    for part in reversed(os.path.normpath(path).split(os.sep)[:-1]):
+        label = LABEL_DIRS.get(part.lower())
+        if label is not None:
+            return label
+    return None
+
+
+def content_hash(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_annotations(video_path):
+    """
+    [(start, end), ...] annotated event spans in seconds, or None when
+    the video has no annotation file
+    """
+    path = os.path.splitext(video_path)[0] + ANNOTATION_SUFFIX
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return [(float(start), float(end)) for start, end in json.load(f)["events"]]
+
+
+def window_labels(spans, label, events, min_overlap=MIN_OVERLAP):
+    """
+    Label per row from its (start, end) time span: 1 / 0 / -1 (dropped),
+    following the rule above
+    """
+    if label == 0:
+        return np.zeros(len(spans), dtype=np.int32)
+    overlap = np.zeros(len(spans))
+    for start, end in events:
+        overlap += np.clip(np.minimum(spans[:, 1], end) - np.maximum(spans[:, 0], start), 0.0, None)
+    fraction = overlap / np.maximum(spans[:, 1] - spans[:, 0], 1e-9)
+    return np.where(fraction >= min_overlap, 1, np.where(fraction > 0, -1, 0)).astype(np.int32)
+
+
+def cache_key(video_hash, params):
+    settings = json.dumps(dict(params, version=FEATURES_VERSION), sort_keys=True)
+    return hashlib.sha256(f"{video_hash}:{settings}".encode()).hexdigest()[:32]
+
+
+# -------------------------------
+# Features of one video
+# -------------------------------
+def extract_video(video_path, window_hop=WINDOW_HOP, motion_threshold=MOTION_THRESHOLD,
+                  rhythm_threshold=RHYTHM_THRESHOLD, seizure_frame_threshold=SEIZURE_FRAME_THRESHOLD,
+                  idle_threshold=IDLE_THRESHOLD):
+    """
+    Run the live detector's steps 1-3 over a video and return
+    (features, spans): an (n, 4) float32 array of [avg_motion,
+    max_motion, dominant_freq, duration] (dominant_freq on the verifier's
+    bin-index scale, as in verify()) and the (n, 2) [start, end] seconds
+    each row's statistics cover (the rhythm window, or the rule's
+    duration when longer):
+      - one row each time the rule-based stage fires, with exactly the
+        statistics the live detector would pass to the verifier
+      - one row every window_hop seconds once the rhythm window is full,
+        with the same statistics at that moment (duration = how long the
+        rule has held so far, usually 0 in normal footage)
+    Idle mode samples static stretches like the live detector does
+    (idle_threshold=None or 0 analyses every frame).
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"could not open {video_path}")
+    fps = video_fps(cap)
+    detector = HybridDetector(
+        None,
+        motion_threshold=motion_threshold,
+        rhythm_threshold=rhythm_threshold,
+        seizure_frame_threshold=seizure_frame_threshold,
+        idle_threshold=idle_threshold
+    )
+
+    window = RHYTHM_WINDOW / ANALYSIS_RATE
+    rows = []
+    spans = []
+    next_window = None
+    last_analysed = None
+
+    def idle_skip(t):
+        return detector.idle and t - last_analysed < detector.idle_interval
+
+    for _, t, frame in iter_frames(cap, fps, skip=idle_skip):
+        if frame is None:
+            continue
+        last_analysed = t
+        result = detector.process(frame, t, 1.0 / fps)
+        if result is None:
+            continue
+        if result["verdict"] is not None:
+            stats = result["stats"]
+            rows.append((stats["avg_motion"], stats["max_motion"], stats["dominant_index"], stats["duration"]))
+            spans.append((t - max(window, stats["duration"]), t))
+        if window_hop and detector.rhythm.ready:
+            if next_window is None:
+                next_window = t
+            if t >= next_window:
+                rows.append((detector.rhythm.mean, detector.rhythm.max,
+                             verifier_frequency(result["dominant_freq"]), result["seizure_duration"]))
+                spans.append((t - max(window, result["seizure_duration"]), t))
+                next_window += window_hop
+    cap.release()
+    return np.array(rows, dtype=np.float32).reshape(-1, 4), np.array(spans, dtype=np.float64).reshape(-1, 2)
+
+
+def _extract_job(job):
+    video_path, params, cache_dir = job
+    cv2.setNumThreads(1)  # one video per worker process
+    try:
+        key = cache_key(content_hash(video_path), params)
+        cache_path = os.path.join(cache_dir, f"{key}.npy")
+        if os.path.exists(cache_path):
+            cached = np.load(cache_path)  # features and spans side by side
+            return video_path, cached[:, :4].astype(np.float32), cached[:, 4:], True, None
+        features, spans = extract_video(video_path, **params)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{cache_path}.{os.getpid()}.tmp.npy"
+        np.save(tmp, np.hstack([features.astype(np.float64), spans]))
+        os.replace(tmp, cache_path)
+        return video_path, features, spans, False, None
+    except Exception as e:
+        return video_path, None, None, False, str(e)
+
+
+# -------------------------------
+# Sharded dataset
+# -------------------------------
+def write_shards(output_dir, parts, shard_rows=SHARD_ROWS):
+    """
+    parts: iterable of (features, labels). Writes X-00000.npy /
+    y-00000.npy ... with at most shard_rows rows each, plus manifest.json.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    for name in os.listdir(output_dir):
+        if name.endswith(".npy") and name[:2] in ("X-", "y-"):
+            os.remove(os.path.join(output_dir, name))
+
+    shards = []
+    buffer_X, buffer_y, buffered = [], [], 0
+
+    def flush():
+        nonlocal buffer_X, buffer_y, buffered
+        if not buffered:
+            return
+        index = len(shards)
+        X = np.concatenate(buffer_X)
+        y = np.concatenate(buffer_y)
+        np.save(os.path.join(output_dir, f"X-{index:05d}.npy"), X)
+        np.save(os.path.join(output_dir, f"y-{index:05d}.npy"), y)
+        shards.append({"x": f"X-{index:05d}.npy", "y": f"y-{index:05d}.npy", "rows": len(y)})
+        buffer_X, buffer_y, buffered = [], [], 0
+
+    for features, labels in parts:
+        while len(features):
+            take = min(shard_rows - buffered, len(features))
+            buffer_X.append(features[:take])
+            buffer_y.append(labels[:take])
+            buffered += take
+            features, labels = features[take:], labels[take:]
+            if buffered >= shard_rows:
+                flush()
+    flush()
+    return shards
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Extract verifier features from labelled videos (folders named seizure/ and normal/; "
+                    f"seizure videos need {ANNOTATION_SUFFIX} event spans)"
+    )
+    parser.add_argument("inputs", nargs="+", help="Video files or directories")
+    parser.add_argument("--output", default="dataset", help="Directory for the sharded dataset")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--shard-rows", type=int, default=SHARD_ROWS)
+    parser.add_argument("--window-hop", type=float, default=WINDOW_HOP,
+                        help="Seconds between periodic feature windows (0 = rule triggers only)")
+    parser.add_argument("--motion-threshold", type=int, default=MOTION_THRESHOLD)
+    parser.add_argument("--rhythm-threshold", type=float, default=RHYTHM_THRESHOLD)
+    parser.add_argument("--seizure-frame-threshold", type=int, default=SEIZURE_FRAME_THRESHOLD)
+    parser.add_argument("--idle-threshold", type=int, default=IDLE_THRESHOLD,
+                        help="Idle mode wake threshold, as in the live detector (0 = never idle)")
+    parser.add_argument("--min-overlap", type=float, default=MIN_OVERLAP,
+                        help="Fraction of a window inside an annotated event for it to count as seizure")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    videos = []
+    for video in find_videos(args.inputs):
+        label = video_label(video)
+        if label is None:
+            print(f"Warning: no label for {video} (put it under seizure/ or normal/), skipping")
+            continue
+        events = load_annotations(video)
+        if label == 1 and events is None:
+            print(f"Warning: no {ANNOTATION_SUFFIX} event spans for seizure video {video}, skipping")
+            continue
+        videos.append((video, label, events))
+    if not videos:
+        print("No labelled videos found")
+        return
+
+    params = {
+        "window_hop": args.window_hop,
+        "motion_threshold": args.motion_threshold,
+        "rhythm_threshold": args.rhythm_threshold,
+        "seizure_frame_threshold": args.seizure_frame_threshold,
+        "idle_threshold": args.idle_threshold or None
+    }
+    annotations = {video: (label, events) for video, label, events in videos}
+    jobs = [(video, params, args.cache_dir) for video, _, _ in videos]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        results = list(pool.map(_extract_job, jobs))
+
+    parts = []
+    sources = []
+    cached = failed = 0
+    for video, features, spans, from_cache, error in results:
+        if error is not None:
+            failed += 1
+            print(f"{video}: ERROR {error}")
+            continue
+        cached += from_cache
+        label, events = annotations[video]
+        labels = window_labels(spans, label, events, args.min_overlap)
+        keep = labels >= 0
+        parts.append((features[keep], labels[keep]))
+        sources.append({"video": video, "label": label, "events": events, "rows": int(keep.sum()),
+                        "positive": int(labels[keep].sum()), "dropped": int((~keep).sum()),
+                        "cached": from_cache})
+
+    shards = write_shards(args.output, parts, args.shard_rows)
+    rows = sum(shard["rows"] for shard in shards)
+    with open(os.path.join(args.output, "manifest.json"), "w") as f:
+        json.dump({"features": ["avg_motion", "max_motion", "dominant_freq", "duration"],
+                   "params": dict(params, min_overlap=args.min_overlap), "rows": rows, "shards": shards, "sources": sources}, f, indent=2)
+
+    print(f"✅ {len(results) - failed} videos ({cached} from cache, {failed} failed) -> {rows} rows "
+          f"in {len(shards)} shards under {args.output}/ ({time.perf_counter() - start:.2f}s)")
+    print(f"Train with: python train_model.py --data {args.output}")
+
+
+if __name__ == "__main__":
+    main()
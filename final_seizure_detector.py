@@ -1,199 +1,295 @@
 import cv2
-import numpy as np
-from collections import deque
-import numpy.fft as fft
-from onnx_inference import verify_with_dl
-from firebase_logger import log_seizure_event, update_realtime_monitoring, update_camera_status
+from onnx_inference import verify_with_dl, get_verifier
+from firebase_logger import (
+    log_seizure_event, log_heartbeat, update_realtime_monitoring, update_camera_status, set_base_path,
+    flush as flush_firebase, writer as firebase_writer, get_journal, get_alerts, init as init_firebase
+)
+from motion_engine import METHODS as MOTION_METHODS
+from detector_core import (
+    HybridDetector, MOTION_THRESHOLD, RHYTHM_THRESHOLD, SEIZURE_FRAME_THRESHOLD,
+    MOTION_DOWNSCALE, MOTION_METHOD, MOTION_GRID, IDLE_THRESHOLD, parse_grid, DL_THRESHOLD
+)
+from metrics import StageMetrics, MetricsExporter, metrics_path
+from heartbeat import Heartbeat
+from capture_source import add_capture_args, open_capture, READ_TIMEOUT
+from detector_control import connect_control, LIVE_CONFIG_KEYS
+from preview import PreviewPublisher, PREVIEW_WIDTH
+from event_clips import ClipRecorder, CLIP_MEMORY_MB, CLIP_PRE_SECONDS, CLIP_POST_SECONDS
+from frame_pipeline import (
+    DropOldestQueue, CaptureThread, StageThread, FrameRateController,
+    pipeline_stats, format_pipeline_stats
+)
 from datetime import datetime
+import argparse
+import os
+import signal
+import sys
+import threading
 import time
 
-# Camera Setup
-cap = cv2.VideoCapture(0)
-ret, prev_frame = cap.read()
-prev_gray = cv2.cvtColor(prev_frame, cv2.COLOR_BGR2GRAY)
+# Adaptive frame-rate control: skip decoding frames when analysis falls behind
+FRAME_DEADLINE = 0.25  # seconds from capture to analysis done
+MAX_FRAME_STRIDE = 4   # analyse at least every 4th camera frame
 
-# Buffers
-motion_signal = deque(maxlen=60)
+FIREBASE_UPDATE_INTERVAL = 1.0  # Update Firebase every 1 second
+HEARTBEAT_INTERVAL = 30.0       # Journal a heartbeat every 30 seconds
 
-# Thresholds
-MOTION_THRESHOLD = 900_000  # Set to 900,000 for optimal seizure detection
-RHYTHM_THRESHOLD = 4
-SEIZURE_FRAME_THRESHOLD = 2  # 2 frames for very quick detection
+# While the detector is idle (static scene) the dashboard hears from it less often
+IDLE_FIREBASE_UPDATE_INTERVAL = 10.0
+IDLE_HEARTBEAT_INTERVAL = 120.0
 
-seizure_frames = 0
-last_firebase_update = 0  # Track last Firebase update time
-FIREBASE_UPDATE_INTERVAL = 1.0  # Update Firebase every 1 second
-seizure_logged = False
-
-print("Seizure detector initialized. Press Q to quit.")
-print("Detection workflow:")
-print("  1. Motion detection")
-print("  2. Rhythmic motion analysis (FFT)")
-print("  3. Sustained high intensity detection")
-print("  4. Deep learning verification")
-print("  5. Event confirmation and logging")
-print()
-
-update_camera_status(True)
-update_camera_status(True)
-
-# Main Loop
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    diff = cv2.absdiff(prev_gray, gray)
-
-    motion_value = np.sum(diff)
-    motion_signal.append(motion_value)
-
-    # Step 1: Motion detected (always happening)
-    motion_detected = motion_value > 0
-    
-    rhythmic_motion = False
-    dominant_freq = 0
-
-    # Step 2: Rhythmic motion detection (FFT analysis)
-    if len(motion_signal) == motion_signal.maxlen:
-        signal = np.array(motion_signal)
-        signal = signal - np.mean(signal)
-
-        fft_values = np.abs(fft.fft(signal))
-        dominant_freq = np.argmax(fft_values[1:50])
-
-        if dominant_freq > RHYTHM_THRESHOLD:
-            rhythmic_motion = True
-            cv2.putText(
-                frame, "Step 2: RHYTHMIC MOTION (FFT)",
-                (20, 80),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 165, 255), 2
+# Pipeline queues (drop-oldest)
+FRAME_QUEUE_DEPTH = 1       # capture -> analysis: always the newest frame
+EVENT_QUEUE_DEPTH = None    # analysis -> confirmed events: unbounded, an alert is never dropped
+DISPLAY_QUEUE_DEPTH = 1     # analysis -> overlay + imshow (--preview only)
+STATS_PRINT_INTERVAL = 10.0
+METRICS_EXPORT_INTERVAL = 1.0  # seconds between snapshots read by camera_server's /metrics
+
+
+# -------------------------------
+# Analysis stage
+# -------------------------------
+class AnalysisStage:
+    """
+    Runs the HybridDetector on its own thread. Every side effect
+    (Firebase writes, alerts, drawing) is handed off through queues.
+    With display_queue=None (headless) no overlay is built at all.
+
+    Consumes (frame, capture_time) items. Frequencies, durations and
+    motion values are derived from capture timestamps, so skipped or
+    dropped frames do not skew them.
+
+    With clips (a ClipRecorder) each confirmed event starts a clip and
+    carries its path in "clip".
+
+    When the detector goes idle, rate_control is switched to idle
+    sampling and Firebase snapshots and heartbeats slow down; all of it
+    is restored on the frame that wakes the detector.
+    """
+
+    def __init__(self, event_queue, display_queue,
+                 motion_threshold=MOTION_THRESHOLD, rhythm_threshold=RHYTHM_THRESHOLD,
+                 seizure_frame_threshold=SEIZURE_FRAME_THRESHOLD, camera_id="0",
+                 motion_downscale=MOTION_DOWNSCALE, motion_method=MOTION_METHOD, motion_grid=MOTION_GRID,
+                 idle_threshold=IDLE_THRESHOLD, rate_control=None, metrics=None, heartbeat=None, clips=None):
+        self.event_queue = event_queue
+        self.display_queue = display_queue
+        self.camera_id = camera_id
+        self.rate_control = rate_control
+        self.metrics = metrics
+        self.heartbeat = heartbeat
+        self.clips = clips
+
+        self.detector = HybridDetector(
+            verify_with_dl,
+            motion_threshold=motion_threshold,
+            rhythm_threshold=rhythm_threshold,
+            seizure_frame_threshold=seizure_frame_threshold,
+            motion_downscale=motion_downscale,
+            motion_method=motion_method,
+            timings=metrics,
+            grid=motion_grid,
+            idle_threshold=idle_threshold
+        )
+        self.last_firebase_update = 0
+        self.last_heartbeat = 0
+        self.frames = 0
+        self.idle = False
+
+    def __call__(self, item):
+        frame, capture_time = item
+        start = time.perf_counter()
+        try:
+            self.analyse(frame, capture_time)
+        finally:
+            if self.rate_control is not None:
+                self.rate_control.report(capture_time, time.perf_counter() - start)
+            if self.metrics is not None:
+                # Capture -> analysis done, including time queued
+                self.metrics.observe("frame_latency", time.monotonic() - capture_time)
+
+    def analyse(self, frame, capture_time):
+        self.frames += 1
+        if self.heartbeat is not None:
+            self.heartbeat.beat(self.frames)
+        interval = self.rate_control.capture_interval if self.rate_control else None
+        result = self.detector.process(frame, capture_time, interval)
+        if result is None:
+            return
+        if self.detector.idle != self.idle:
+            self.set_idle(self.detector.idle)
+
+        # Real-time monitoring snapshot (throttled to once per second).
+        # Only enqueues: firebase_logger's background writer sends it and
+        # drops it if a newer snapshot arrives first.
+        current_time = time.time()
+        firebase_interval = IDLE_FIREBASE_UPDATE_INTERVAL if self.idle else FIREBASE_UPDATE_INTERVAL
+        heartbeat_interval = IDLE_HEARTBEAT_INTERVAL if self.idle else HEARTBEAT_INTERVAL
+        if current_time - self.last_firebase_update >= firebase_interval:
+            update_realtime_monitoring(
+                motion_value=result["motion_value"],
+                dominant_freq=result["dominant_freq"],
+                is_rhythmic=result["rhythmic"],
+                avg_motion=self.detector.rhythm.mean,
+                max_motion=self.detector.rhythm.max
             )
+            self.last_firebase_update = current_time
+
+        if current_time - self.last_heartbeat >= heartbeat_interval:
+            log_heartbeat(self.camera_id, self.frames)
+            self.last_heartbeat = current_time
+
+        # Step 4-5: DL Verification → Final Confirmation
+        if result["verdict"] is not None:
+            print_verification(result)
+            if result["verdict"] == "confirmed":
+                stats = result["stats"]
+                event = {
+                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    "camera_id": self.camera_id,
+                    "duration_seconds": float(stats["duration"]),
+                    "avg_motion": float(stats["avg_motion"]),
+                    "max_motion": float(stats["max_motion"]),
+                    "dominant_frequency": float(stats["dominant_freq"]),
+                    "rule_based": True,
+                    "dl_verified": True,
+                    "onnx_score": float(stats["onnx_score"])
+                }
+                if self.clips is not None:
+                    # Written in the background once the post-roll is in
+                    event["clip"] = self.clips.trigger(result["time"])
+                self.event_queue.put(event)
+
+        if self.display_queue is None:
+            return
+        overlay = {
+            "motion_value": result["motion_value"],
+            "motion_threshold": self.detector.motion_threshold,
+            "seizure_frame_threshold": self.detector.seizure_frame_threshold,
+            "rhythmic": result["rhythmic"],
+            "seizure_frames": result["seizure_frames"],
+            "verdict": result["verdict"],
+            "idle": result["idle"]
+        }
+        self.display_queue.put((frame, overlay))
+
+    def set_idle(self, idle):
+        self.idle = idle
+        if self.rate_control is not None:
+            self.rate_control.set_idle(self.detector.idle_interval if idle else None)
+        print(f"Scene static, idle sampling at {1 / self.detector.idle_interval:.0f} fps" if idle
+              else "Motion detected, back to full-rate analysis")
+
+
+def print_verification(result):
+    stats = result["stats"]
+    print(f"\n{'='*60}")
+    print(f"Step 1: Motion detected")
+    print(f"Step 2: Rhythmic motion detected (Freq: {stats['dominant_freq']:.2f} Hz)")
+    print(f"Step 3: Sustained high intensity")
+    print(f"        Duration: {stats['duration']:.2f}s")
+    print(f"        Avg Motion: {stats['avg_motion']:.0f}")
+    print(f"        Max Motion: {stats['max_motion']:.0f}")
+    print(f"\nStep 4: DL Verification (ONNX)...")
+    print(f"        ONNX Score: {stats['onnx_score']:.3f}")
+    print(f"        Threshold: {DL_THRESHOLD:.3f}")
+    print(f"        Verified: {'YES' if result['verdict'] == 'confirmed' else 'NO'}")
 
-    
-    # Step 3: Sustained + High intensity (Rule-based detection)
-    if rhythmic_motion and motion_value > MOTION_THRESHOLD:
-        seizure_frames += 1
+    if result["verdict"] == "confirmed":
+        print(f"\nStep 5: SEIZURE CONFIRMED")
+        print(f"Queueing event for Firebase...")
+    else:
+        print(f"\nFALSE POSITIVE - DL verification failed")
+        print(f"Score {stats['onnx_score']:.3f} < {DL_THRESHOLD:.3f} threshold")
+        print(f"Not saving to database")
+    print(f"{'='*60}\n")
+
+
+# -------------------------------
+# Event stage
+# -------------------------------
+# Keeps event bookkeeping off the analysis thread; Firebase writes and
+# WhatsApp alerts are themselves queued to background senders.
+def write_event(event_data):
+    log_seizure_event(event_data)
+
+
+# -------------------------------
+# Overlay drawing (display stage)
+# -------------------------------
+def draw_overlay(frame, overlay):
+    """
+    Copy of frame with the overlay drawn on it. The captured frame itself
+    is shared with the preview ring and the clip recorder (CaptureThread)
+    and must never be drawn on.
+    """
+    frame = frame.copy()
+    motion_value = overlay["motion_value"]
+    motion_threshold = overlay["motion_threshold"]
+    seizure_frames = overlay["seizure_frames"]
+    seizure_frame_threshold = overlay["seizure_frame_threshold"]
+
+    if overlay["idle"]:
+        # Bottom row: the step lines above use rows 40-150
+        cv2.putText(
+            frame, "IDLE (static scene, reduced sampling)",
+            (20, frame.shape[0] - 20),
+            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 200, 200), 2
+        )
+
+    if overlay["rhythmic"]:
         cv2.putText(
-            frame, f"Step 3: SUSTAINED ({seizure_frames}/{SEIZURE_FRAME_THRESHOLD} frames)",
+            frame, "Step 2: RHYTHMIC MOTION (FFT)",
+            (20, 80),
+            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 165, 255), 2
+        )
+
+    if seizure_frames:
+        cv2.putText(
+            frame, f"Step 3: SUSTAINED ({seizure_frames}/{seizure_frame_threshold} frames)",
             (20, 110),
             cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 165, 0), 2
         )
-        
+
         # Show progress bar for step 3
-        progress = min(seizure_frames / SEIZURE_FRAME_THRESHOLD, 1.0)
+        progress = min(seizure_frames / seizure_frame_threshold, 1.0)
         bar_width = 300
         cv2.rectangle(frame, (20, 135), (20 + int(bar_width * progress), 150), (255, 165, 0), -1)
         cv2.rectangle(frame, (20, 135), (20 + bar_width, 150), (255, 255, 255), 2)
-    else:
-        seizure_frames = 0
-        seizure_logged = False  # Reset flag when no seizure detected
-
-    rule_based_seizure = seizure_frames >= SEIZURE_FRAME_THRESHOLD
-
-    # Update Firebase with real-time monitoring data (throttled to once per second)
-    current_time = time.time()
-    if current_time - last_firebase_update >= FIREBASE_UPDATE_INTERVAL:
-        avg_motion = np.mean(motion_signal) if len(motion_signal) > 0 else 0
-        max_motion = np.max(motion_signal) if len(motion_signal) > 0 else 0
-        
-        update_realtime_monitoring(
-            motion_value=motion_value,
-            dominant_freq=dominant_freq,
-            is_rhythmic=rhythmic_motion,
-            avg_motion=avg_motion,
-            max_motion=max_motion
+
+    if overlay["verdict"] == "confirmed":
+        cv2.putText(
+            frame,
+            "Step 5: FINAL SEIZURE CONFIRMED",
+            (20, 140),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.8,
+            (0, 0, 255),
+            3
         )
-        last_firebase_update = current_time
-
-    
-    # Step 4-5: DL Verification → Final Confirmation
-    if rule_based_seizure and not seizure_logged:
-        # Generate statistics for DL model
-        avg_motion = np.mean(motion_signal)
-        max_motion = np.max(motion_signal)
-        duration = seizure_frames / 15.0  # seconds 
-        
-        print(f"\n{'='*60}")
-        print(f"Step 1: Motion detected")
-        print(f"Step 2: Rhythmic motion detected (Freq: {dominant_freq} Hz)")
-        print(f"Step 3: Sustained high intensity")
-        print(f"        Duration: {duration:.2f}s")
-        print(f"        Avg Motion: {avg_motion:.0f}")
-        print(f"        Max Motion: {max_motion:.0f}")
-        print(f"\nStep 4: DL Verification (ONNX)...")
-
-        # Step 4: DL Verification
-        dl_verified, onnx_score = verify_with_dl(
-            avg_motion,
-            max_motion,
-            dominant_freq,
-            duration
+    elif overlay["verdict"] == "false_positive":
+        cv2.putText(
+            frame,
+            "FALSE POSITIVE - Not Saved",
+            (20, 140),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.8,
+            (0, 165, 255),
+            2
         )
-        
-        print(f"        ONNX Score: {onnx_score:.3f}")
-        print(f"        Threshold: 0.500")
-        print(f"        Verified: {'YES' if dl_verified else 'NO'}")
-
-        if dl_verified:
-            print(f"\nStep 5: SEIZURE CONFIRMED")
-            print(f"Saving to Firebase database...")
-            
-            cv2.putText(
-                frame,
-                "Step 5: FINAL SEIZURE CONFIRMED",
-                (20, 140),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.8,
-                (0, 0, 255),
-                3
-            )
-            
-            # Save to Firebase database
-            log_seizure_event({
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "duration_seconds": float(duration),
-                "avg_motion": float(avg_motion),
-                "max_motion": float(max_motion),
-                "dominant_frequency": float(dominant_freq),
-                "rule_based": True,
-                "dl_verified": True,
-                "onnx_score": float(onnx_score)
-            })
-            
-            print(f"Event saved successfully")
-            print(f"{'='*60}\n")
-            seizure_logged = True
-        else:
-            print(f"\nFALSE POSITIVE - DL verification failed")
-            print(f"Score {onnx_score:.3f} < 0.500 threshold")
-            print(f"Not saving to database")
-            print(f"{'='*60}\n")
-            
-            cv2.putText(
-                frame,
-                "FALSE POSITIVE - Not Saved",
-                (20, 140),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.8,
-                (0, 165, 255),
-                2
-            )
 
-    # Display
     cv2.putText(
         frame,
-        f"Step 1: Motion: {int(motion_value)} (Threshold: {MOTION_THRESHOLD})",
+        f"Step 1: Motion: {int(motion_value)} (Threshold: {motion_threshold})",
         (20, 40),
         cv2.FONT_HERSHEY_SIMPLEX,
         0.6,
         (255, 255, 255),
         2
     )
-    
+
     # Show if motion is high enough
-    if motion_value > MOTION_THRESHOLD:
+    if motion_value > motion_threshold:
         cv2.putText(
             frame,
             "HIGH INTENSITY!",
@@ -203,15 +299,239 @@ while True:
             (0, 255, 0),
             2
         )
+    return frame
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="SeizoWatch hybrid seizure detector")
+    parser.add_argument("--standby", action="store_true",
+                        help="Load models and connections, then wait for a start command from camera_server")
+    parser.add_argument("--camera-id", default="0", help="Camera ID used in logs and events")
+    parser.add_argument("--firebase-path", default="", help="Firebase base path for this camera")
+    add_capture_args(parser)
+    parser.add_argument("--motion-threshold", type=int, default=MOTION_THRESHOLD)
+    parser.add_argument("--rhythm-threshold", type=float, default=RHYTHM_THRESHOLD,
+                        help="Minimum dominant motion frequency in Hz")
+    parser.add_argument("--seizure-frame-threshold", type=int, default=SEIZURE_FRAME_THRESHOLD)
+    parser.add_argument("--motion-downscale", type=int, default=MOTION_DOWNSCALE,
+                        help="Per-axis motion downscale factor (default: auto)")
+    parser.add_argument("--motion-method", choices=MOTION_METHODS, default=MOTION_METHOD)
+    parser.add_argument("--motion-grid", type=parse_grid, default=MOTION_GRID,
+                        help="Per-region rhythm analysis on a ROWSxCOLS grid, e.g. 4x4 (default: whole frame)")
+    parser.add_argument("--idle-threshold", type=int, default=IDLE_THRESHOLD,
+                        help="Motion below this for a while switches to idle sampling (0 = never idle)")
+    parser.add_argument("--clip-memory-mb", type=float, default=CLIP_MEMORY_MB,
+                        help="Memory ceiling of the pre-event clip buffer (0 = no clips)")
+    parser.add_argument("--clip-pre", type=float, default=CLIP_PRE_SECONDS,
+                        help="Seconds of video kept before a confirmed event")
+    parser.add_argument("--clip-post", type=float, default=CLIP_POST_SECONDS,
+                        help="Seconds of video recorded after a confirmed event")
+    parser.add_argument("--threads", type=int, default=None, help="OpenCV worker threads")
+    parser.add_argument("--preview", action="store_true",
+                        help="Show the annotated video window (default: headless, no drawing)")
+    parser.add_argument("--stream-width", type=int, default=PREVIEW_WIDTH,
+                        help="Max width of frames streamed through camera_server (0 = no stream)")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+
+    # Launched by camera_server: commands arrive over its control channel.
+    # A standby detector has already paid for imports, Firebase/Twilio
+    # setup and the ONNX session; starting it only costs the camera open.
+    control = connect_control()
+
+    # Firebase, Twilio, the journal and the ONNX session are created
+    # lazily; do it now so neither a standby start nor the first event
+    # pays for it
+    init_firebase()
+    journal = get_journal()
+    verifier = get_verifier()
+    alerts = get_alerts()
+
+    if args.standby:
+        if control is None:
+            print("❌ --standby needs the control channel set up by camera_server")
+            return
+        print(f"Standby detector ready (pid {os.getpid()}), waiting for a camera")
+        argv = control.wait_for_start()
+        if argv is None:
+            return
+        args = parse_args(argv)
+
+    stop_event = threading.Event()
+    live = {}  # set once the analysis stage exists
+
+    def reconfigure(message):
+        config = message.get("config", {})
+        unknown = [key for key in config if key not in LIVE_CONFIG_KEYS]
+        if unknown:
+            raise ValueError(f"cannot change {', '.join(unknown)} without a restart")
+        for key, value in config.items():
+            value = type(getattr(args, key))(value)
+            setattr(args, key, value)
+            if "detector" in live:
+                setattr(live["detector"], key, value)
+        print(f"Reconfigured: {config}")
+        return {"applied": sorted(config)}
+
+    if control is not None:
+        control.serve({
+            "stop": lambda message: stop_event.set(),
+            "reconfigure": reconfigure
+        })
+
+    if args.threads is not None:
+        cv2.setNumThreads(args.threads)
+    set_base_path(args.firebase_path)
+
+    # PID file + heartbeat read by camera_server's supervisor
+    heartbeat = Heartbeat(args.camera_id)
+
+    # Camera Setup (reconnects on its own; grab() only fails at EOF or stop)
+    cap = open_capture(args)
+    if not cap.isOpened():
+        print(f"❌ Could not open source {args.source}")
+        heartbeat.close()
+        sys.exit(1)  # a failure: the supervisor retries (a clean exit is final)
+
+    frame_queue = DropOldestQueue("frames", FRAME_QUEUE_DEPTH)
+    event_queue = DropOldestQueue("events", EVENT_QUEUE_DEPTH)
+    queues = [frame_queue, event_queue]
+    display_queue = None
+    if args.preview:
+        display_queue = DropOldestQueue("display", DISPLAY_QUEUE_DEPTH)
+        queues.append(display_queue)
+
+    # SIGINT / SIGTERM (e.g. from camera_server) stop the detector cleanly
+    def request_stop(signum, frame):
+        print(f"Received signal {signum}, shutting down...")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    # Per-stage latency histograms, exported for camera_server's /metrics
+    metrics = StageMetrics()
+    firebase_writer.timings = metrics
+    journal.timings = metrics
+
+    # Live view for camera_server (copies frames only while someone watches)
+    stream = None
+    if args.stream_width > 0:
+        stream = PreviewPublisher(args.camera_id, cap.get(cv2.CAP_PROP_FRAME_WIDTH),
+                                  cap.get(cv2.CAP_PROP_FRAME_HEIGHT), args.stream_width)
+
+    # Pre-event clips: JPEG ring fed by the capture thread, written on confirmation
+    clips = None
+    if args.clip_memory_mb > 0:
+        clips = ClipRecorder(args.camera_id, pre_seconds=args.clip_pre, post_seconds=args.clip_post,
+                             max_bytes=int(args.clip_memory_mb * 1024 * 1024))
+
+    rate_control = FrameRateController(FRAME_DEADLINE, MAX_FRAME_STRIDE)
+    capture = CaptureThread(cap, frame_queue, stop_event, rate_control, metrics, stream, clips)
+    stages = []
+
+    # Read by the metrics exporter thread and the console summary only,
+    # never on the analysis thread
+    def stats():
+        reporters = [cap, capture, rate_control] + stages + [verifier, firebase_writer, journal]
+        if stream is not None:
+            reporters.append(stream)
+        if clips is not None:
+            reporters.append(clips)
+        if alerts is not None:
+            reporters.append(alerts)
+        return pipeline_stats(queues, reporters)
+
+    analysis_stage = AnalysisStage(
+        event_queue, display_queue,
+        motion_threshold=args.motion_threshold,
+        rhythm_threshold=args.rhythm_threshold,
+        seizure_frame_threshold=args.seizure_frame_threshold,
+        camera_id=args.camera_id,
+        motion_downscale=args.motion_downscale,
+        motion_method=args.motion_method,
+        motion_grid=args.motion_grid,
+        idle_threshold=args.idle_threshold,
+        rate_control=rate_control,
+        metrics=metrics,
+        heartbeat=heartbeat,
+        clips=clips
+    )
+    live["detector"] = analysis_stage.detector
+    analysis = StageThread("analysis", frame_queue, analysis_stage, metrics)
+    event_writer = StageThread("event_writer", event_queue, write_event, metrics)
+    stages.extend([analysis, event_writer])
+    exporter = MetricsExporter(metrics_path(args.camera_id), args.camera_id, metrics, stats,
+                               METRICS_EXPORT_INTERVAL)
+
+    if args.preview:
+        print(f"Seizure detector initialized (camera {args.camera_id}, source {args.source}). Press Q to quit.")
+    else:
+        print(f"Seizure detector initialized (camera {args.camera_id}, source {args.source}, headless). "
+              f"Send SIGINT/SIGTERM to stop.")
+    print("Detection workflow:")
+    print("  1. Motion detection")
+    print("  2. Rhythmic motion analysis (FFT)")
+    print("  3. Sustained high intensity detection")
+    print("  4. Deep learning verification")
+    print("  5. Event confirmation and logging")
+    print()
+
+    update_camera_status(True)
+    journal.start()  # upload anything left over from a previous run
+
+    capture.start()
+    for stage in stages:
+        stage.start()
+    exporter.start()
+
+    # Display (if any) runs on the main thread (required by cv2.imshow)
+    last_stats_print = time.time()
+    try:
+        while not stop_event.is_set():
+            heartbeat.touch()
+            if display_queue is None:
+                stop_event.wait(0.5)
+            else:
+                item = display_queue.get(timeout=0.1)
+                if item is not None:
+                    start = time.perf_counter()
+                    frame, overlay = item
+                    cv2.imshow(f"SeizoWatch - Hybrid Detector (camera {args.camera_id})",
+                               draw_overlay(frame, overlay))
+                    metrics.observe("render", time.perf_counter() - start)
+
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
 
-    cv2.imshow("SeizoWatch - Hybrid Detector", frame)
+            if time.time() - last_stats_print >= STATS_PRINT_INTERVAL:
+                print(f"Pipeline: {format_pipeline_stats(stats())}")
+                last_stats_print = time.time()
+    finally:
+        # Cleanup: stop capture, let analysis finish, then drain pending writes
+        stop_event.set()
+        cap.stop()
+        exporter.stop()
+        capture.join(timeout=READ_TIMEOUT + 1)
+        frame_queue.close()
+        analysis.join(timeout=5)
+        event_queue.close()
+        event_writer.join(timeout=30)
+        if clips is not None:
+            clips.stop()  # finishes clips still waiting for post-roll
 
-    prev_gray = gray
+        update_camera_status(False)
+        flush_firebase()
+        cap.release()
+        if display_queue is not None:
+            cv2.destroyAllWindows()
+        if stream is not None:
+            stream.close()
+        heartbeat.close()
 
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
 
-# Cleanup
-update_camera_status(False)
-cap.release()
-cv2.destroyAllWindows()
+if __name__ == "__main__":
+    main()
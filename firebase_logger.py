@@ -1,7 +1,16 @@
-import firebase_admin
-from firebase_admin import credentials, db
+import atexit
+import os
 from datetime import datetime
-from twilio.rest import Client
+from firebase_writer import FirebaseWriter
+from event_journal import EventJournal
+from event_rollups import EventRollups
+from alert_dispatcher import AlertDispatcher
+from lazy_init import Lazy
+
+# The Twilio and Firebase SDKs and the local journal are set up on first
+# use, so importing this module (camera_server, small scripts) stays cheap.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # -------------------------------
 # Twilio Configuration
@@ -11,61 +20,211 @@ TWILIO_ACCOUNT_SID = "AC4760fa3f7a5ed172db348dbe9d5ae817"
 TWILIO_AUTH_TOKEN = "aba8561532153b375b7131386d501452"
 TWILIO_WHATSAPP_FROM = "whatsapp:+14155238886"  # Twilio sandbox number
 TWILIO_WHATSAPP_TO = "whatsapp:+919392569322"  # Your WhatsApp number (with country code)
+TWILIO_WHATSAPP_RECIPIENTS = [TWILIO_WHATSAPP_TO]  # Everyone who gets alerts
+
 
-# Initialize Twilio client
-try:
-    twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-    TWILIO_ENABLED = True
-except Exception as e:
-    print(f"Warning: Twilio not configured: {e}")
-    TWILIO_ENABLED = False
+def _create_twilio_client():
+    # One pooled HTTP session shared by all sends; None when not configured
+    try:
+        from twilio.rest import Client
+        from twilio.http.http_client import TwilioHttpClient
+        return Client(
+            TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN,
+            http_client=TwilioHttpClient(pool_connections=True, timeout=10)
+        )
+    except Exception as e:
+        print(f"Warning: Twilio not configured: {e}")
+        return None
+
+
+_twilio_client = Lazy(_create_twilio_client)
+
+
+def get_twilio_client():
+    return _twilio_client.get()
 
 # -------------------------------
 # Firebase Initialization
 # -------------------------------
-if not firebase_admin._apps:
-    cred = credentials.Certificate("firebase_key.json")
-    firebase_admin.initialize_app(
+FIREBASE_KEY_PATH = "firebase_key.json"
+FIREBASE_DATABASE_URL = "https://seizowatch-default-rtdb.firebaseio.com"
+
+
+def _create_firebase_app():
+    import firebase_admin
+    from firebase_admin import credentials
+    if firebase_admin._apps:
+        return firebase_admin.get_app()
+    cred = credentials.Certificate(FIREBASE_KEY_PATH)
+    return firebase_admin.initialize_app(
         cred,
         {
-            "databaseURL": "https://seizowatch-default-rtdb.firebaseio.com"
+            "databaseURL": FIREBASE_DATABASE_URL
         }
     )
 
+
+_firebase_app = Lazy(_create_firebase_app)
+
+
+def get_firebase_app():
+    return _firebase_app.get()
+
+
+def init():
+    """
+    Set up Firebase and the alert sender now rather than on the first
+    write / alert (detectors call this at startup)
+    """
+    get_firebase_app()
+    get_rollups()
+    get_alerts()
+
 # -------------------------------
-# Send WhatsApp Alert
+# Per-camera base path
 # -------------------------------
-def send_whatsapp_alert(event_data):
+# "" writes to the database root (single-camera layout the dashboard reads).
+# Multi-camera detectors set e.g. "cameras/2" so each bed has its own sub-tree.
+FIREBASE_BASE_PATH = ""
+
+
+def set_base_path(path):
     """
-    Send WhatsApp notification via Twilio when seizure is confirmed
+    Set the base path used by every write from this process
     """
-    if not TWILIO_ENABLED:
-        return False
-    
-    try:
-        message_body = f"""
+    global FIREBASE_BASE_PATH
+    FIREBASE_BASE_PATH = (path or "").strip("/")
+
+
+def _path(name, base_path=None):
+    base = FIREBASE_BASE_PATH if base_path is None else base_path.strip("/")
+    return f"{base}/{name}" if base else name
+
+# -------------------------------
+# Background writer
+# -------------------------------
+# Every write below only enqueues; a background thread sends pending
+# writes as one multi-location update with retry/backoff.
+def _update_root(updates):
+    get_firebase_app()
+    from firebase_admin import db
+    db.reference("/").update(updates)
+
+
+writer = FirebaseWriter(_update_root)
+
+# -------------------------------
+# Local event journal
+# -------------------------------
+# Confirmed events and heartbeats are appended to a local SQLite journal
+# first and synced to Firebase in batches, so outages never lose them.
+# Next to this file, so every detector shares it whatever its working dir.
+JOURNAL_PATH = os.path.join(BASE_DIR, "event_journal.db")
+
+_journal = Lazy(lambda: EventJournal(JOURNAL_PATH, _update_root))
+
+# Hourly / daily / per-camera aggregates and a recent-events index next to
+# seizure_events, journaled together with each event (see event_rollups.py)
+_rollups = Lazy(lambda: EventRollups(get_journal()))
+
+
+def get_journal():
+    return _journal.get()
+
+
+def get_rollups():
+    return _rollups.get()
+
+
+def flush(timeout=10.0):
+    """
+    Block until all queued writes (and alerts) have been sent (or timeout)
+    """
+    done = writer.flush(timeout)
+    journal = _journal.peek()
+    if journal is not None:
+        done = journal.flush(timeout) and done
+    alerts = _alerts.peek()
+    if alerts is not None:
+        done = alerts.flush(timeout) and done
+    return done
+
+
+def writer_stats():
+    """
+    Queue lag, coalesced and failed write counters of the background writer
+    """
+    return writer.stats()
+
+
+# Scripts like add_sample_data.py exit right after logging
+atexit.register(flush)
+
+# -------------------------------
+# Send WhatsApp Alert
+# -------------------------------
+def format_alert_message(event_data):
+    return f"""
 SEIZURE ALERT - SeizoWatch
 
 Time: {event_data.get('timestamp', 'N/A')}
+Camera: {event_data.get('camera_id', '0')}
 Duration: {event_data.get('duration_seconds', 0):.1f} seconds
 Confidence: {event_data.get('onnx_score', 0)*100:.0f}%
 Status: DL Verified
 
 Immediate attention required!
-        """.strip()
-        
-        message = twilio_client.messages.create(
-            body=message_body,
-            from_=TWILIO_WHATSAPP_FROM,
-            to=TWILIO_WHATSAPP_TO
-        )
-        
-        print(f"WhatsApp alert sent (SID: {message.sid})")
-        return True
-        
-    except Exception as e:
-        print(f"WhatsApp alert failed: {e}")
+    """.strip()
+
+
+# Sends run on a thread pool: one alert per episode, rate-limited per recipient
+def _create_alerts():
+    client = get_twilio_client()
+    if client is None:
+        return None
+    return AlertDispatcher(
+        client,
+        TWILIO_WHATSAPP_FROM,
+        TWILIO_WHATSAPP_RECIPIENTS,
+        formatter=format_alert_message
+    )
+
+
+_alerts = Lazy(_create_alerts)
+
+
+def get_alerts():
+    """
+    The AlertDispatcher, or None if Twilio is not configured
+    """
+    return _alerts.get()
+
+
+def __getattr__(name):
+    # Module attributes that used to be built at import time
+    if name == "journal":
+        return get_journal()
+    if name == "rollups":
+        return get_rollups()
+    if name == "alerts":
+        return get_alerts()
+    if name == "twilio_client":
+        return get_twilio_client()
+    if name == "TWILIO_ENABLED":
+        return get_twilio_client() is not None
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def send_whatsapp_alert(event_data):
+    """
+    Queue a WhatsApp notification via Twilio when seizure is confirmed.
+    Returns False if Twilio is not configured or the event belongs to an
+    episode that was already alerted.
+    """
+    alerts = get_alerts()
+    if alerts is None:
         return False
+    return alerts.dispatch(event_data)
 
 # -------------------------------
 # Log seizure event (history)
@@ -77,15 +236,41 @@ def log_seizure_event(event_data):
     
     Note: Only DL-verified events should be logged here.
     This is the permanent record of confirmed seizures.
+
+    The event is appended to the local journal (durable immediately)
+    together with its seizure_rollups updates, and both are synced to
+    Firebase in the background. Returns its push key.
     """
-    ref = db.reference("seizure_events")
-    ref.push(event_data)
-    print(f"Event saved to Firebase: seizure_events/")
+    key = get_rollups().log_event(_path("seizure_events"), event_data)
+    print(f"Event journaled, syncing to Firebase: seizure_events/{key}")
     
-    print(f"Sending WhatsApp alert...")
-    alert_sent = send_whatsapp_alert(event_data)
-    if not alert_sent:
+    if get_alerts() is None:
         print(f"Warning: WhatsApp alert was not sent. Check Twilio configuration.")
+    elif send_whatsapp_alert(event_data):
+        print(f"WhatsApp alert queued")
+    else:
+        print(f"WhatsApp alert skipped: episode already alerted")
+    return key
+
+
+# -------------------------------
+# Heartbeat
+# -------------------------------
+def log_heartbeat(camera_id="0", frames=0, stats=None):
+    """
+    Record that the detector is alive
+    Path: last_heartbeat/
+
+    Journaled locally like events; only the newest heartbeat is uploaded.
+    """
+    data = {
+        "camera_id": camera_id,
+        "frames": int(frames),
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+    if stats is not None:
+        data["stats"] = stats
+    get_journal().append(_path("last_heartbeat"), data, kind="set")
 
 
 # -------------------------------
@@ -96,8 +281,7 @@ def update_realtime_alert(active, severity="LOW"):
     Update realtime alert node for live dashboard alerts
     Path: realtime_alert/
     """
-    ref = db.reference("realtime_alert")
-    ref.set({
+    writer.set(_path("realtime_alert"), {
         "active": active,
         "severity": severity,
         "last_updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -106,13 +290,12 @@ def update_realtime_alert(active, severity="LOW"):
 # -------------------------------
 # Update camera status
 # -------------------------------
-def update_camera_status(running):
+def update_camera_status(running, base_path=None):
     """
     Update camera status for dashboard
-    Path: camera_status/
+    Path: camera_status/ (under base_path when given)
     """
-    ref = db.reference("camera_status")
-    ref.set({
+    writer.set(_path("camera_status", base_path), {
         "running": running,
         "last_updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     })
@@ -125,12 +308,13 @@ def update_realtime_monitoring(motion_value, dominant_freq, is_rhythmic, avg_mot
     Update real-time monitoring data for live dashboard
     Path: realtime_monitoring/
     """
-    ref = db.reference("realtime_monitoring")
-    ref.set({
+    data = {
         "motion_value": float(motion_value),
         "dominant_frequency": float(dominant_freq),
-        "rhythmic_motion": is_rhythmic,
+        "rhythmic_motion": bool(is_rhythmic),
         "avg_motion": float(avg_motion),
         "max_motion": float(max_motion),
         "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    })
+    }
+
+    writer.set(_path("realtime_monitoring"), data)
@@ -0,0 +1,233 @@
+import random
+import threading
+import time
+
+PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+# Errors that retrying cannot fix: the writes themselves are invalid (e.g.
+# a key with . # $ [ ]), as opposed to network / server trouble
+PERMANENT_ERROR_CODES = ("INVALID_ARGUMENT",)
+
+_push_lock = threading.Lock()
+_last_push_time = 0
+_last_rand = [0] * 12
+
+
+def generate_push_id():
+    """
+    Firebase-style push key (8 timestamp chars + 12 random chars) built
+    locally, so pushes can go out in a multi-location update and still
+    sort chronologically like keys created by ref.push().
+    """
+    global _last_push_time
+    with _push_lock:
+        now = int(time.time() * 1000)
+        if now == _last_push_time:
+            # Same millisecond: increment the random part to keep ordering
+            for i in range(11, -1, -1):
+                if _last_rand[i] != 63:
+                    _last_rand[i] += 1
+                    break
+                _last_rand[i] = 0
+        else:
+            _last_push_time = now
+            for i in range(12):
+                _last_rand[i] = random.randrange(64)
+
+        stamp = []
+        for _ in range(8):
+            stamp.append(PUSH_CHARS[now % 64])
+            now //= 64
+        return "".join(reversed(stamp)) + "".join(PUSH_CHARS[r] for r in _last_rand)
+
+
+def is_permanent_error(error):
+    """
+    True for write errors caused by the data (firebase_admin raises
+    ValueError for malformed updates and InvalidArgumentError, code
+    INVALID_ARGUMENT, when the server rejects a path or value)
+    """
+    return isinstance(error, (ValueError, TypeError)) or getattr(error, "code", None) in PERMANENT_ERROR_CODES
+
+
+# -------------------------------
+# Background coalescing writer
+# -------------------------------
+class FirebaseWriter:
+    """
+    Sends Realtime Database writes from a background thread.
+
+    set(path, value) and push(path, value) only enqueue. The writer thread
+    sends everything pending as one multi-location update() on the root:
+      - a set() superseded by a newer set() to the same path before it was
+        sent is dropped (counted in `coalesced`)
+      - push() gets a locally generated key and is never dropped
+    A batch the server rejects as invalid (is_permanent_error) is split in
+    halves until the offending paths are isolated; those are dropped
+    (counted in `rejected`) and the rest still go out, so one bad path
+    never blocks the writes behind it. Other failures are retried with
+    exponential backoff; writes enqueued meanwhile are merged into the
+    retry.
+
+    update_fn(updates) performs the actual write, e.g.
+    lambda updates: db.reference("/").update(updates)
+    timings, if set, gets observe("firebase_write", seconds) per batch.
+    """
+
+    def __init__(self, update_fn, initial_backoff=0.5, max_backoff=30.0):
+        self.name = "firebase_writer"
+        self.update_fn = update_fn
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.timings = None
+
+        self._cond = threading.Condition()
+        self._pending = {}          # path -> value, insertion ordered
+        self._oldest_pending = None
+        self._in_flight = 0
+        self._in_flight_since = None
+        self._thread = None
+
+        self.enqueued = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.writes_sent = 0
+        self.failures = 0
+        self.rejected = 0
+        self.last_error = ""
+        self.last_batch_lag = 0.0
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="firebase_writer", daemon=True)
+            self._thread.start()
+
+    def _enqueue(self, path, value):
+        with self._cond:
+            if path in self._pending:
+                # Re-insert so the latest value keeps its place at the end
+                del self._pending[path]
+                self.coalesced += 1
+            self._pending[path] = value
+            self.enqueued += 1
+            if self._oldest_pending is None:
+                self._oldest_pending = time.monotonic()
+            self._ensure_started()
+            self._cond.notify()
+
+    def set(self, path, value):
+        self._enqueue(path.strip("/"), value)
+
+    def push(self, path, value):
+        """
+        Returns the generated child key.
+        """
+        key = generate_push_id()
+        self._enqueue(f"{path.strip('/')}/{key}", value)
+        return key
+
+    def _take_pending(self, batch):
+        # Caller holds self._cond
+        batch.update(self._pending)
+        self._pending = {}
+        self._oldest_pending = None
+
+    def _send(self, batch, paths):
+        """
+        Write paths (a list of keys of batch), removing each from batch once
+        it is sent or rejected. A rejected multi-path write is bisected and
+        rejected single paths are dropped. Transient errors propagate.
+        """
+        start = time.perf_counter()
+        try:
+            self.update_fn({path: batch[path] for path in paths})
+        except Exception as e:
+            if not is_permanent_error(e):
+                raise
+            if len(paths) > 1:
+                middle = len(paths) // 2
+                self._send(batch, paths[:middle])
+                self._send(batch, paths[middle:])
+                return
+            del batch[paths[0]]
+            self.rejected += 1
+            self.last_error = str(e)
+            print(f"Warning: Firebase write to {paths[0]} rejected, dropped: {e}")
+            return
+        if self.timings is not None:
+            self.timings.observe("firebase_write", time.perf_counter() - start)
+        for path in paths:
+            del batch[path]
+        self.writes_sent += len(paths)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                batch = {}
+                self._in_flight_since = self._oldest_pending
+                self._take_pending(batch)
+                self._in_flight = len(batch)
+
+            backoff = self.initial_backoff
+            while True:
+                try:
+                    self._send(batch, list(batch))
+                    break
+                except Exception as e:
+                    self.failures += 1
+                    self.last_error = str(e)
+                    print(f"Warning: Firebase write failed ({len(batch)} paths), retrying in {backoff:.1f}s: {e}")
+                    time.sleep(backoff * random.uniform(0.8, 1.2))
+                    backoff = min(backoff * 2, self.max_backoff)
+                    with self._cond:
+                        for path in self._pending:
+                            if path in batch:
+                                self.coalesced += 1
+                        self._take_pending(batch)
+                        self._in_flight = len(batch)
+
+            with self._cond:
+                self.batches += 1
+                self.last_batch_lag = time.monotonic() - self._in_flight_since
+                self._in_flight = 0
+                self._in_flight_since = None
+                self._cond.notify_all()
+
+    def flush(self, timeout=10.0):
+        """
+        Wait until every enqueued write has been sent. Returns False on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def lag(self):
+        """
+        Age in seconds of the oldest write not yet acknowledged
+        """
+        with self._cond:
+            oldest = self._in_flight_since or self._oldest_pending
+        return time.monotonic() - oldest if oldest else 0.0
+
+    def stats(self):
+        with self._cond:
+            pending = len(self._pending) + self._in_flight
+        return {
+            "pending": pending,
+            "lag_seconds": round(self.lag(), 3),
+            "last_batch_lag_seconds": round(self.last_batch_lag, 3),
+            "enqueued": self.enqueued,
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+            "writes_sent": self.writes_sent,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "last_error": self.last_error
+        }
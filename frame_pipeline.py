@@ -0,0 +1,309 @@
+import threading
+import time
+from collections import deque
+
+
+# -------------------------------
+# Bounded drop-oldest queue
+# -------------------------------
+class DropOldestQueue:
+    """
+    Bounded FIFO between two pipeline stages.
+    put() never blocks: when the queue is full the oldest item is
+    discarded, so a slow consumer always sees the freshest data.
+    maxsize=None makes it unbounded, for items that must never be dropped.
+    """
+
+    def __init__(self, name, maxsize=1):
+        self.name = name
+        self.maxsize = maxsize
+        self.put_count = 0
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, item):
+        with self._cond:
+            if self.maxsize is not None and len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self.put_count += 1
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """
+        Return the next item, or None if nothing arrived within timeout
+        or the queue was closed and fully drained.
+        """
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed and not self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def stats(self):
+        return {
+            "depth": len(self._items),
+            "maxsize": self.maxsize,
+            "put": self.put_count,
+            "dropped": self.dropped
+        }
+
+
+# -------------------------------
+# Adaptive frame-rate control
+# -------------------------------
+class FrameRateController:
+    """
+    Decides which captured frames get decoded and analysed.
+
+    The analysis stage reports how long each frame took and how old it was
+    when finished. If the average processing time exceeds the time budget
+    (capture interval x stride) or frame latency exceeds `deadline`, the
+    stride grows and the capture stage only grab()s the frames in between
+    (no decode). When processing is comfortably back under budget the
+    stride shrinks again. Adjustments happen at most once per
+    `adjust_interval` seconds to avoid oscillation.
+
+    set_idle(interval) switches to idle sampling: one frame per
+    `interval` seconds is decoded regardless of the stride, until
+    set_idle(None) restores normal control.
+    """
+
+    def __init__(self, deadline=0.25, max_stride=4, adjust_interval=1.0, smoothing=0.1):
+        self.name = "rate_control"
+        self.deadline = deadline
+        self.max_stride = max_stride
+        self.adjust_interval = adjust_interval
+        self.smoothing = smoothing
+
+        self.stride = 1
+        self.capture_interval = None   # EWMA seconds between camera frames
+        self.processing_time = None    # EWMA seconds per analysed frame
+        self.latency = 0.0             # capture -> analysis done, last frame
+        self.skipped = 0
+        self.idle_interval = None
+        self._last_decoded = None
+        self._last_capture = None
+        self._last_adjust = 0.0
+        self._counter = 0
+
+    def _ewma(self, current, sample):
+        return sample if current is None else current + self.smoothing * (sample - current)
+
+    def on_capture(self, t):
+        """
+        Called by the capture stage for every camera frame. Returns True
+        if this frame should be decoded and analysed.
+        """
+        if self._last_capture is not None:
+            self.capture_interval = self._ewma(self.capture_interval, t - self._last_capture)
+        self._last_capture = t
+
+        if self.idle_interval is not None:
+            if self._last_decoded is None or t - self._last_decoded >= self.idle_interval:
+                self._last_decoded = t
+                return True
+            self.skipped += 1
+            return False
+
+        self._counter += 1
+        if self._counter >= self.stride:
+            self._counter = 0
+            self._last_decoded = t
+            return True
+        self.skipped += 1
+        return False
+
+    def set_idle(self, interval):
+        """
+        Decode one frame per `interval` seconds (None: back to the stride)
+        """
+        self.idle_interval = interval
+        self._counter = 0
+
+    def report(self, capture_t, processing_seconds):
+        """
+        Called by the analysis stage after each analysed frame.
+        """
+        now = time.monotonic()
+        self.latency = now - capture_t
+        if self.idle_interval is not None:
+            return  # idle frames say nothing about the full-rate budget
+        self.processing_time = self._ewma(self.processing_time, processing_seconds)
+
+        if self.capture_interval is None or now - self._last_adjust < self.adjust_interval:
+            return
+        budget = self.capture_interval * self.stride
+        if (self.processing_time > 0.9 * budget or self.latency > self.deadline) \
+                and self.stride < self.max_stride:
+            self.stride += 1
+            self._last_adjust = now
+        elif self.stride > 1 and self.processing_time < 0.6 * self.capture_interval * (self.stride - 1) \
+                and self.latency < 0.5 * self.deadline:
+            self.stride -= 1
+            self._last_adjust = now
+
+    def stats(self):
+        return {
+            "stride": self.stride,
+            "skipped": self.skipped,
+            "capture_fps": round(1.0 / self.capture_interval, 1) if self.capture_interval else 0.0,
+            "processing_ms": round((self.processing_time or 0.0) * 1000, 2),
+            "latency_ms": round(self.latency * 1000, 1),
+            "idle": int(self.idle_interval is not None)
+        }
+
+
+# -------------------------------
+# Capture stage
+# -------------------------------
+class CaptureThread(threading.Thread):
+    """
+    Reads frames as fast as the camera delivers them and pushes
+    (frame, capture_time) into out_queue, capture_time being
+    time.monotonic() when the frame arrived. With a depth-1 queue the
+    consumer always gets the newest frame and the camera's internal
+    buffer never fills with stale ones. When a FrameRateController is
+    given, frames it skips are grab()bed but never decoded.
+    timings, if given, gets observe() for "capture_wait" (grab) and
+    "decode" (retrieve). preview, if given, gets publish(frame) for every
+    decoded frame after it was queued for analysis, and clips (an
+    event_clips.ClipRecorder) gets offer(frame, capture_time).
+
+    The same frame array goes to every consumer, possibly at the same
+    time, so all of them treat it as read-only (the display stage draws
+    its overlay on a copy).
+    """
+
+    def __init__(self, cap, out_queue, stop_event, rate_control=None, timings=None, preview=None,
+                 clips=None):
+        super().__init__(name="capture", daemon=True)
+        self.cap = cap
+        self.out_queue = out_queue
+        self.stop_event = stop_event
+        self.rate_control = rate_control
+        self.timings = timings
+        self.preview = preview
+        self.clips = clips
+        self.frames = 0
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                start = time.perf_counter()
+                if not self.cap.grab():
+                    break
+                t = time.monotonic()
+                self.frames += 1
+                if self.timings is not None:
+                    self.timings.observe("capture_wait", time.perf_counter() - start)
+                if self.rate_control is not None and not self.rate_control.on_capture(t):
+                    continue
+                start = time.perf_counter()
+                ret, frame = self.cap.retrieve()
+                if not ret:
+                    break
+                if self.timings is not None:
+                    self.timings.observe("decode", time.perf_counter() - start)
+                self.out_queue.put((frame, t))
+                if self.preview is not None:
+                    self.preview.publish(frame)
+                if self.clips is not None:
+                    self.clips.offer(frame, t)
+        finally:
+            self.stop_event.set()
+            self.out_queue.close()
+
+    def stats(self):
+        return {"frames": self.frames}
+
+
+# -------------------------------
+# Generic worker stage
+# -------------------------------
+class StageThread(threading.Thread):
+    """
+    Pulls items from in_queue and passes them to handler until the queue
+    is closed and drained. Tracks processed count and busy time, and
+    reports each item's handling time to timings.observe(name, seconds).
+    """
+
+    def __init__(self, name, in_queue, handler, timings=None):
+        super().__init__(name=name, daemon=True)
+        self.in_queue = in_queue
+        self.handler = handler
+        self.timings = timings
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self.errors = 0
+
+    def run(self):
+        while not self.in_queue.closed:
+            item = self.in_queue.get(timeout=0.1)
+            if item is None:
+                continue
+            start = time.perf_counter()
+            try:
+                self.handler(item)
+            except Exception as e:
+                self.errors += 1
+                print(f"Warning: {self.name} stage error: {e}")
+            elapsed = time.perf_counter() - start
+            if self.timings is not None:
+                self.timings.observe(self.name, elapsed)
+            self.busy_seconds += elapsed
+            self.processed += 1
+
+    def stats(self):
+        return {
+            "processed": self.processed,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "errors": self.errors
+        }
+
+
+def pipeline_stats(queues, stages):
+    """
+    Snapshot of every queue and stage, keyed by name.
+    """
+    return {
+        "queues": {q.name: q.stats() for q in queues},
+        "stages": {s.name: s.stats() for s in stages}
+    }
+
+
+def format_pipeline_stats(stats):
+    """
+    One-line summary for the console, e.g.
+    frames[depth=1/1 dropped=12] events[depth=0 dropped=0] stride=2
+    """
+    parts = []
+    for name, q in stats["queues"].items():
+        depth = q["depth"] if q["maxsize"] is None else f"{q['depth']}/{q['maxsize']}"
+        parts.append(f"{name}[depth={depth} dropped={q['dropped']}]")
+    rate = stats["stages"].get("rate_control")
+    if rate:
+        parts.append(f"stride={rate['stride']} latency={rate['latency_ms']}ms")
+        if rate.get("idle"):
+            parts.append("idle")
+    source = stats["stages"].get("source")
+    if source:
+        parts.append(f"source[dropped={source['dropped']} reconnects={source['reconnects']} "
+                     f"stall={source['stall_seconds']}s]")
+    return " ".join(parts)
@@ -1,34 +1,87 @@
+import argparse
+import time
+
 import numpy as np
 
-np.random.seed(42)
+# Feature ranges per class: [avg_motion, max_motion, dominant_freq, duration]
+CLASS_RANGES = {
+    0: (  # Normal motion
+        [1e5, 3e5, 0.0, 1.0],
+        [6e5, 9e5, 3.0, 3.0]
+    ),
+    1: (  # Seizure-like motion
+        [1.2e6, 2e6, 4.0, 3.0],
+        [2.5e6, 4e6, 10.0, 7.0]
+    )
+}
+
+DEFAULT_SAMPLES = 1000
+DEFAULT_CHUNK = 1_000_000
+
+
+def seizure_rows(start, end, seizure_fraction):
+    """
+    Number of seizure-like rows among rows [start, end). Rounding the
+    running total carries the remainder from chunk to chunk, so the whole
+    file has exactly round(samples * seizure_fraction) of them.
+    """
+    return round(end * seizure_fraction) - round(start * seizure_fraction)
 
-data = []
-labels = []
 
-# Normal motion
-for _ in range(500):
-    avg_motion = np.random.uniform(1e5, 6e5)
-    max_motion = np.random.uniform(3e5, 9e5)
-    dominant_freq = np.random.uniform(0, 3)
-    duration = np.random.uniform(1, 3)
+def generate_chunk(rng, size, positives, dtype=np.float64):
+    """
+    `size` rows at once: exactly `positives` seizure-like rows in shuffled
+    positions, features uniform within each row's class ranges.
+    """
+    labels = np.zeros(size, dtype=np.int32)
+    labels[:positives] = 1
+    rng.shuffle(labels)
+    lows = np.array([CLASS_RANGES[c][0] for c in (0, 1)])
+    highs = np.array([CLASS_RANGES[c][1] for c in (0, 1)])
+    low = lows[labels]
+    X = low + rng.random((size, 4)) * (highs[labels] - low)
+    return X.astype(dtype, copy=False), labels
 
-    data.append([avg_motion, max_motion, dominant_freq, duration])
-    labels.append(0)
 
-# Seizure-like motion
-for _ in range(500):
-    avg_motion = np.random.uniform(1.2e6, 2.5e6)
-    max_motion = np.random.uniform(2e6, 4e6)
-    dominant_freq = np.random.uniform(4, 10)
-    duration = np.random.uniform(3, 7)
+def generate(samples=DEFAULT_SAMPLES, seizure_fraction=0.5, seed=42, chunk_size=DEFAULT_CHUNK,
+             x_path="X.npy", y_path="y.npy", dtype=np.float64):
+    """
+    Write `samples` rows to memory-mapped .npy files chunk by chunk, so
+    memory use is bounded by chunk_size whatever the total size. Chunk i
+    is drawn from its own generator seeded with (seed, i): the same seed
+    and chunk size always produce the same files.
+    """
+    X = np.lib.format.open_memmap(x_path, mode="w+", dtype=dtype, shape=(samples, 4))
+    y = np.lib.format.open_memmap(y_path, mode="w+", dtype=np.int32, shape=(samples,))
+    for i, start in enumerate(range(0, samples, chunk_size)):
+        end = min(start + chunk_size, samples)
+        rng = np.random.default_rng([seed, i])
+        X[start:end], y[start:end] = generate_chunk(rng, end - start, seizure_rows(start, end, seizure_fraction),
+                                                    dtype)
+    X.flush()
+    y.flush()
+    positives = int(y.sum(dtype=np.int64))
+    del X, y
+    return positives
 
-    data.append([avg_motion, max_motion, dominant_freq, duration])
-    labels.append(1)
 
-X = np.array(data)
-y = np.array(labels)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate a synthetic verifier training set")
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES)
+    parser.add_argument("--seizure-fraction", type=float, default=0.5,
+                        help="Fraction of rows that are seizure-like")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK, help="Rows generated per chunk")
+    parser.add_argument("--dtype", choices=("float64", "float32"), default="float64")
+    parser.add_argument("--x", default="X.npy", help="Features output path")
+    parser.add_argument("--y", default="y.npy", help="Labels output path")
+    return parser.parse_args()
 
-np.save("X.npy", X)
-np.save("y.npy", y)
 
-print("✅ Synthetic dataset created")
+if __name__ == "__main__":
+    args = parse_args()
+    start = time.perf_counter()
+    positives = generate(args.samples, args.seizure_fraction, args.seed, args.chunk_size,
+                         args.x, args.y, np.dtype(args.dtype))
+    print(f"✅ Synthetic dataset created: {args.samples} rows ({positives} seizure-like) "
+          f"in {time.perf_counter() - start:.2f}s -> {args.x}, {args.y}")
@@ -0,0 +1,133 @@
+import mmap
+import os
+import struct
+import time
+
+from metrics import RUN_DIR
+
+# seq, pid, started, frames, last_frame, updated
+# seq is odd while a write is in progress (readers retry)
+HEARTBEAT_FORMAT = "<QIdQdd"
+HEARTBEAT_SIZE = struct.calcsize(HEARTBEAT_FORMAT)
+TOUCH_FIELDS = "<d"  # updated, at the end of the record
+TOUCH_OFFSET = HEARTBEAT_SIZE - struct.calcsize(TOUCH_FIELDS)
+
+
+def pid_path(camera_id):
+    return os.path.join(RUN_DIR, f"detector-{camera_id}.pid")
+
+
+def heartbeat_path(camera_id):
+    return os.path.join(RUN_DIR, f"heartbeat-{camera_id}")
+
+
+# -------------------------------
+# Detector side
+# -------------------------------
+class Heartbeat:
+    """
+    Publishes liveness of one detector process:
+      - run/detector-<id>.pid holds the PID
+      - run/heartbeat-<id> is a small memory-mapped record (shared with
+        any reader through the page cache) with the frame counter, the
+        time of the last analysed frame and the time of the last tick
+        from the main loop.
+
+    beat() is a single struct.pack_into per frame, with no system call.
+    """
+
+    def __init__(self, camera_id):
+        os.makedirs(RUN_DIR, exist_ok=True)
+        self.pid = os.getpid()
+        self.started = time.time()
+        self.frames = 0
+        self.last_frame = 0.0
+        self._seq = 0
+
+        self.pid_file = pid_path(camera_id)
+        self.path = heartbeat_path(camera_id)
+        with open(self.pid_file, "w") as f:
+            f.write(str(self.pid))
+        with open(self.path, "wb") as f:
+            f.write(b"\0" * HEARTBEAT_SIZE)
+        self._file = open(self.path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), HEARTBEAT_SIZE)
+        self._write(self.started)
+
+    def _write(self, now):
+        self._seq += 1
+        struct.pack_into("<Q", self._map, 0, self._seq)
+        struct.pack_into(HEARTBEAT_FORMAT, self._map, 0, self._seq, self.pid, self.started,
+                         self.frames, self.last_frame, now)
+        self._seq += 1
+        struct.pack_into("<Q", self._map, 0, self._seq)
+
+    def beat(self, frames):
+        """
+        Called by the analysis stage after every frame
+        """
+        now = time.time()
+        self.frames = frames
+        self.last_frame = now
+        self._write(now)
+
+    def touch(self):
+        """
+        Called periodically by the main loop: process alive, even if no
+        frames are arriving
+        """
+        struct.pack_into(TOUCH_FIELDS, self._map, TOUCH_OFFSET, time.time())
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+        for path in (self.path, self.pid_file):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+# -------------------------------
+# Server side (O(1) reads)
+# -------------------------------
+def read_pid(camera_id):
+    try:
+        with open(pid_path(camera_id)) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def read_heartbeat(camera_id, retries=3):
+    """
+    Latest heartbeat of camera_id's detector as a dict (pid, started,
+    frames, last_frame, updated, frame_age, tick_age), or None if the
+    detector never published one.
+    """
+    try:
+        with open(heartbeat_path(camera_id), "rb") as f:
+            for _ in range(retries):
+                f.seek(0)
+                data = f.read(HEARTBEAT_SIZE)
+                if len(data) < HEARTBEAT_SIZE:
+                    return None
+                seq, pid, started, frames, last_frame, updated = struct.unpack(HEARTBEAT_FORMAT, data)
+                f.seek(0)
+                if seq % 2 == 0 and struct.unpack("<Q", f.read(8))[0] == seq:
+                    break  # no write happened while reading
+                time.sleep(0.001)
+    except OSError:
+        return None
+
+    now = time.time()
+    return {
+        "pid": pid,
+        "started": started,
+        "frames": frames,
+        "last_frame": last_frame or None,
+        "updated": updated,
+        # No frame yet: age counts from process start
+        "frame_age": round(now - (last_frame or started), 3),
+        "tick_age": round(now - max(updated, last_frame), 3)
+    }
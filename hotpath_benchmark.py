@@ -0,0 +1,382 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import types
+
+import cv2
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BASE_DIR, "benchmarks", "hotpath_baseline.json")
+
+RESOLUTIONS = {"480p": (480, 640), "720p": (720, 1280), "1080p": (1080, 1920)}
+RHYTHM_WINDOW = 60   # motion_signal's window
+TOLERANCE = 0.3      # fail when 30% slower than the baseline...
+MIN_DELTA_US = 2.0   # ...and at least 2 us slower (timer noise on tiny cases)
+
+
+# -------------------------------
+# Timing
+# -------------------------------
+def measure(fn, iterations, rounds=5, warmup=None):
+    """
+    Median over `rounds` of the mean time per call of fn(i), in us
+    """
+    for i in range(warmup if warmup is not None else max(1, iterations // 10)):
+        fn(i)
+    per_call = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for i in range(iterations):
+            fn(i)
+        per_call.append((time.perf_counter() - start) / iterations * 1e6)
+    return {"us": round(statistics.median(per_call), 3), "min_us": round(min(per_call), 3),
+            "iterations": iterations, "rounds": rounds}
+
+
+def make_frames(shape, count=8, seed=0):
+    """
+    Camera-like BGR frames: a static textured scene with sensor noise and
+    a moving block, so diffs are neither all zero nor all noise
+    """
+    rng = np.random.default_rng(seed)
+    height, width = shape
+    scene = rng.integers(40, 200, (height, width, 3), dtype=np.uint8)
+    frames = []
+    for i in range(count):
+        frame = scene + rng.integers(0, 4, (height, width, 3), dtype=np.uint8)
+        x = (i * width // (2 * count)) % (width - width // 4)
+        frame[height // 3:height // 3 + height // 4, x:x + width // 4] = 255
+        frames.append(frame)
+    return frames
+
+
+# -------------------------------
+# Cases
+# -------------------------------
+def bench_motion(rounds):
+    from motion_engine import MotionEngine
+
+    results = {}
+    for label, shape in RESOLUTIONS.items():
+        frames = make_frames(shape)
+        iterations = 200 if label == "480p" else 100
+
+        # Full-resolution cvtColor + absdiff + sum, as motion_signal.py does it
+        grays = [cv2.cvtColor(f, cv2.COLOR_BGR2GRAY) for f in frames]
+
+        def full(i):
+            gray = cv2.cvtColor(frames[i % len(frames)], cv2.COLOR_BGR2GRAY)
+            cv2.sumElems(cv2.absdiff(grays[(i - 1) % len(grays)], gray))
+
+        results[f"diff_sum_full/{label}"] = measure(full, iterations, rounds)
+
+        engine = MotionEngine()
+        results[f"motion_engine/{label}"] = measure(lambda i: engine.update(frames[i % len(frames)]),
+                                                    iterations, rounds)
+        grid = MotionEngine(grid=(4, 4))
+        results[f"motion_engine_grid4x4/{label}"] = measure(lambda i: grid.update(frames[i % len(frames)]),
+                                                            iterations, rounds)
+    return results
+
+
+def bench_rhythm(rounds):
+    from rhythm_analysis import BlockRhythmEstimator, RhythmEstimator
+
+    rng = np.random.default_rng(1)
+    t = np.arange(4096) / 15.0
+    signal = 1e6 * (1 + np.sin(2 * np.pi * 3 * t)) + rng.normal(0, 1e5, len(t))
+    results = {}
+
+    # Full FFT of the whole window per sample (motion_signal.py / old detector)
+    def fft_window(i):
+        window = signal[i % 2048:i % 2048 + RHYTHM_WINDOW]
+        spectrum = np.abs(np.fft.fft(window - window.mean()))
+        int(np.argmax(spectrum[1:50]))
+
+    results["rhythm_fft_window"] = measure(fft_window, 2000, rounds)
+
+    estimator = RhythmEstimator(15.0, RHYTHM_WINDOW)
+
+    def sliding(i):
+        estimator.update(i / 15.0, signal[i % len(signal)])
+        if estimator.ready:
+            estimator.dominant_frequency()
+
+    results["rhythm_sliding_dft"] = measure(sliding, 2000, rounds, warmup=RHYTHM_WINDOW)
+
+    blocks = BlockRhythmEstimator(16, 15.0, RHYTHM_WINDOW)
+    energies = np.abs(rng.normal(1e5, 2e4, (len(signal), 16)))
+
+    def regions(i):
+        blocks.update(i / 15.0, energies[i % len(energies)])
+        if blocks.ready:
+            blocks.dominant()
+
+    results["rhythm_blocks4x4"] = measure(regions, 2000, rounds, warmup=RHYTHM_WINDOW)
+    return results
+
+
+def bench_verify(rounds):
+    from onnx_inference import OnnxVerifier, default_model_path
+
+    # The model the detector loads by default (the ORT-format one when current)
+    verifier = OnnxVerifier(default_model_path())
+    rng = np.random.default_rng(2)
+    rows = np.column_stack([
+        rng.uniform(1e5, 5e6, 256), rng.uniform(1e6, 2e7, 256),
+        rng.uniform(0.5, 7, 256), rng.uniform(0.1, 10, 256)
+    ])
+    results = {
+        # verify_with_dl path: hand-off to the batcher thread and back
+        "verify_single": measure(lambda i: verifier.verify(*rows[i % len(rows)]), 500, rounds),
+        # one session.run for a lone row, no thread hand-off
+        "verify_many_1": measure(lambda i: verifier.verify_many(rows[i % len(rows)][None]), 500, rounds)
+    }
+    batch = measure(lambda i: verifier.verify_many(rows[:64]), 100, rounds)
+    results["verify_many_64"] = batch
+    results["verify_many_64_per_row"] = dict(batch, us=round(batch["us"] / 64, 3),
+                                             min_us=round(batch["min_us"] / 64, 3))
+    return results
+
+
+# -------------------------------
+# Fake firebase_admin (in process)
+# -------------------------------
+class FakeDatabase:
+    """
+    In-memory stand-in for the Realtime Database behind firebase_admin.db:
+    reference(path).update / set / get on one nested dict, with the same
+    multi-location update semantics (None deletes a node).
+    """
+
+    def __init__(self):
+        self.root = {}
+        self.updates = 0
+        self.paths_written = 0
+
+    def _set(self, path, value):
+        parts = [p for p in path.strip("/").split("/") if p]
+        if not parts:
+            self.root = value if isinstance(value, dict) else {}
+            return
+        node = self.root
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        if value is None:
+            node.pop(parts[-1], None)
+        else:
+            node[parts[-1]] = value
+
+    def reference(self, path="/"):
+        database = self
+        base = path.strip("/")
+
+        class Reference:
+            def update(self, values):
+                database.updates += 1
+                for key, value in values.items():
+                    database.paths_written += 1
+                    database._set(f"{base}/{key}" if base else key, value)
+
+            def set(self, value):
+                database._set(base, value)
+
+            def get(self):
+                node = database.root
+                for part in [p for p in base.split("/") if p]:
+                    node = node.get(part) if isinstance(node, dict) else None
+                return node
+
+        return Reference()
+
+
+def install_fake_sdks():
+    """
+    Put fake firebase_admin (+ credentials, db) and twilio.rest modules in
+    sys.modules, so firebase_logger runs with no credentials or network.
+    Returns the FakeDatabase.
+    """
+    database = FakeDatabase()
+    firebase_admin = types.ModuleType("firebase_admin")
+    firebase_admin._apps = {}
+    firebase_admin.get_app = lambda: firebase_admin._apps["[DEFAULT]"]
+    firebase_admin.initialize_app = lambda cred, options=None: firebase_admin._apps.setdefault("[DEFAULT]", object())
+    credentials = types.ModuleType("firebase_admin.credentials")
+    credentials.Certificate = lambda path: path
+    db = types.ModuleType("firebase_admin.db")
+    db.reference = database.reference
+    firebase_admin.credentials, firebase_admin.db = credentials, db
+
+    twilio = types.ModuleType("twilio")
+    rest = types.ModuleType("twilio.rest")
+
+    def no_client(*args, **kwargs):
+        raise RuntimeError("disabled in benchmark")
+
+    rest.Client = no_client
+    twilio.rest = rest
+    sys.modules.update({
+        "firebase_admin": firebase_admin, "firebase_admin.credentials": credentials,
+        "firebase_admin.db": db, "twilio": twilio, "twilio.rest": rest
+    })
+    return database
+
+
+def bench_firebase(rounds):
+    """
+    firebase_logger's write paths against the fake database, with the
+    journal in a temporary directory. The per-call cases are what the
+    frame loop / event stage pay; *_flush is end-to-end (enqueue, sync,
+    multi-location update) per write.
+    """
+    if "firebase_logger" in sys.modules:
+        raise RuntimeError("firebase_logger was already imported; the firebase cases need a fresh process")
+    database = install_fake_sdks()
+    workdir = tempfile.mkdtemp(prefix="seizowatch-bench-")
+    # firebase_logger prints per event; keep the timing loop quiet
+    quiet = contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        import firebase_logger as fl
+        fl.JOURNAL_PATH = os.path.join(workdir, "event_journal.db")  # not the real journal
+        fl.init()
+    event = {
+        "timestamp": "2024-05-01 14:03:11", "camera_id": "0", "duration_seconds": 3.2,
+        "avg_motion": 1.5e6, "max_motion": 4.1e6, "dominant_frequency": 3.5,
+        "rule_based": True, "dl_verified": True, "onnx_score": 0.93
+    }
+    with quiet:
+        results = {
+            "update_realtime_monitoring": measure(
+                lambda i: fl.update_realtime_monitoring(1e6 + i, 3.5, True, 9e5, 4e6), 2000, rounds),
+            "log_heartbeat": measure(lambda i: fl.log_heartbeat("0", i), 200, rounds),
+            "log_seizure_event": measure(lambda i: fl.log_seizure_event(dict(event, camera_id=str(i % 4))),
+                                         100, rounds)
+        }
+        fl.flush(30)
+
+    def flushed(write, count):
+        def run(_):
+            for i in range(count):
+                write(i)
+            fl.flush(30)
+        timing = measure(run, 1, rounds, warmup=1)
+        return dict(timing, us=round(timing["us"] / count, 3), min_us=round(timing["min_us"] / count, 3))
+
+    with quiet:
+        results["realtime_flush"] = flushed(
+            lambda i: fl.update_realtime_monitoring(1e6 + i, 3.5, True, 9e5, 4e6), 500)
+        results["event_flush"] = flushed(lambda i: fl.log_seizure_event(event), 100)
+    print(f"  fake database: {database.updates} updates, {database.paths_written} paths written")
+    return results
+
+
+SUITES = {
+    "motion": bench_motion,
+    "rhythm": bench_rhythm,
+    "verify": bench_verify,
+    "firebase": bench_firebase
+}
+
+
+# -------------------------------
+# Baseline comparison
+# -------------------------------
+def compare(results, baseline, tolerance=TOLERANCE, min_delta=MIN_DELTA_US):
+    """
+    Returns (failures, missing): cases slower than the baseline by more
+    than tolerance (relative) and min_delta (us), and cases the baseline
+    has no entry for. Compares the fastest round of each: background load
+    only ever adds time, so it is far steadier than the median.
+    """
+    failures = []
+    missing = []
+    for case, entry in results.items():
+        before = baseline.get(case)
+        if before is None:
+            missing.append(case)
+            continue
+        now, was = entry["min_us"], before["min_us"]
+        if now > was * (1 + tolerance) and now - was > min_delta:
+            failures.append(f"{case}: {now:.1f} us vs baseline {was:.1f} us (+{(now / was - 1) * 100:.0f}%)")
+    return failures, missing
+
+
+def print_results(results, baseline=None):
+    for case, entry in results.items():
+        line = f"  {case:34s} {entry['us']:12.2f} us"
+        before = (baseline or {}).get(case)
+        if before:
+            line += f"  (baseline {before['us']:.2f} us, {(entry['us'] / before['us'] - 1) * 100:+.0f}%)"
+        print(line)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the detection hot path (no camera or network)")
+    parser.add_argument("--suite", action="append", choices=sorted(SUITES),
+                        help="Run only this suite (repeatable; default: all)")
+    parser.add_argument("--rounds", type=int, default=7, help="Timed rounds per case (median is kept)")
+    parser.add_argument("--baseline", default=BASELINE_PATH,
+                        help="Baseline JSON to compare against (default: the recorded one)")
+    parser.add_argument("--no-baseline", action="store_true", help="Only print the timings")
+    parser.add_argument("--save", default=None, help="Write these results as JSON (e.g. a new baseline)")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="Allowed relative slowdown against the baseline")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="OpenCV threads (default 1, like a detector pinned to one core)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    cv2.setNumThreads(args.threads)
+    baseline = None
+    if not args.no_baseline:
+        # A missing baseline must not silently turn the gate off
+        if not os.path.exists(args.baseline):
+            print(f"❌ Baseline {args.baseline} not found (record one with --save, or pass --no-baseline)")
+            sys.exit(2)
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    save = os.path.abspath(args.save) if args.save else None
+    os.chdir(BASE_DIR)
+
+    results = {}
+    for suite in args.suite or SUITES:
+        print(f"{suite}:")
+        suite_results = SUITES[suite](args.rounds)
+        print_results(suite_results, baseline)
+        results.update(suite_results)
+
+    if save:
+        with open(save, "w") as f:
+            json.dump({
+                "machine": {"python": sys.version.split()[0], "opencv": cv2.__version__,
+                            "numpy": np.__version__, "cpus": os.cpu_count(), "threads": args.threads},
+                "results": results
+            }, f, indent=2)
+        print(f"Saved to {args.save}")
+
+    if baseline is not None:
+        failures, missing = compare(results, baseline, args.tolerance)
+        for case in missing:
+            # A renamed or new case would otherwise pass unchecked; fine only while re-recording
+            if save:
+                print(f"Warning: {case} is not in {args.baseline}")
+            else:
+                failures.append(f"{case}: not in {args.baseline} (re-record it with --save)")
+        if failures:
+            for failure in failures:
+                print(f"❌ {failure}")
+            sys.exit(1)
+        print("✅ No stage regressed beyond the tolerance")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import threading
+import time
+
+
+# -------------------------------
+# Thread-safe lazy singleton
+# -------------------------------
+class Lazy:
+    """
+    Holds a value built by factory() on the first get(); every later call
+    returns the same object. Concurrent first calls build it exactly once
+    (double-checked locking), and once built get() takes no lock.
+
+    If the factory raises, nothing is cached and the next get() tries
+    again. init_seconds records how long the successful build took.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.init_seconds = None
+        self._value = None
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._ready:
+            return self._value
+        with self._lock:
+            if not self._ready:
+                start = time.perf_counter()
+                self._value = self.factory()
+                self.init_seconds = time.perf_counter() - start
+                self._ready = True
+        return self._value
+
+    @property
+    def ready(self):
+        return self._ready
+
+    def peek(self):
+        """
+        The value if already built, else None (never builds it)
+        """
+        return self._value if self._ready else None
@@ -0,0 +1,219 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RUN_DIR = os.path.join(BASE_DIR, "run")  # per-camera runtime files shared with camera_server
+
+# Upper bounds in seconds; one extra slot counts everything above the last
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Stats keys that only ever grow; every other numeric key is a gauge
+COUNTER_KEYS = {
+    "frames", "skipped", "processed", "busy_seconds", "errors", "put", "dropped",
+    "enqueued", "coalesced", "batches", "writes_sent", "failures", "rejected",
+    "appended", "uploaded", "calls", "rows", "published",
+    "dispatched", "deduplicated", "rate_limited", "sent", "failed",
+    "delivered", "reconnects", "stalls", "stall_seconds",
+    "encoded", "evicted", "clips"
+}
+
+METRIC_PREFIX = "seizowatch"
+
+
+def metrics_path(camera_id):
+    return os.path.join(RUN_DIR, f"metrics-{camera_id}.json")
+
+
+# -------------------------------
+# Fixed-bucket histogram
+# -------------------------------
+class Histogram:
+    """
+    Counts observations into fixed buckets. observe() is one bisect and
+    two additions, cheap enough to call several times per frame.
+    """
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        return {
+            "buckets": list(self.buckets),
+            "counts": list(self.counts),
+            "sum": self.sum,
+            "count": self.count
+        }
+
+
+class StageMetrics:
+    """
+    One latency histogram per stage name. Anything that accepts a
+    `timings` object (HybridDetector, CaptureThread, StageThread,
+    FirebaseWriter, EventJournal) can be given this one.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(stage, Histogram(self.buckets))
+        histogram.observe(seconds)
+
+    def snapshot(self):
+        return {stage: h.snapshot() for stage, h in list(self.histograms.items())}
+
+
+# -------------------------------
+# Export to camera_server (file)
+# -------------------------------
+class MetricsExporter(threading.Thread):
+    """
+    Writes {camera_id, pid, time, histograms, stats} as JSON to `path`
+    every `interval` seconds, atomically (write + rename), so
+    camera_server can read it at any time without talking to the
+    detector. stats_fn returns a pipeline_stats() dict.
+    """
+
+    def __init__(self, path, camera_id, metrics, stats_fn, interval=1.0):
+        super().__init__(name="metrics_exporter", daemon=True)
+        self.path = path
+        self.camera_id = str(camera_id)
+        self.metrics = metrics
+        self.stats_fn = stats_fn
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def export(self):
+        snapshot = {
+            "camera_id": self.camera_id,
+            "pid": os.getpid(),
+            "time": time.time(),
+            "histograms": self.metrics.snapshot(),
+            "stats": self.stats_fn()
+        }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, self.path)
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.export()
+            except Exception as e:
+                print(f"Warning: metrics export failed: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout=2)
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def read_snapshots(run_dir=RUN_DIR, max_age=10.0):
+    """
+    Load every detector's latest metrics file, skipping ones not updated
+    within max_age seconds (detector stopped or hung).
+    """
+    snapshots = []
+    if not os.path.isdir(run_dir):
+        return snapshots
+    now = time.time()
+    for name in sorted(os.listdir(run_dir)):
+        if not (name.startswith("metrics-") and name.endswith(".json")):
+            continue
+        try:
+            with open(os.path.join(run_dir, name)) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if now - snapshot.get("time", 0) <= max_age:
+            snapshots.append(snapshot)
+    return snapshots
+
+
+# -------------------------------
+# Prometheus text format
+# -------------------------------
+def _labels(labels):
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+
+def _stat_samples(stats):
+    """
+    (name, labels, value, type) for every numeric leaf of pipeline_stats()
+    """
+    for queue, q in stats.get("queues", {}).items():
+        yield "queue_depth", {"queue": queue}, q["depth"], "gauge"
+        if q["maxsize"] is not None:
+            yield "queue_capacity", {"queue": queue}, q["maxsize"], "gauge"
+        yield "queue_items_total", {"queue": queue}, q["put"], "counter"
+        yield "queue_dropped_total", {"queue": queue}, q["dropped"], "counter"
+    for component, values in stats.get("stages", {}).items():
+        for key, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if key in COUNTER_KEYS:
+                yield f"{component}_{key}_total", {}, value, "counter"
+            else:
+                yield f"{component}_{key}", {}, value, "gauge"
+
+
+def render_prometheus(snapshots, extra=()):
+    """
+    Prometheus text exposition (format 0.0.4) for detector snapshots.
+    extra: (name, labels, value, type) samples from the server itself.
+    """
+    families = {}   # name -> (type, [lines])
+
+    def add(name, labels, value, kind):
+        full = f"{METRIC_PREFIX}_{name}"
+        family = families.setdefault(full, (kind, []))
+        family[1].append(f"{full}{_labels(labels)} {value}")
+
+    for snapshot in snapshots:
+        camera = {"camera": snapshot["camera_id"]}
+        for stage, h in snapshot.get("histograms", {}).items():
+            full = f"{METRIC_PREFIX}_stage_seconds"
+            lines = families.setdefault(full, ("histogram", []))[1]
+            labels = dict(camera, stage=stage)
+            cumulative = 0
+            for bound, count in zip(h["buckets"], h["counts"]):
+                cumulative += count
+                lines.append(f"{full}_bucket{_labels(dict(labels, le=bound))} {cumulative}")
+            lines.append(f"{full}_bucket{_labels(dict(labels, le='+Inf'))} {h['count']}")
+            lines.append(f"{full}_sum{_labels(labels)} {h['sum']}")
+            lines.append(f"{full}_count{_labels(labels)} {h['count']}")
+        for name, labels, value, kind in _stat_samples(snapshot.get("stats", {})):
+            add(name, dict(camera, **labels), value, kind)
+
+    for name, labels, value, kind in extra:
+        add(name, labels, value, kind)
+
+    out = []
+    for name, (kind, lines) in families.items():
+        out.append(f"# TYPE {name} {kind}")
+        out.extend(lines)
+    return "\n".join(out) + "\n"
@@ -0,0 +1,140 @@
+import cv2
+import numpy as np
+
+METHODS = ("nearest", "area")
+
+
+# -------------------------------
+# Reduced-resolution motion energy
+# -------------------------------
+class MotionEngine:
+    """
+    Frame-difference motion energy: sum(|gray_t - gray_(t-1)|).
+
+    Frames are reduced by `downscale` (an integer factor per axis) before
+    the diff. downscale=None picks the largest factor that keeps the
+    reduced width at or above `target_width`, so 480p runs at full
+    resolution and 1080p is reduced 4x per axis.
+
+        nearest - decimate the BGR frame first, then convert the small
+                  image to gray. Cheapest, and the rescaled sum is an
+                  unbiased estimate of the full-resolution sum because
+                  it is a uniform sample of the same per-pixel diffs.
+        area    - convert at full resolution, then INTER_AREA resize.
+                  Averaging smooths sensor noise, so rescaled values run
+                  lower than full resolution; retune MOTION_THRESHOLD.
+
+    Every intermediate image lives in a buffer allocated once per frame
+    size and filled through OpenCV dst= outputs; the current and previous
+    gray buffers are swapped, not copied. The sum is taken with
+    cv2.sumElems and multiplied by (full pixels / reduced pixels) so the
+    result stays on the same scale as MOTION_THRESHOLD.
+
+    grid=(rows, cols) additionally splits the diff into a coarse grid
+    and exposes each block's energy (same scale) through `blocks`, row
+    by row. One integral image of the diff gives every block sum from
+    its four corners, and the whole-frame value from the last corner, so
+    this replaces the sumElems pass instead of adding one per block.
+    """
+
+    def __init__(self, downscale=None, method="nearest", target_width=480, grid=None):
+        if method not in METHODS:
+            raise ValueError(f"Unknown motion method {method!r}, expected one of {METHODS}")
+        if downscale is not None and int(downscale) < 1:
+            raise ValueError("downscale must be >= 1")
+        self.requested_downscale = None if downscale is None else int(downscale)
+        self.downscale = self.requested_downscale or 1
+        self.method = method
+        self.target_width = target_width
+        self.grid = None if grid is None else (int(grid[0]), int(grid[1]))
+        if self.grid is not None and min(self.grid) < 1:
+            raise ValueError("grid must be at least 1x1")
+        self._blocks = None
+        self._shape = None
+
+    def _allocate(self, shape):
+        height, width = shape[:2]
+        if self.requested_downscale is None:
+            self.downscale = max(1, width // self.target_width)
+        small_h, small_w = max(1, height // self.downscale), max(1, width // self.downscale)
+
+        self._shape = shape
+        self._dsize = (small_w, small_h)
+        reduced = self.downscale > 1
+        self._full_gray = np.empty((height, width), np.uint8) if reduced and self.method != "nearest" else None
+        self._small_bgr = np.empty((small_h, small_w, 3), np.uint8) if reduced and self.method == "nearest" else None
+        self._gray = np.empty((small_h, small_w), np.uint8)
+        self._prev = np.empty((small_h, small_w), np.uint8)
+        self._diff = np.empty((small_h, small_w), np.uint8)
+        self.scale = (height * width) / float(small_h * small_w)
+        self._has_prev = False
+
+        if self.grid is not None:
+            rows, cols = self.grid
+            self._ys = np.linspace(0, small_h, rows + 1).round().astype(np.intp)[:, None]
+            self._xs = np.linspace(0, small_w, cols + 1).round().astype(np.intp)
+            # 32-bit sums unless a large unreduced frame could overflow them
+            self._sdepth = cv2.CV_32S if 255 * small_h * small_w < 2 ** 31 else cv2.CV_64F
+            dtype = np.int32 if self._sdepth == cv2.CV_32S else np.float64
+            self._integral = np.empty((small_h + 1, small_w + 1), dtype)
+            self._blocks = np.zeros(rows * cols)
+
+    def _reduce(self, frame, out):
+        if self.downscale == 1:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=out)
+        elif self.method == "nearest":
+            cv2.resize(frame, self._dsize, dst=self._small_bgr, interpolation=cv2.INTER_NEAREST)
+            cv2.cvtColor(self._small_bgr, cv2.COLOR_BGR2GRAY, dst=out)
+        else:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._full_gray)
+            cv2.resize(self._full_gray, self._dsize, dst=out, interpolation=cv2.INTER_AREA)
+
+    def update(self, frame):
+        """
+        Feed one BGR frame. Returns the motion energy against the previous
+        frame, or None for the first frame (or after a size change).
+        """
+        if frame.shape != self._shape:
+            self._allocate(frame.shape)
+
+        self._reduce(frame, self._gray)
+        if not self._has_prev:
+            self._gray, self._prev = self._prev, self._gray
+            self._has_prev = True
+            return None
+
+        cv2.absdiff(self._prev, self._gray, dst=self._diff)
+        self._gray, self._prev = self._prev, self._gray
+        if self.grid is None:
+            return cv2.sumElems(self._diff)[0] * self.scale
+
+        cv2.integral(self._diff, self._integral, self._sdepth)
+        corners = self._integral[self._ys, self._xs]
+        blocks = corners[1:, 1:] - corners[:-1, 1:] - corners[1:, :-1] + corners[:-1, :-1]
+        np.multiply(blocks.ravel(), self.scale, out=self._blocks)
+        return float(corners[-1, -1]) * self.scale
+
+    @property
+    def gray(self):
+        """
+        Reduced gray image of the latest frame (valid until the next update)
+        """
+        return self._prev
+
+    @property
+    def blocks(self):
+        """
+        Per-block motion energy of the latest frame, row-major (grid only;
+        valid until the next update)
+        """
+        return self._blocks
+
+    @property
+    def diff(self):
+        """
+        Latest reduced diff image (valid until the next update)
+        """
+        return self._diff
+
+    def reset(self):
+        self._has_prev = False
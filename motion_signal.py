@@ -2,8 +2,13 @@ import cv2
 import numpy as np
 from collections import deque
 import numpy.fft as fft
+import argparse
 
-cap = cv2.VideoCapture(0)
+from capture_source import add_capture_args, open_capture
+
+parser = argparse.ArgumentParser(description="Live motion signal with rhythm detection")
+add_capture_args(parser)
+cap = open_capture(parser.parse_args())
 
 ret, prev_frame = cap.read()
 prev_gray = cv2.cvtColor(prev_frame, cv2.COLOR_BGR2GRAY)
@@ -1,21 +1,234 @@
-import onnxruntime as ort
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+
 import numpy as np
 
-session = ort.InferenceSession(
-    "seizure_verifier.onnx",
-    providers=["CPUExecutionProvider"]
-)
+from lazy_init import Lazy
 
-def verify_with_dl(avg_motion, max_motion, dominant_freq, duration):
-    features = np.array(
-        [[avg_motion, max_motion, dominant_freq, duration]],
-        dtype=np.float32
-    )
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "seizure_verifier.onnx")
+ORT_MODEL_PATH = os.path.join(BASE_DIR, "seizure_verifier.ort")  # pre-optimized copy written by convert_to_onnx.py
+DL_THRESHOLD = 0.5
+
+
+def model_digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def ort_stamp_path(ort_path):
+    """
+    Sidecar holding the sha256 of the ONNX model an ORT-format model was
+    built from
+    """
+    return f"{ort_path}.sha256"
+
+
+def default_model_path():
+    """
+    The ORT-format model when its stamp matches the current ONNX model (it
+    loads without re-running the graph optimizers), else the ONNX model.
+    File times are not used: checkouts and copies leave them arbitrary.
+    """
+    if not os.path.exists(MODEL_PATH):
+        return ORT_MODEL_PATH if os.path.exists(ORT_MODEL_PATH) else MODEL_PATH
+    try:
+        with open(ort_stamp_path(ORT_MODEL_PATH)) as f:
+            stamp = f.read().strip()
+    except OSError:
+        return MODEL_PATH
+    if os.path.exists(ORT_MODEL_PATH) and stamp == model_digest(MODEL_PATH):
+        return ORT_MODEL_PATH
+    return MODEL_PATH
+
+
+def _latency_summary(samples):
+    if not samples:
+        return {"count": 0, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+    ms = np.asarray(samples) * 1000
+    return {
+        "count": len(samples),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "max_ms": round(float(ms.max()), 3)
+    }
+
+
+# -------------------------------
+# Batched ONNX verifier
+# -------------------------------
+class OnnxVerifier:
+    """
+    Owns one tuned InferenceSession for the 4-feature verifier model.
+
+    - Explicit session options: fixed intra/inter-op thread counts (the
+      model is tiny, so one thread avoids spinning up a pool per call)
+      and full graph optimization.
+    - Warm-up runs at construction so the first real event doesn't pay
+      for lazy allocation.
+    - verify_many(rows) scores any number of rows in one session.run.
+    - verify(...) is safe to call from several camera threads at once:
+      requests queue up while a run is in flight and the batcher thread
+      scores them together in the next run (micro-batching), so a lone
+      caller sees no added delay. batch_window > 0 additionally waits
+      that long for more requests before each run.
+
+    Only the label output is fetched, which skips the ZipMap over class
+    probabilities. The score is the label, as before. With no model_path
+    the pre-optimized seizure_verifier.ort is used when it is current.
+
+    onnxruntime is imported here rather than at module import, so code
+    that never builds a verifier does not load it.
+    """
+
+    def __init__(self, model_path=None, intra_op_threads=1, inter_op_threads=1,
+                 optimization_level=None,
+                 threshold=DL_THRESHOLD, max_batch=64, batch_window=0.0,
+                 warmup_runs=3, latency_window=1000):
+        self.name = "verifier"
+        self.threshold = threshold
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+
+        import onnxruntime as ort
+        if model_path is None:
+            model_path = default_model_path()
+        self.model_path = model_path
+        if optimization_level is None:
+            optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = optimization_level
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.output_names = [self.session.get_outputs()[0].name]
 
-    output = session.run(None, {"input": features})
+        self._cond = threading.Condition()
+        self._requests = []
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self.call_latency = deque(maxlen=latency_window)
+        self.batch_latency = deque(maxlen=latency_window)
+        self.calls = 0
+        self.batches = 0
+        self.rows = 0
+        self.max_batch_seen = 0
 
-    # output is usually [[probability]]
-    onnx_score = float(output[0][0])
-    decision = onnx_score > 0.5
+        self.warmup(warmup_runs)
 
-    return decision, onnx_score
+    def warmup(self, runs=3):
+        sample = np.zeros((1, 4), dtype=np.float32)
+        for _ in range(runs):
+            self.session.run(self.output_names, {self.input_name: sample})
+
+    def _run(self, features):
+        start = time.perf_counter()
+        output = self.session.run(self.output_names, {self.input_name: features})[0]
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self.batch_latency.append(elapsed)
+            self.batches += 1
+            self.rows += len(features)
+            self.max_batch_seen = max(self.max_batch_seen, len(features))
+        return np.asarray(output, dtype=np.float64).reshape(len(features), -1)[:, 0]
+
+    def verify_many(self, rows):
+        """
+        Score rows of (avg_motion, max_motion, dominant_freq, duration).
+        Returns a list of (decision, onnx_score).
+        """
+        features = np.asarray(rows, dtype=np.float32).reshape(-1, 4)
+        if not len(features):
+            return []
+        results = []
+        for i in range(0, len(features), self.max_batch):
+            scores = self._run(features[i:i + self.max_batch])
+            results.extend((bool(score > self.threshold), float(score)) for score in scores)
+        return results
+
+    # -------------------------------
+    # Micro-batched single calls
+    # -------------------------------
+    def verify(self, avg_motion, max_motion, dominant_freq, duration):
+        start = time.perf_counter()
+        request = {
+            "row": (avg_motion, max_motion, dominant_freq, duration),
+            "done": threading.Event(),
+            "result": None,
+            "error": None
+        }
+        with self._cond:
+            self._requests.append(request)
+            self._ensure_started()
+            self._cond.notify()
+        request["done"].wait()
+        if request["error"] is not None:
+            raise request["error"]
+
+        with self._stats_lock:
+            self.calls += 1
+            self.call_latency.append(time.perf_counter() - start)
+        return request["result"]
+
+    def _ensure_started(self):
+        # Caller holds self._cond
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._batcher, name="onnx_batcher", daemon=True)
+            self._thread.start()
+
+    def _batcher(self):
+        while True:
+            with self._cond:
+                while not self._requests:
+                    self._cond.wait()
+                if self.batch_window > 0 and len(self._requests) < self.max_batch:
+                    self._cond.wait(self.batch_window)
+                batch = self._requests[:self.max_batch]
+                del self._requests[:self.max_batch]
+
+            try:
+                results = self.verify_many([request["row"] for request in batch])
+                for request, result in zip(batch, results):
+                    request["result"] = result
+            except Exception as e:
+                for request in batch:
+                    request["error"] = e
+            for request in batch:
+                request["done"].set()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "calls": self.calls,
+                "batches": self.batches,
+                "rows": self.rows,
+                "avg_batch_size": round(self.rows / self.batches, 2) if self.batches else 0.0,
+                "max_batch_size": self.max_batch_seen,
+                "call_latency": _latency_summary(list(self.call_latency)),
+                "batch_latency": _latency_summary(list(self.batch_latency))
+            }
+
+
+# Shared verifier, created (session + warm-up) on first use
+_verifier = Lazy(OnnxVerifier)
+
+
+def get_verifier():
+    return _verifier.get()
+
+
+def __getattr__(name):
+    # `verifier` used to be built at import time
+    if name == "verifier":
+        return get_verifier()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def verify_with_dl(avg_motion, max_motion, dominant_freq, duration):
+    return get_verifier().verify(avg_motion, max_motion, dominant_freq, duration)
@@ -0,0 +1,235 @@
+import mmap
+import os
+import struct
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from metrics import RUN_DIR
+
+PREVIEW_MAGIC = b"SWPV"
+# magic, state (1 = open, 0 = closed), slots, width, height, latest seq, viewer time
+HEADER_FORMAT = "<4sIIIIQd"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+LATEST_OFFSET = struct.calcsize("<4sIIII")
+VIEWER_OFFSET = LATEST_OFFSET + 8
+# per slot: seq (0 while being written), publish time (wall clock)
+SLOT_FORMAT = "<Qd"
+SLOT_HEADER_SIZE = struct.calcsize(SLOT_FORMAT)
+
+PREVIEW_WIDTH = 640       # preview frames are downscaled to at most this width
+PREVIEW_SLOTS = 3
+VIEWER_TIMEOUT = 5.0      # stop publishing this long after the last viewer request
+
+
+def preview_path(camera_id):
+    return os.path.join(RUN_DIR, f"preview-{camera_id}")
+
+
+def _layout(slots, width, height):
+    frame_size = width * height * 3
+    slot_size = SLOT_HEADER_SIZE + frame_size
+    return frame_size, slot_size, HEADER_SIZE + slots * slot_size
+
+
+# -------------------------------
+# Detector side
+# -------------------------------
+class PreviewPublisher:
+    """
+    Ring of the latest few frames in a memory-mapped file
+    (run/preview-<id>) for camera_server to stream.
+
+    Nothing is copied unless a viewer asked for frames within the last
+    VIEWER_TIMEOUT seconds (the server stamps the header). While someone
+    is watching, each frame is resized straight into the next ring slot
+    (the only copy), from the capture thread after the frame has already
+    been handed to analysis.
+    """
+
+    def __init__(self, camera_id, source_width, source_height, width=PREVIEW_WIDTH, slots=PREVIEW_SLOTS):
+        source_width = int(source_width) or 640
+        source_height = int(source_height) or 480
+        self.name = "preview"
+        self.width = min(width, source_width)
+        self.height = max(1, round(source_height * self.width / source_width))
+        self.slots = slots
+        self.seq = 0
+        self.published = 0
+
+        frame_size, slot_size, total = _layout(slots, self.width, self.height)
+        os.makedirs(RUN_DIR, exist_ok=True)
+        self.path = preview_path(camera_id)
+
+        # Build in a temp file and rename, so a reader still mapping the
+        # previous detector's file never sees it truncated
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(struct.pack(HEADER_FORMAT, PREVIEW_MAGIC, 1, slots, self.width, self.height, 0, 0.0))
+            f.truncate(total)
+        os.replace(tmp, self.path)
+        self._file = open(self.path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), total)
+        self._frames = [
+            np.frombuffer(self._map, dtype=np.uint8, count=frame_size,
+                          offset=HEADER_SIZE + i * slot_size + SLOT_HEADER_SIZE).reshape(self.height, self.width, 3)
+            for i in range(slots)
+        ]
+        self._slot_offsets = [HEADER_SIZE + i * slot_size for i in range(slots)]
+
+    def active(self):
+        viewer_time, = struct.unpack_from("<d", self._map, VIEWER_OFFSET)
+        return time.time() - viewer_time < VIEWER_TIMEOUT
+
+    def publish(self, frame):
+        if not self.active():
+            return False
+        seq = self.seq + 1
+        slot = seq % self.slots
+        offset = self._slot_offsets[slot]
+        struct.pack_into(SLOT_FORMAT, self._map, offset, 0, 0.0)
+        if frame.shape[:2] == (self.height, self.width):
+            np.copyto(self._frames[slot], frame)
+        else:
+            cv2.resize(frame, (self.width, self.height), dst=self._frames[slot], interpolation=cv2.INTER_LINEAR)
+        struct.pack_into(SLOT_FORMAT, self._map, offset, seq, time.time())
+        struct.pack_into("<Q", self._map, LATEST_OFFSET, seq)
+        self.seq = seq
+        self.published += 1
+        return True
+
+    def close(self):
+        struct.pack_into("<I", self._map, 4, 0)  # state = closed
+        self._frames = []
+        self._map.close()
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def stats(self):
+        return {"published": self.published}
+
+
+# -------------------------------
+# Server side
+# -------------------------------
+class PreviewReader:
+    """
+    Reads the newest frame of one camera's preview ring. request() tells
+    the detector a viewer is connected; latest() returns a copy of the
+    newest complete frame.
+    """
+
+    def __init__(self, camera_id):
+        self.path = preview_path(camera_id)
+        self._file = None
+        self._map = None
+        self._inode = None
+        self.slots = self.width = self.height = 0
+
+    def _close(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+        self._map = self._file = self._inode = None
+
+    def _ensure_open(self):
+        # Reopen when the detector restarted (new file) or closed this one
+        try:
+            inode = os.stat(self.path).st_ino
+        except OSError:
+            self._close()
+            return False
+        if self._map is not None and inode == self._inode and \
+                struct.unpack_from("<I", self._map, 4)[0] == 1:
+            return True
+        self._close()
+        try:
+            self._file = open(self.path, "r+b")
+            self._map = mmap.mmap(self._file.fileno(), 0)
+        except (OSError, ValueError):
+            self._close()
+            return False
+        magic, state, self.slots, self.width, self.height, _, _ = struct.unpack_from(HEADER_FORMAT, self._map, 0)
+        if magic != PREVIEW_MAGIC or state != 1:
+            self._close()
+            return False
+        self._inode = inode
+        return True
+
+    def request(self):
+        if self._ensure_open():
+            struct.pack_into("<d", self._map, VIEWER_OFFSET, time.time())
+            return True
+        return False
+
+    def latest_seq(self):
+        if not self._ensure_open():
+            return 0
+        return struct.unpack_from("<Q", self._map, LATEST_OFFSET)[0]
+
+    def latest(self):
+        """
+        (seq, publish_time, frame) for the newest frame, or None
+        """
+        if not self._ensure_open():
+            return None
+        frame_size, slot_size, _ = _layout(self.slots, self.width, self.height)
+        for _ in range(3):
+            seq = struct.unpack_from("<Q", self._map, LATEST_OFFSET)[0]
+            if seq == 0:
+                return None
+            offset = HEADER_SIZE + (seq % self.slots) * slot_size
+            start = offset + SLOT_HEADER_SIZE
+            frame = np.frombuffer(self._map[start:start + frame_size], dtype=np.uint8)
+            slot_seq, publish_time = struct.unpack_from(SLOT_FORMAT, self._map, offset)
+            if slot_seq == seq:
+                # Slot not rewritten while copying
+                return seq, publish_time, frame.reshape(self.height, self.width, 3)
+        return None
+
+
+class PreviewHub:
+    """
+    Per-camera readers plus a one-frame JPEG cache, so several clients
+    watching the same camera share one encode per frame.
+    """
+
+    def __init__(self, jpeg_quality=80):
+        self.jpeg_quality = jpeg_quality
+        self._readers = {}
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def jpeg(self, camera_id, after_seq=0, timeout=2.0, poll=0.02):
+        """
+        Wait (up to timeout) for a frame newer than after_seq and return
+        (seq, jpeg_bytes), or None if the camera has no preview ring or
+        publishes nothing in time.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                reader = self._readers.get(camera_id)
+                if reader is None:
+                    reader = self._readers[camera_id] = PreviewReader(camera_id)
+                if not reader.request():
+                    return None  # camera not running / not streaming
+                seq = reader.latest_seq()
+                if seq > after_seq:
+                    cached = self._cache.get(camera_id)
+                    if cached is not None and cached[0] == seq:
+                        return cached
+                    latest = reader.latest()
+                    if latest is not None:
+                        ok, jpeg = cv2.imencode(".jpg", latest[2], [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                        if ok:
+                            self._cache[camera_id] = (latest[0], jpeg.tobytes())
+                            return self._cache[camera_id]
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(poll)
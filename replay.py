@@ -0,0 +1,313 @@
+import argparse
+import csv
+import json
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from detector_core import (
+    HybridDetector, MOTION_THRESHOLD, RHYTHM_THRESHOLD, SEIZURE_FRAME_THRESHOLD,
+    MOTION_DOWNSCALE, MOTION_METHOD, MOTION_GRID, IDLE_THRESHOLD, parse_grid
+)
+from motion_engine import METHODS as MOTION_METHODS
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".m4v", ".webm")
+DEFAULT_FPS = 15.0
+STAGES = ("decode", "motion", "rhythm", "verify")
+
+
+# -------------------------------
+# Per-stage timings
+# -------------------------------
+class StageTimings:
+    """
+    Collects per-stage durations (seconds) and summarises them in ms.
+    """
+
+    def __init__(self):
+        self.samples = {stage: [] for stage in STAGES}
+
+    def observe(self, stage, seconds):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def summary(self):
+        report = {}
+        for stage, samples in self.samples.items():
+            if not samples:
+                continue
+            ms = np.asarray(samples) * 1000
+            report[stage] = {
+                "count": len(samples),
+                "mean_ms": round(float(ms.mean()), 3),
+                "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                "p95_ms": round(float(np.percentile(ms, 95)), 3),
+                "max_ms": round(float(ms.max()), 3),
+                "total_s": round(float(ms.sum()) / 1000, 3)
+            }
+        return report
+
+
+# -------------------------------
+# Input discovery
+# -------------------------------
+def find_videos(inputs):
+    """
+    Expand files and directories (recursively) into a sorted list of videos.
+    """
+    videos = []
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                videos.extend(
+                    os.path.join(root, name) for name in files
+                    if name.lower().endswith(VIDEO_EXTENSIONS)
+                )
+        elif os.path.isfile(path):
+            videos.append(path)
+        else:
+            print(f"Warning: {path} not found, skipping")
+    return sorted(videos)
+
+
+def output_name(video_path):
+    # Include a short path checksum so same-named videos in different folders don't collide
+    base = os.path.splitext(os.path.basename(video_path))[0]
+    return f"{base}_{zlib.crc32(os.path.abspath(video_path).encode()):08x}"
+
+
+# -------------------------------
+# Frame source
+# -------------------------------
+def video_fps(cap):
+    fps = cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+    return fps if 0 < fps < 1000 else DEFAULT_FPS
+
+
+def iter_frames(cap, fps, timings=None, skip=None):
+    """
+    Yield (frame_index, time, frame) for every frame of an opened video.
+    Times come from the container timestamps when usable, else from the
+    frame index / nominal fps.
+
+    skip(time), if given, is asked before each frame is decoded: frames
+    it returns True for are only grab()bed and yielded with frame None.
+    """
+    frame_index = 0
+    last_time = None
+    while True:
+        t0 = time.perf_counter()
+        if not cap.grab():
+            return
+
+        t = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        if (t <= 0 and frame_index > 0) or (last_time is not None and t <= last_time):
+            t = frame_index / fps
+        last_time = t
+
+        frame = None
+        if skip is None or not skip(t):
+            ret, frame = cap.retrieve()
+            if not ret:
+                return
+            if timings is not None:
+                timings.observe("decode", time.perf_counter() - t0)
+        yield frame_index, t, frame
+        frame_index += 1
+
+
+# -------------------------------
+# Replay one video
+# -------------------------------
+def replay_video(video_path, output_dir=None, verify=True, motion_threshold=MOTION_THRESHOLD,
+                 rhythm_threshold=RHYTHM_THRESHOLD, seizure_frame_threshold=SEIZURE_FRAME_THRESHOLD,
+                 motion_downscale=MOTION_DOWNSCALE, motion_method=MOTION_METHOD, motion_grid=MOTION_GRID,
+                 idle_threshold=IDLE_THRESHOLD, threads=None):
+    """
+    Run the detector over every frame of a video as fast as it decodes.
+    Frame times come from the container timestamps (falling back to the
+    frame index / nominal fps), so results match a live run at that fps.
+
+    As in a live run, frames arriving while the detector is idle are only
+    analysed at its idle sampling rate; the rest are grabbed but never
+    decoded and counted as idle_skipped. idle_threshold=None (or 0)
+    analyses every frame.
+
+    Writes <name>.csv (per-frame signal and decisions) and <name>.json
+    (decisions and report) to output_dir if given. Returns the report.
+    """
+    if threads is not None:
+        cv2.setNumThreads(threads)
+
+    verifier = None
+    if verify:
+        from onnx_inference import verify_with_dl
+        verifier = verify_with_dl
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return {"video": video_path, "error": "could not open video"}
+    fps = video_fps(cap)
+
+    timings = StageTimings()
+    detector = HybridDetector(
+        verifier,
+        motion_threshold=motion_threshold,
+        rhythm_threshold=rhythm_threshold,
+        seizure_frame_threshold=seizure_frame_threshold,
+        motion_downscale=motion_downscale,
+        motion_method=motion_method,
+        timings=timings,
+        grid=motion_grid,
+        idle_threshold=idle_threshold
+    )
+
+    rows = []
+    decisions = []
+    frames = 0
+    idle_skipped = 0
+    last_analysed = None
+
+    def idle_skip(t):
+        return detector.idle and t - last_analysed < detector.idle_interval
+
+    start = time.perf_counter()
+    for frame_index, t, frame in iter_frames(cap, fps, timings, skip=idle_skip):
+        frames += 1
+        if frame is None:
+            idle_skipped += 1
+            continue
+        last_analysed = t
+        result = detector.process(frame, t, 1.0 / fps)
+        if result is not None:
+            rows.append((
+                frame_index, round(t, 4), round(result["motion_value"], 1),
+                round(result["dominant_freq"], 3), int(result["rhythmic"]),
+                result["seizure_frames"], result["verdict"] or ""
+            ))
+            if result["verdict"] is not None:
+                decisions.append({"frame": frame_index, "time": round(t, 3),
+                                  "verdict": result["verdict"], **result["stats"]})
+    cap.release()
+
+    wall = time.perf_counter() - start
+    video_seconds = frames / fps
+    report = {
+        "video": video_path,
+        "frames": frames,
+        "video_seconds": round(video_seconds, 2),
+        "wall_seconds": round(wall, 3),
+        "fps": round(frames / wall, 1) if wall > 0 else 0.0,
+        "speedup": round(video_seconds / wall, 1) if wall > 0 else 0.0,
+        "confirmed": sum(1 for d in decisions if d["verdict"] == "confirmed"),
+        "false_positives": sum(1 for d in decisions if d["verdict"] == "false_positive"),
+        "idle_skipped": idle_skipped,
+        "stages": timings.summary()
+    }
+
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        name = output_name(video_path)
+        with open(os.path.join(output_dir, f"{name}.csv"), "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame", "time", "motion_value", "dominant_freq",
+                             "rhythmic", "seizure_frames", "verdict"])
+            writer.writerows(rows)
+        with open(os.path.join(output_dir, f"{name}.json"), "w") as f:
+            json.dump({"report": report, "decisions": decisions}, f, indent=2)
+        report["output"] = os.path.join(output_dir, name)
+
+    return report
+
+
+def _replay_job(job):
+    video_path, options = job
+    try:
+        return replay_video(video_path, **options)
+    except Exception as e:
+        return {"video": video_path, "error": str(e)}
+
+
+# -------------------------------
+# Reporting
+# -------------------------------
+def print_report(report):
+    if "error" in report:
+        print(f"{report['video']}: ERROR {report['error']}")
+        return
+    print(f"\n{report['video']}")
+    print(f"  {report['frames']} frames ({report['video_seconds']}s of video) in "
+          f"{report['wall_seconds']}s -> {report['fps']} fps, {report['speedup']}x real time")
+    print(f"  confirmed: {report['confirmed']}  false positives: {report['false_positives']}"
+          f"  idle-skipped frames: {report['idle_skipped']}")
+    for stage, s in report["stages"].items():
+        print(f"  {stage:<7} mean {s['mean_ms']:8.3f} ms  p50 {s['p50_ms']:8.3f}  "
+              f"p95 {s['p95_ms']:8.3f}  max {s['max_ms']:8.3f}  (n={s['count']})")
+    if "output" in report:
+        print(f"  output: {report['output']}.csv / .json")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay recorded video through the SeizoWatch detector")
+    parser.add_argument("inputs", nargs="+", help="Video files or directories")
+    parser.add_argument("--output", default=None, help="Directory for per-video CSV/JSON output")
+    parser.add_argument("--workers", type=int, default=1, help="Videos processed in parallel")
+    parser.add_argument("--no-verify", action="store_true", help="Skip ONNX verification")
+    parser.add_argument("--motion-threshold", type=int, default=MOTION_THRESHOLD)
+    parser.add_argument("--rhythm-threshold", type=float, default=RHYTHM_THRESHOLD,
+                        help="Minimum dominant motion frequency in Hz")
+    parser.add_argument("--seizure-frame-threshold", type=int, default=SEIZURE_FRAME_THRESHOLD)
+    parser.add_argument("--motion-downscale", type=int, default=MOTION_DOWNSCALE,
+                        help="Per-axis motion downscale factor (default: auto)")
+    parser.add_argument("--motion-method", choices=MOTION_METHODS, default=MOTION_METHOD)
+    parser.add_argument("--motion-grid", type=parse_grid, default=MOTION_GRID,
+                        help="Per-region rhythm analysis on a ROWSxCOLS grid, e.g. 4x4 (default: whole frame)")
+    parser.add_argument("--idle-threshold", type=int, default=IDLE_THRESHOLD,
+                        help="Idle mode wake threshold, as in the live detector (0 = never idle)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    videos = find_videos(args.inputs)
+    if not videos:
+        print("No videos found")
+        return
+
+    options = {
+        "output_dir": args.output,
+        "verify": not args.no_verify,
+        "motion_threshold": args.motion_threshold,
+        "rhythm_threshold": args.rhythm_threshold,
+        "seizure_frame_threshold": args.seizure_frame_threshold,
+        "motion_downscale": args.motion_downscale,
+        "motion_method": args.motion_method,
+        "motion_grid": args.motion_grid,
+        "idle_threshold": args.idle_threshold or None,
+        # One OpenCV thread per worker process so workers don't oversubscribe
+        "threads": 1 if args.workers > 1 else None
+    }
+
+    start = time.perf_counter()
+    jobs = [(video, options) for video in videos]
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            reports = list(pool.map(_replay_job, jobs))
+    else:
+        reports = [_replay_job(job) for job in jobs]
+
+    for report in reports:
+        print_report(report)
+
+    wall = time.perf_counter() - start
+    frames = sum(r.get("frames", 0) for r in reports)
+    video_seconds = sum(r.get("video_seconds", 0) for r in reports)
+    print(f"\nTotal: {len(reports)} videos, {frames} frames in {wall:.2f}s "
+          f"({frames / wall:.1f} fps, {video_seconds / wall:.1f}x real time)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+import numpy as np
+
+
+# -------------------------------
+# Sliding DFT rhythm estimator
+# -------------------------------
+class SlidingDFT:
+    """
+    Incremental DFT over the last `window` motion samples.
+
+    Only bins 1..max_bin are tracked and each new sample updates them in
+    O(bins) with the sliding-DFT recurrence
+
+        X_k <- (X_k - x_oldest + x_new) * exp(+2j*pi*k/N)
+
+    instead of rebuilding the window and running a full FFT per frame.
+
+    Mean removal only changes bin 0, so bins k >= 1 are identical with or
+    without it; the running sum is kept for `mean`. For a real signal
+    |X_k| == |X_(N-k)|, so bins above N/2 are mirrors and only
+    1..min(max_bin, N//2) are computed. dominant_index() therefore picks
+    the same peak as
+
+        np.argmax(np.abs(np.fft.fft(signal - signal.mean()))[1:max_bin + 1])
+
+    always reporting the lower of two mirrored bins, where the full FFT
+    picks either one depending on rounding.
+
+    The spectrum is recomputed exactly every `resync_interval` samples so
+    rounding error cannot accumulate.
+    """
+
+    def __init__(self, window=60, max_bin=49, resync_interval=1024):
+        self.window = window
+        self.bins = np.arange(1, min(max_bin, window // 2) + 1)
+        self.resync_interval = resync_interval
+
+        self._twiddle = np.exp(2j * np.pi * self.bins / window)
+        self._basis = np.exp(-2j * np.pi * np.outer(self.bins, np.arange(window)) / window)
+        self._ring = np.zeros(window)
+        self._pos = 0        # index of the oldest sample once the window is full
+        self._count = 0
+        self._sum = 0.0
+        self._spectrum = np.zeros(len(self.bins), dtype=complex)
+        self._since_resync = 0
+
+    @property
+    def ready(self):
+        return self._count == self.window
+
+    @property
+    def mean(self):
+        return self._sum / self._count if self._count else 0.0
+
+    @property
+    def max(self):
+        return float(self._ring[:self._count].max()) if self._count else 0.0
+
+    def update(self, x):
+        x = float(x)
+        if self._count < self.window:
+            self._ring[self._count] = x
+            self._count += 1
+            self._sum += x
+            if self.ready:
+                self._resync()
+            return
+
+        old = self._ring[self._pos]
+        self._ring[self._pos] = x
+        self._pos = (self._pos + 1) % self.window
+        self._sum += x - old
+
+        spectrum = self._spectrum
+        spectrum += x - old
+        spectrum *= self._twiddle
+
+        self._since_resync += 1
+        if self._since_resync >= self.resync_interval:
+            self._resync()
+
+    def _resync(self):
+        ordered = np.roll(self._ring, -self._pos)  # oldest first
+        self._spectrum = self._basis @ ordered
+        self._sum = float(ordered.sum())
+        self._since_resync = 0
+
+    def magnitudes(self):
+        """
+        |X_k| for every tracked bin (self.bins)
+        """
+        return np.abs(self._spectrum)
+
+    def dominant_index(self):
+        """
+        Position of the strongest bin counted from bin 1 (i.e. bin - 1),
+        the value the detector used to report as dominant_freq.
+        """
+        return int(np.argmax(self.magnitudes()))
+
+    def dominant_frequency(self, sample_rate):
+        """
+        Frequency in Hz of the strongest bin for a signal sampled at
+        sample_rate: bin * sample_rate / window
+        """
+        return float(self.bins[self.dominant_index()]) * sample_rate / self.window
+
+    def reset(self):
+        self._ring[:] = 0.0
+        self._pos = 0
+        self._count = 0
+        self._sum = 0.0
+        self._spectrum[:] = 0.0
+        self._since_resync = 0
+
+
+# -------------------------------
+# Uniform resampling of timestamped samples
+# -------------------------------
+class UniformResampler:
+    """
+    Converts irregular (timestamp, value) samples into a series on a fixed
+    grid of `rate` Hz by linear interpolation, so dropped or decimated
+    frames do not stretch the spectral window or shift bin frequencies.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.period = 1.0 / rate
+        self._last_t = None
+        self._last_x = None
+        self._next_t = None
+
+    def push(self, t, x):
+        """
+        Returns the grid values that fall in (previous t, t].
+        """
+        if self._last_t is None:
+            self._last_t, self._last_x = t, x
+            self._next_t = t + self.period
+            return [x]
+
+        values = []
+        span = t - self._last_t
+        while self._next_t <= t:
+            frac = (self._next_t - self._last_t) / span
+            values.append(self._last_x + (x - self._last_x) * frac)
+            self._next_t += self.period
+        self._last_t, self._last_x = t, x
+        return values
+
+    def reset(self):
+        self._last_t = None
+        self._last_x = None
+        self._next_t = None
+
+
+# -------------------------------
+# Timestamp-driven rhythm estimator
+# -------------------------------
+class RhythmEstimator:
+    """
+    Sliding-DFT rhythm analysis on timestamped motion samples.
+
+    Samples are resampled to `sample_rate` Hz before the DFT, so the
+    window always covers window / sample_rate seconds and bins convert to
+    true Hz regardless of the camera's actual or momentary frame rate.
+    A gap longer than max_gap seconds (camera stall) restarts the window.
+    """
+
+    def __init__(self, sample_rate=15.0, window=60, max_bin=49, max_gap=1.0):
+        self.sample_rate = sample_rate
+        self.max_gap = max_gap
+        self.gaps = 0
+        self._resampler = UniformResampler(sample_rate)
+        self._dft = SlidingDFT(window, max_bin)
+        self._last_t = None
+
+    @property
+    def ready(self):
+        return self._dft.ready
+
+    @property
+    def window_seconds(self):
+        return self._dft.window / self.sample_rate
+
+    @property
+    def mean(self):
+        return self._dft.mean
+
+    @property
+    def max(self):
+        return self._dft.max
+
+    def update(self, t, x):
+        if self._last_t is not None and t - self._last_t > self.max_gap:
+            self.gaps += 1
+            self.reset()
+        self._last_t = t
+        for value in self._resampler.push(t, x):
+            self._dft.update(value)
+
+    def dominant_frequency(self):
+        return self._dft.dominant_frequency(self.sample_rate)
+
+    def reset(self):
+        self._resampler.reset()
+        self._dft.reset()
+        self._last_t = None
+
+
+# -------------------------------
+# Per-region rhythm (batched FFT)
+# -------------------------------
+class BlockRhythmEstimator:
+    """
+    Rhythm analysis for every block of a motion grid at once.
+
+    Block energies (MotionEngine.blocks) are resampled to `sample_rate`
+    like RhythmEstimator and written into one (blocks x window) ring. The
+    spectrum is a single np.fft.rfft along the time axis over the whole
+    ring, computed only when asked for and at most once per new sample. The ring is never rotated:
+    a circular shift only changes the phase of each bin, so the
+    magnitudes match the oldest-first window exactly, and bin 0 (where
+    mean removal would matter) is skipped as in SlidingDFT.
+    """
+
+    def __init__(self, blocks, sample_rate=15.0, window=60, max_bin=49, max_gap=1.0):
+        self.blocks = blocks
+        self.sample_rate = sample_rate
+        self.window = window
+        self.max_gap = max_gap
+        self.bins = np.arange(1, min(max_bin, window // 2) + 1)
+        self.gaps = 0
+        self._resampler = UniformResampler(sample_rate)
+        self._ring = np.zeros((blocks, window))
+        self._pos = 0
+        self._count = 0
+        self._last_t = None
+        self._spectrum = None
+
+    @property
+    def ready(self):
+        return self._count == self.window
+
+    def update(self, t, energies):
+        if self._last_t is not None and t - self._last_t > self.max_gap:
+            self.gaps += 1
+            self.reset()
+        self._last_t = t
+        for values in self._resampler.push(t, np.array(energies, dtype=float)):
+            self._ring[:, self._pos] = values
+            self._pos = (self._pos + 1) % self.window
+            self._count = min(self._count + 1, self.window)
+            self._spectrum = None
+
+    def magnitudes(self):
+        """
+        (blocks x len(self.bins)) spectrum magnitudes of the current window
+        """
+        if self._spectrum is None:
+            spectrum = np.fft.rfft(self._ring, axis=1)
+            self._spectrum = np.abs(spectrum[:, self.bins])
+        return self._spectrum
+
+    def dominant(self):
+        """
+        (frequencies in Hz, peak magnitudes), one entry per block
+        """
+        magnitudes = self.magnitudes()
+        peaks = magnitudes.argmax(axis=1)
+        rows = np.arange(self.blocks)
+        return self.bins[peaks] * (self.sample_rate / self.window), magnitudes[rows, peaks]
+
+    def means(self):
+        count = self._count or 1
+        return self._ring.sum(axis=1) / count
+
+    def reset(self):
+        self._resampler.reset()
+        self._ring[:] = 0.0
+        self._pos = 0
+        self._count = 0
+        self._last_t = None
+        self._spectrum = None
@@ -2,9 +2,14 @@ import cv2
 import numpy as np
 from collections import deque
 import numpy.fft as fft
+import argparse
+
+from capture_source import add_capture_args, open_capture
 
 # ---- Camera Setup ----
-cap = cv2.VideoCapture(0)
+parser = argparse.ArgumentParser(description="Rule-based seizure detector (v1)")
+add_capture_args(parser)
+cap = open_capture(parser.parse_args())
 
 ret, prev_frame = cap.read()
 if not ret:
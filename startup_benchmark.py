@@ -0,0 +1,166 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BASE_DIR, "benchmarks", "startup_baseline.json")
+
+# Modules timed on a cold import, each in a fresh interpreter
+MODULES = (
+    "camera_server",
+    "firebase_logger",
+    "onnx_inference",
+    "detector_core",
+    "final_seizure_detector",
+)
+
+# Lazily created resources, timed after their module is imported
+INITIALIZERS = {
+    "firebase_app": ("firebase_logger", "firebase_logger.get_firebase_app()"),
+    "twilio_client": ("firebase_logger", "firebase_logger.get_twilio_client()"),
+    "onnx_verifier": ("onnx_inference", "onnx_inference.get_verifier()"),
+}
+
+HEAVY_MODULES = ("cv2", "onnxruntime", "firebase_admin", "twilio")
+
+# Heavy SDKs a module must not pull in just by being imported
+FORBIDDEN_IMPORTS = {
+    "camera_server": ("onnxruntime",),
+    "firebase_logger": ("firebase_admin", "twilio", "onnxruntime"),
+    "onnx_inference": ("onnxruntime",),
+}
+
+TOLERANCE = 0.5      # fail when 50% slower than the baseline...
+MIN_DELTA = 0.05     # ...and at least 50 ms slower (import times are noisy)
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter() - start
+init = None
+if {init!r}:
+    start = time.perf_counter()
+    {init}
+    init = time.perf_counter() - start
+print(json.dumps({{"import": imported, "init": init,
+                  "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def probe(module, init=""):
+    """
+    Import `module` (then run `init`) in a fresh interpreter; returns
+    {"import": s, "init": s or None, "loaded": [heavy modules now loaded]}
+    """
+    code = _PROBE.format(module=module, init=init, heavy=HEAVY_MODULES)
+    out = subprocess.run([sys.executable, "-c", code], cwd=BASE_DIR, capture_output=True,
+                         text=True, timeout=300)
+    if out.returncode != 0:
+        raise RuntimeError(f"{module}: {out.stderr.strip().splitlines()[-1] if out.stderr else out.returncode}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run(repeat=3):
+    """
+    Median cold import time per module and init time per resource
+    """
+    results = {"imports": {}, "inits": {}}
+    for module in MODULES:
+        samples = [probe(module) for _ in range(repeat)]
+        results["imports"][module] = {
+            "seconds": statistics.median(s["import"] for s in samples),
+            "loaded": samples[-1]["loaded"]
+        }
+    for name, (module, init) in INITIALIZERS.items():
+        try:
+            samples = [probe(module, init) for _ in range(repeat)]
+        except RuntimeError as e:
+            # e.g. no firebase_key.json on this machine; imports are still checked
+            print(f"Warning: skipping {name}: {e}")
+            continue
+        results["inits"][name] = {"seconds": statistics.median(s["init"] for s in samples)}
+    return results
+
+
+def check(results, baseline=None, tolerance=TOLERANCE, min_delta=MIN_DELTA):
+    """
+    List of failures: forbidden imports, and timings that regressed past
+    the baseline by more than tolerance (relative) and min_delta (seconds)
+    """
+    failures = []
+    for module, forbidden in FORBIDDEN_IMPORTS.items():
+        loaded = results["imports"].get(module, {}).get("loaded", [])
+        for name in forbidden:
+            if name in loaded:
+                failures.append(f"import {module} loads {name}")
+    if baseline:
+        for section in ("imports", "inits"):
+            for name, entry in results[section].items():
+                before = baseline.get(section, {}).get(name)
+                if before is None:
+                    continue
+                now, was = entry["seconds"], before["seconds"]
+                if now > was * (1 + tolerance) and now - was > min_delta:
+                    failures.append(f"{name}: {now * 1000:.0f} ms vs baseline {was * 1000:.0f} ms")
+    return failures
+
+
+def print_results(results, baseline=None):
+    for section, title in (("imports", "Cold import"), ("inits", "First-use init")):
+        print(f"{title}:")
+        for name, entry in results[section].items():
+            line = f"  {name:24s} {entry['seconds'] * 1000:8.1f} ms"
+            before = (baseline or {}).get(section, {}).get(name)
+            if before:
+                line += f"  (baseline {before['seconds'] * 1000:.1f} ms)"
+            if entry.get("loaded"):
+                line += f"  loads {', '.join(entry['loaded'])}"
+            print(line)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Import and initialization time of the backend modules")
+    parser.add_argument("--repeat", type=int, default=3, help="Cold runs per measurement (median is kept)")
+    parser.add_argument("--baseline", default=BASELINE_PATH,
+                        help="Baseline JSON to compare against (default: the recorded one)")
+    parser.add_argument("--no-baseline", action="store_true",
+                        help="Only check forbidden imports, no timing comparison")
+    parser.add_argument("--save", default=None, help="Write these results as JSON (e.g. a new baseline)")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="Allowed relative slowdown against the baseline")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    baseline = None
+    if not args.no_baseline:
+        # A missing baseline must not silently turn the gate off
+        if not os.path.exists(args.baseline):
+            print(f"❌ Baseline {args.baseline} not found (record one with --save, or pass --no-baseline)")
+            sys.exit(2)
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = run(args.repeat)
+    print_results(results, baseline)
+    if args.save:
+        results["machine"] = {"python": sys.version.split()[0], "cpus": os.cpu_count()}
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved to {args.save}")
+
+    failures = check(results, baseline, args.tolerance)
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("✅ Startup within limits")
+
+
+if __name__ == "__main__":
+    main()
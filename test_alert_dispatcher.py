@@ -0,0 +1,120 @@
+import time
+import types
+
+import pytest
+
+import alert_dispatcher
+from alert_dispatcher import AlertDispatcher, FakeTwilioClient
+
+SENDER = "whatsapp:+10000000000"
+RECIPIENTS = ["whatsapp:+10000000001", "whatsapp:+10000000002"]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Only the dispatcher's monotonic clock is faked; sends still run on
+    # real threads
+    clock = Clock()
+    monkeypatch.setattr(alert_dispatcher, "time",
+                        types.SimpleNamespace(monotonic=clock, sleep=time.sleep, time=time.time))
+    return clock
+
+
+def make_dispatcher(client, **kwargs):
+    kwargs.setdefault("retry_backoff", 0.0)
+    return AlertDispatcher(client, SENDER, RECIPIENTS, formatter=lambda e: f"ALERT {e.get('camera_id')}",
+                           **kwargs)
+
+
+def test_one_alert_per_episode(clock):
+    fake = FakeTwilioClient()
+    dispatcher = make_dispatcher(fake)
+
+    assert dispatcher.dispatch({"camera_id": "0"})
+    clock.now += 60
+    assert not dispatcher.dispatch({"camera_id": "0"})
+    # Each duplicate extends the episode: 110 s after the last event, but
+    # 170 s after the alert, is still the same seizure
+    clock.now += 110
+    assert not dispatcher.dispatch({"camera_id": "0"})
+    assert dispatcher.dispatch({"camera_id": "1"})
+    clock.now += 121
+    assert dispatcher.dispatch({"camera_id": "0"})
+
+    assert dispatcher.flush(5)
+    assert sorted(m["body"] for m in fake.sent) == ["ALERT 0"] * 4 + ["ALERT 1"] * 2
+    stats = dispatcher.stats()
+    assert (stats["dispatched"], stats["deduplicated"], stats["sent"]) == (3, 2, 6)
+
+
+def test_episode_id_overrides_camera(clock):
+    fake = FakeTwilioClient()
+    dispatcher = make_dispatcher(fake)
+
+    assert dispatcher.dispatch({"camera_id": "0", "episode_id": "a"})
+    assert not dispatcher.dispatch({"camera_id": "0", "episode_id": "a"})
+    assert dispatcher.dispatch({"camera_id": "0", "episode_id": "b"})
+    assert dispatcher.flush(5)
+    assert len(fake.sent) == 4
+
+
+def test_rate_limit_per_recipient(clock):
+    fake = FakeTwilioClient()
+    dispatcher = make_dispatcher(fake, dedup_window=0.0, rate_limit=2, rate_period=600.0)
+
+    for camera in ("0", "1", "2"):
+        assert dispatcher.dispatch({"camera_id": camera})
+    assert dispatcher.flush(5)
+    assert len(fake.sent) == 4
+    assert dispatcher.stats()["rate_limited"] == 2
+    for to in RECIPIENTS:
+        assert sum(m["to"] == to for m in fake.sent) == 2
+
+    # One token back per recipient after rate_period / rate_limit seconds
+    clock.now += 300
+    assert dispatcher.dispatch({"camera_id": "3"})
+    assert dispatcher.dispatch({"camera_id": "4"})
+    assert dispatcher.flush(5)
+    assert len(fake.sent) == 6
+    assert dispatcher.stats()["rate_limited"] == 4
+
+
+def test_retry_on_transient_failure(clock):
+    fake = FakeTwilioClient(fail_first=2)
+    dispatcher = AlertDispatcher(fake, SENDER, RECIPIENTS[:1], formatter=str, max_attempts=3, retry_backoff=0.0)
+
+    dispatcher.dispatch({"camera_id": "0"})
+    assert dispatcher.flush(5)
+    assert len(fake.sent) == 1
+    stats = dispatcher.stats()
+    assert (stats["sent"], stats["failed"]) == (1, 0)
+
+
+def test_gives_up_after_max_attempts(clock):
+    fake = FakeTwilioClient(fail_first=3)
+    dispatcher = AlertDispatcher(fake, SENDER, RECIPIENTS[:1], formatter=str, max_attempts=3, retry_backoff=0.0)
+
+    dispatcher.dispatch({"camera_id": "0"})
+    assert dispatcher.flush(5)
+    assert fake.sent == []
+    stats = dispatcher.stats()
+    assert (stats["sent"], stats["failed"]) == (0, 1)
+
+
+def test_dispatch_does_not_wait_for_sends(clock):
+    fake = FakeTwilioClient(latency=0.3)
+    dispatcher = make_dispatcher(fake)
+
+    start = time.perf_counter()
+    dispatcher.dispatch({"camera_id": "0"})
+    assert time.perf_counter() - start < 0.1
+    assert dispatcher.flush(5)
+    assert len(fake.sent) == 2
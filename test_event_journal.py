@@ -0,0 +1,177 @@
+import subprocess
+import sys
+
+import pytest
+
+import event_journal
+from event_journal import EventJournal, PENDING, SYNCED, REJECTED
+
+
+class FakeDatabase:
+    """
+    Records every multi-location update; paths containing `reject` fail
+    the whole update with ValueError, like firebase_admin does for an
+    invalid key
+    """
+
+    def __init__(self, reject=None):
+        self.reject = reject
+        self.updates = []
+        self.data = {}
+
+    def update(self, updates):
+        if self.reject and any(self.reject in path for path in updates):
+            raise ValueError(f"invalid path in {sorted(updates)}")
+        self.updates.append(dict(updates))
+        self.data.update(updates)
+
+
+@pytest.fixture(autouse=True)
+def no_background_sync(monkeypatch):
+    # Every test drives sync_once() itself
+    monkeypatch.setattr(EventJournal, "_ensure_started", lambda self: None)
+
+
+def make_journal(tmp_path, database, **kwargs):
+    return EventJournal(str(tmp_path / "journal.db"), database.update, **kwargs)
+
+
+def states(journal):
+    return dict(journal._connection().execute("SELECT path, synced FROM journal").fetchall())
+
+
+def test_push_keys_are_fixed_at_append(tmp_path):
+    database = FakeDatabase()
+    journal = make_journal(tmp_path, database)
+    keys = [journal.append("events", {"n": n}) for n in range(3)]
+    assert len(set(keys)) == 3
+
+    assert journal.sync_once() == 3
+    first = dict(database.data)
+    assert first == {f"events/{key}": {"n": n} for n, key in enumerate(keys)}
+
+    # Crash after the upload but before the rows were marked: re-uploading
+    # writes the same children again instead of duplicating them
+    journal._connection().execute("UPDATE journal SET synced = 0")
+    assert journal.sync_once() == 3
+    assert database.updates[1] == database.updates[0]
+    assert database.data == first
+
+
+def test_newest_set_row_wins(tmp_path):
+    database = FakeDatabase()
+    journal = make_journal(tmp_path, database)
+    for count in range(5):
+        journal.append("rollups/daily/2026-01-01", {"count": count}, kind="set")
+
+    assert journal.sync_once() == 5
+    assert database.updates == [{"rollups/daily/2026-01-01": {"count": 4}}]
+    assert journal.pending() == 0
+
+
+def test_rejected_row_is_quarantined(tmp_path):
+    database = FakeDatabase(reject="bad")
+    journal = make_journal(tmp_path, database)
+    for n in range(10):
+        journal.append("events/bad.path" if n == 6 else "events", {"n": n})
+
+    assert journal.sync_once() == 10
+    assert journal.pending() == 0
+    assert journal.uploaded == 9
+    assert journal.rejected == 1
+    uploaded = sorted(value["n"] for update in database.updates for value in update.values())
+    assert uploaded == [0, 1, 2, 3, 4, 5, 7, 8, 9]
+    assert states(journal)["events/bad.path"] == REJECTED
+    assert set(states(journal).values()) == {SYNCED, REJECTED}
+
+    # Later events are not held up by the quarantined row
+    journal.append("events", {"n": 10})
+    assert journal.sync_once() == 1
+    assert list(database.updates[-1].values()) == [{"n": 10}]
+
+
+def test_transient_error_keeps_rows_pending(tmp_path):
+    def offline(updates):
+        raise ConnectionError("network down")
+
+    journal = EventJournal(str(tmp_path / "journal.db"), offline)
+    journal.append("events", {"n": 0})
+    with pytest.raises(ConnectionError):
+        journal.sync_once()
+    assert journal.pending() == 1
+    assert set(states(journal).values()) == {PENDING}
+
+
+def test_lease_holder_uploads_alone(tmp_path):
+    database = FakeDatabase()
+    a = make_journal(tmp_path, database)
+    b = make_journal(tmp_path, database)
+    a.append("events", {"from": "a"})
+    assert a.sync_once() == 1
+
+    # b's rows wait for the holder while its lease is valid
+    b.append("events", {"from": "b"})
+    assert b.sync_once() == 0
+    assert b.pending() == 1
+    assert a.sync_once() == 1
+    assert b.pending() == 0
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    database = FakeDatabase()
+    a = make_journal(tmp_path, database)
+    b = make_journal(tmp_path, database)
+    a.append("events", {"n": 0})
+    assert a.sync_once() == 1
+
+    b.append("events", {"n": 1})
+    b._connection().execute("UPDATE sync_lease SET expires = 0")
+    assert b.sync_once() == 1
+    assert b.pending() == 0
+    # a now waits its turn
+    a.append("events", {"n": 2})
+    assert a.sync_once() == 0
+
+
+def test_lease_of_exited_process_is_taken_over(tmp_path):
+    database = FakeDatabase()
+    journal = make_journal(tmp_path, database)
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    journal._connection().execute(
+        "INSERT OR REPLACE INTO sync_lease (id, owner, expires) VALUES (1, ?, ?)",
+        (f"{exited.pid}:0", 1e12)
+    )
+    assert not event_journal._process_alive(f"{exited.pid}:0")
+
+    journal.append("events", {"n": 0})
+    assert journal.sync_once() == 1
+
+
+def test_prune_drops_old_synced_set_rows_only(tmp_path):
+    database = FakeDatabase()
+    journal = make_journal(tmp_path, database, set_retention=0.0)
+    journal.append("events", {"n": 0})
+    journal.append("state", {"on": True}, kind="set")
+    assert journal.sync_once() == 2
+    journal.append("state", {"on": False}, kind="set")  # not synced yet
+
+    journal._prune(journal._connection())
+    rows = journal._connection().execute("SELECT kind, synced FROM journal ORDER BY id").fetchall()
+    assert rows == [("push", SYNCED), ("set", PENDING)]
+    assert [payload for _, payload in journal.iter_entries("events")] == [{"n": 0}]
+
+
+def test_server_side_rejection_is_permanent(tmp_path):
+    class InvalidArgumentError(Exception):
+        code = "INVALID_ARGUMENT"
+
+    def update(updates):
+        if any("bad" in path for path in updates):
+            raise InvalidArgumentError("rejected by the server")
+
+    journal = EventJournal(str(tmp_path / "journal.db"), update)
+    journal.append("events", {"n": 0})
+    journal.append("events/bad", {"n": 1})
+    assert journal.sync_once() == 2
+    assert (journal.uploaded, journal.rejected) == (1, 1)
@@ -0,0 +1,97 @@
+import numpy as np
+
+from rhythm_analysis import SlidingDFT, RhythmEstimator
+
+WINDOW = 60
+MAX_BIN = 49
+
+
+def baseline_bin(window):
+    """
+    Dominant bin of the per-frame FFT the detector used before the
+    sliding DFT, folded onto 1..WINDOW//2: for a real signal bin k and
+    bin WINDOW-k have the same magnitude and SlidingDFT reports the lower
+    """
+    b = int(np.argmax(np.abs(np.fft.fft(window))[1:MAX_BIN + 1])) + 1
+    return min(b, WINDOW - b)
+
+
+def sliding_bin(dft):
+    return int(dft.bins[dft.dominant_index()])
+
+
+def check_stream(samples, **kwargs):
+    dft = SlidingDFT(WINDOW, MAX_BIN, **kwargs)
+    checked = 0
+    for i, x in enumerate(samples):
+        dft.update(x)
+        if dft.ready:
+            assert sliding_bin(dft) == baseline_bin(np.asarray(samples[i + 1 - WINDOW:i + 1])), f"sample {i}"
+            checked += 1
+    return checked
+
+
+def test_random_windows():
+    rng = np.random.default_rng(0)
+    samples = rng.random(600) * 1e6
+    assert check_stream(samples) == 600 - WINDOW + 1
+
+
+def test_random_windows_across_resyncs():
+    # Exercises the recurrence and the exact recomputation every 16 samples
+    rng = np.random.default_rng(1)
+    samples = rng.normal(5e5, 2e5, 600)
+    assert check_stream(samples, resync_interval=16) > 0
+
+
+def test_sinusoids():
+    rng = np.random.default_rng(2)
+    n = np.arange(300)
+    for cycles in (1, 2.5, 4, 7.3, 12, 19.5, 29):
+        signal = 1e6 + 4e5 * np.sin(2 * np.pi * cycles * n / WINDOW + rng.random())
+        signal += rng.normal(0, 2e4, len(n))
+        check_stream(signal)
+
+
+def test_mirror_bin_reports_lower_bin():
+    # A pure tone has equal peaks at bin k and WINDOW-k; the full FFT may
+    # pick either, the sliding DFT always reports k
+    for k in (3, 11, 20):
+        signal = np.cos(2 * np.pi * k * np.arange(WINDOW) / WINDOW)
+        dft = SlidingDFT(WINDOW, MAX_BIN)
+        for x in signal:
+            dft.update(x)
+        assert sliding_bin(dft) == k
+        assert baseline_bin(signal) == k
+
+
+def test_reset_after_gap():
+    rate = 15.0
+    estimator = RhythmEstimator(sample_rate=rate, window=WINDOW, max_bin=MAX_BIN, max_gap=1.0)
+    t = 0.0
+    for i in range(120):
+        t = i / rate
+        estimator.update(t, 1e6 + 4e5 * np.sin(2 * np.pi * 1.0 * t))
+    assert estimator.ready
+    assert estimator.dominant_frequency() == 1.0
+
+    # Stall longer than max_gap: the window restarts instead of mixing
+    # the old signal with the new one
+    start = t + 1.5
+    values = [1e6 + 4e5 * np.sin(2 * np.pi * 3.0 * i / rate) for i in range(WINDOW)]
+    for i, x in enumerate(values[:-1]):
+        estimator.update(start + i / rate, x)
+    assert estimator.gaps == 1
+    assert not estimator.ready
+    estimator.update(start + (WINDOW - 1) / rate, values[-1])
+    assert estimator.ready
+    assert estimator.dominant_frequency() == baseline_bin(np.asarray(values)) * rate / WINDOW == 3.0
+
+
+def test_no_reset_within_gap():
+    estimator = RhythmEstimator(sample_rate=15.0, max_gap=1.0)
+    for i in range(WINDOW):
+        estimator.update(i / 15.0, float(i))
+    estimator.update((WINDOW - 1) / 15.0 + 0.9, 1.0)
+    assert estimator.gaps == 0
+    assert estimator.ready
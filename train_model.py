@@ -1,34 +1,181 @@
+import argparse
+import json
+import os
+
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.neural_network import MLPClassifier
 from sklearn.metrics import accuracy_score
+import joblib
 
-X = np.load("X.npy")
-y = np.load("y.npy")
+# Datasets up to this many rows are trained in memory exactly as before;
+# larger ones are streamed from the memory-mapped files chunk by chunk
+IN_MEMORY_ROWS = 1_000_000
+CHUNK_ROWS = 100_000
+EPOCHS = 5
+TEST_EVERY = 5  # out-of-core: every 5th row is held out for testing
 
-# Normalize data
-scaler = StandardScaler()
-X = scaler.fit_transform(X)
+# Raw (unscaled) held-out rows saved next to the model, so later steps
+# (convert_to_onnx.py) check it on data it never trained on. Capped, so a
+# huge dataset's test set is sampled evenly rather than copied whole.
+HELDOUT_PATH = "heldout.npz"
+HELDOUT_ROWS = 10_000
 
-# Train-test split
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42
-)
 
-# Tiny neural network
-model = MLPClassifier(
-    hidden_layer_sizes=(8,),
-    max_iter=500,
-    random_state=42
-)
+def new_model():
+    # Tiny neural network
+    return MLPClassifier(
+        hidden_layer_sizes=(8,),
+        max_iter=500,
+        random_state=42
+    )
 
-model.fit(X_train, y_train)
 
-y_pred = model.predict(X_test)
-print("✅ Accuracy:", accuracy_score(y_test, y_pred))
+def load_dataset(x_path="X.npy", y_path="y.npy"):
+    """
+    Memory-mapped features and labels as a one-part dataset: a list of
+    (X, y) pairs. Nothing is read until used.
+    """
+    X = np.load(x_path, mmap_mode="r")
+    y = np.load(y_path, mmap_mode="r")
+    if len(X) != len(y):
+        raise ValueError(f"{x_path} has {len(X)} rows but {y_path} has {len(y)}")
+    return [(X, y)]
 
-# Save model & scaler
-import joblib
-joblib.dump(model, "seizure_model.pkl")
-joblib.dump(scaler, "scaler.pkl")
+
+def load_shards(data_dir):
+    """
+    Sharded dataset written by extract_features.py (manifest.json plus
+    X-*.npy / y-*.npy), one memory-mapped part per shard.
+    """
+    with open(os.path.join(data_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    parts = []
+    for shard in manifest["shards"]:
+        parts += load_dataset(os.path.join(data_dir, shard["x"]), os.path.join(data_dir, shard["y"]))
+    return parts
+
+
+def dataset_rows(parts):
+    return sum(len(y) for _, y in parts)
+
+
+def iter_chunks(parts, chunk_rows=CHUNK_ROWS, shuffle=None):
+    """
+    Yield (start, X_chunk, y_chunk) loaded into memory one chunk at a
+    time; start is the chunk's row offset in the whole dataset. shuffle,
+    a numpy Generator, randomises the chunk order.
+    """
+    chunks = []
+    offset = 0
+    for X, y in parts:
+        for start in range(0, len(y), chunk_rows):
+            chunks.append((X, y, start, offset + start))
+        offset += len(y)
+    if shuffle is not None:
+        chunks = [chunks[i] for i in shuffle.permutation(len(chunks))]
+    for X, y, start, global_start in chunks:
+        end = min(start + chunk_rows, len(y))
+        yield global_start, np.asarray(X[start:end], dtype=np.float64), np.asarray(y[start:end])
+
+
+def test_mask(start, size):
+    return (np.arange(start, start + size) % TEST_EVERY) == 0
+
+
+def save_heldout(X, y, path=HELDOUT_PATH):
+    np.savez(path, X=np.asarray(X, dtype=np.float64), y=np.asarray(y))
+
+
+def train_in_memory(parts, heldout_path=HELDOUT_PATH):
+    X_raw = np.concatenate([np.asarray(X) for X, _ in parts])
+    y = np.concatenate([np.asarray(y) for _, y in parts])
+
+    # Normalize data
+    scaler = StandardScaler()
+    X = scaler.fit_transform(X_raw)
+
+    # Train-test split (by index, so the raw test rows can be saved)
+    train, test = train_test_split(np.arange(len(y)), test_size=0.2, random_state=42)
+    X_train, X_test, y_train, y_test = X[train], X[test], y[train], y[test]
+    stride = max(1, -(-len(test) // HELDOUT_ROWS))
+    save_heldout(X_raw[test][::stride], y_test[::stride], heldout_path)
+
+    model = new_model()
+    model.fit(X_train, y_train)
+
+    y_pred = model.predict(X_test)
+    return model, scaler, accuracy_score(y_test, y_pred)
+
+
+def train_out_of_core(parts, chunk_rows=CHUNK_ROWS, epochs=EPOCHS, seed=42, heldout_path=HELDOUT_PATH):
+    """
+    Same scaler and network, fitted with partial_fit over chunks so only
+    one chunk is in memory at a time.
+    """
+    rng = np.random.default_rng(seed)
+    classes = np.array([0, 1])
+
+    # Pass 1: scaler statistics on the training rows
+    scaler = StandardScaler()
+    for start, X_chunk, _ in iter_chunks(parts, chunk_rows):
+        scaler.partial_fit(X_chunk[~test_mask(start, len(X_chunk))])
+
+    # Pass 2..: shuffled chunks, shuffled rows within each chunk
+    model = new_model()
+    for epoch in range(epochs):
+        for start, X_chunk, y_chunk in iter_chunks(parts, chunk_rows, rng):
+            train = ~test_mask(start, len(X_chunk))
+            rows = rng.permutation(np.flatnonzero(train))
+            model.partial_fit(scaler.transform(X_chunk[rows]), y_chunk[rows], classes=classes)
+        print(f"Epoch {epoch + 1}/{epochs} done (loss {model.loss_:.4f})")
+
+    correct = total = 0
+    stride = max(1, -(-dataset_rows(parts) // TEST_EVERY // HELDOUT_ROWS))
+    heldout_X, heldout_y = [], []
+    for start, X_chunk, y_chunk in iter_chunks(parts, chunk_rows):
+        test = test_mask(start, len(X_chunk))
+        y_pred = model.predict(scaler.transform(X_chunk[test]))
+        correct += int((y_pred == y_chunk[test]).sum())
+        total += int(test.sum())
+        # Every stride-th test row (by global row number) is kept
+        rows = np.flatnonzero(test)
+        rows = rows[((start + rows) // TEST_EVERY) % stride == 0]
+        heldout_X.append(X_chunk[rows])
+        heldout_y.append(y_chunk[rows])
+    save_heldout(np.concatenate(heldout_X), np.concatenate(heldout_y), heldout_path)
+    return model, scaler, correct / total if total else 0.0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the seizure verifier")
+    parser.add_argument("--x", default="X.npy", help="Features (.npy)")
+    parser.add_argument("--y", default="y.npy", help="Labels (.npy)")
+    parser.add_argument("--data", default=None,
+                        help="Sharded dataset directory from extract_features.py (instead of --x/--y)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--epochs", type=int, default=EPOCHS, help="Passes over the data (out-of-core only)")
+    parser.add_argument("--heldout", default=HELDOUT_PATH,
+                        help="Where to save the raw held-out test rows (read by convert_to_onnx.py)")
+    parser.add_argument("--out-of-core", action="store_true",
+                        help=f"Stream from disk even below {IN_MEMORY_ROWS} rows")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    parts = load_shards(args.data) if args.data else load_dataset(args.x, args.y)
+    rows = dataset_rows(parts)
+
+    if args.out_of_core or rows > IN_MEMORY_ROWS:
+        print(f"Training out-of-core on {rows} rows ({args.chunk_rows} rows per chunk)")
+        model, scaler, accuracy = train_out_of_core(parts, args.chunk_rows, args.epochs,
+                                                    heldout_path=args.heldout)
+    else:
+        model, scaler, accuracy = train_in_memory(parts, args.heldout)
+    print("✅ Accuracy:", accuracy)
+
+    # Save model & scaler
+    joblib.dump(model, "seizure_model.pkl")
+    joblib.dump(scaler, "scaler.pkl")